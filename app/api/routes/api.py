@@ -1,22 +1,275 @@
-from fastapi import APIRouter, HTTPException, Depends
-from app.models.schemas import unifiedRequest, unifiedResponse
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from app.models.schemas import (
+    JobRequest,
+    JobStatus,
+    unifiedBatchItem,
+    unifiedBatchRequest,
+    unifiedBatchResponse,
+    unifiedRequest,
+    unifiedResponse,
+)
 from app.services.grief_service import GriefService
 from app.services.planner_service import PlannerService
 from app.services.media_service import MediaService
+from app.services.combined_service import CombinedService
+from app.services.container import get_container, ServiceUnavailableError
+from app.services.prompts import prepare_user_message
+from app.core.config import settings
+from app.core.dag import SectionGraph, SectionResult
+from app.core.jobs import CallbackURLError, JobQueue, JobQueueFullError, check_callback_url, get_job_queue
+from app.core.metrics import section_duration, section_errors
 import logging
 
 router = APIRouter()
 log = logging.getLogger(__name__)
 
-# Dependency injection
+# Dependency injection: services are built once per worker in the app lifespan
+def _require_service(name: str):
+    try:
+        return get_container().require(name)
+    except ServiceUnavailableError as e:
+        raise HTTPException(status_code=503, detail=f"Service unavailable: {str(e)}")
+
 def get_grief_service():
-    return GriefService()
+    return _require_service("grief_service")
 
 def get_planner_service():
-    return PlannerService()
+    return _require_service("planner_service")
 
 def get_media_service():
-    return MediaService()
+    return _require_service("media_service")
+
+def get_combined_service():
+    return _require_service("combined_service")
+
+def get_jobs() -> JobQueue:
+    queue = get_job_queue()
+    if queue is None:
+        raise HTTPException(status_code=503, detail="Background jobs are disabled")
+    return queue
+
+
+def with_prepared_message(request: unifiedRequest) -> unifiedRequest:
+    """The request with its message shortened once, so every section sends the same text."""
+    return request.model_copy(update={"user_message": prepare_user_message(request.user_message)})
+
+
+def build_unified_graph(
+    request: unifiedRequest,
+    grief_service: GriefService,
+    planner_service: PlannerService,
+    media_service: MediaService,
+    on_plan_item: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+    detect_mood: Optional[Callable[[str], Awaitable[str]]] = None,
+    recommend_media: Optional[Callable[[unifiedRequest, Optional[str]], Awaitable[Dict[str, Any]]]] = None,
+    combined_service: Optional[CombinedService] = None
+) -> SectionGraph:
+    """
+    Build the section graph for a unified request.
+
+    Grief analysis, the daily plan and media recommendations start together.
+    A lightweight mood-only step feeds detected_mood to the planner and
+    media sections so they don't wait for the full grief JSON. When
+    `on_plan_item` is given the plan is streamed and each item is reported.
+    `detect_mood` and `recommend_media` replace the default service calls,
+    e.g. to share that work across the items of a batch.
+
+    Requests asking for combined generation get the combined graph instead
+    when `combined_service` is given and none of the hooks above are.
+    """
+    if (
+        combined_service is not None
+        and combined_service.applies(request)
+        and on_plan_item is None and detect_mood is None and recommend_media is None
+    ):
+        return build_combined_graph(request, combined_service, grief_service, planner_service, media_service)
+
+    graph = SectionGraph()
+    detect_mood = detect_mood or grief_service.detect_mood
+
+    if request.include_grief_analysis:
+        graph.add("grief_response", lambda deps: grief_service.analyze_and_respond(request.user_message))
+
+    if request.include_daily_plan or request.include_media_recommendations:
+        graph.add("mood", lambda deps: detect_mood(request.user_message))
+
+    if request.include_daily_plan and on_plan_item is not None:
+        graph.add(
+            "daily_plan",
+            lambda deps: planner_service.stream_daily_plan(
+                request.user_message,
+                request.plan_preferences,
+                deps.get("mood"),
+                on_item=on_plan_item
+            ),
+            depends_on=["mood"]
+        )
+    elif request.include_daily_plan:
+        graph.add(
+            "daily_plan",
+            lambda deps: planner_service.create_daily_plan(
+                request.user_message,
+                request.plan_preferences,
+                deps.get("mood")
+            ),
+            depends_on=["mood"]
+        )
+
+    if request.include_media_recommendations and recommend_media is not None:
+        graph.add("media_recommendations", lambda deps: recommend_media(request, deps.get("mood")), depends_on=["mood"])
+    elif request.include_media_recommendations:
+        graph.add(
+            "media_recommendations",
+            lambda deps: media_service.get_mood_based_recommendations(
+                request.user_message,
+                request.media_type,
+                request.max_media_results,
+                deps.get("mood")
+            ),
+            depends_on=["mood"]
+        )
+
+    return graph
+
+
+def build_combined_graph(
+    request: unifiedRequest,
+    combined_service: CombinedService,
+    grief_service: GriefService,
+    planner_service: PlannerService,
+    media_service: MediaService
+) -> SectionGraph:
+    """
+    Section graph for combined generation: one "combined" step produces the
+    grief analysis, daily plan, mood and search query together, and the
+    media section only adds the Tavily search and relevance explanations.
+    A section whose part is missing (its call failed) falls back to its
+    usual service call, which also covers circuit-open fallbacks.
+    """
+    graph = SectionGraph()
+    graph.add("combined", lambda deps: combined_service.generate(request))
+
+    def part(deps: Dict[str, Any], name: str) -> Any:
+        return (deps.get("combined") or {}).get(name)
+
+    if request.include_grief_analysis:
+        async def grief_section(deps: Dict[str, Any]):
+            value = part(deps, "grief_response")
+            if value is None:
+                return await grief_service.analyze_and_respond(request.user_message)
+            return value
+        graph.add("grief_response", grief_section, depends_on=["combined"])
+
+    if request.include_daily_plan:
+        async def plan_section(deps: Dict[str, Any]):
+            value = part(deps, "daily_plan")
+            if value is None:
+                return await planner_service.create_daily_plan(
+                    request.user_message,
+                    request.plan_preferences,
+                    part(deps, "detected_mood")
+                )
+            return value
+        graph.add("daily_plan", plan_section, depends_on=["combined"])
+
+    if request.include_media_recommendations:
+        graph.add(
+            "media_recommendations",
+            lambda deps: media_service.get_mood_based_recommendations(
+                request.user_message,
+                request.media_type,
+                request.max_media_results,
+                part(deps, "detected_mood"),
+                search_query=part(deps, "search_query")
+            ),
+            depends_on=["combined"]
+        )
+
+    return graph
+
+
+# Sections of the graph that map onto fields of unifiedResponse
+RESPONSE_SECTIONS = ("grief_response", "daily_plan", "media_recommendations")
+
+
+def validate_section(name: str, value: Any):
+    """
+    Validate one section's raw result against its unifiedResponse field.
+
+    Raises:
+        ValidationError: If the model output doesn't match the schema
+    """
+    return getattr(unifiedResponse.model_validate({name: value}), name)
+
+
+def observe_section(result: SectionResult):
+    """Record a finished section's latency and outcome."""
+    if not settings.metrics_enabled:
+        return
+    if not result.ok:
+        outcome = "error"
+        section_errors.labels(result.name).inc()
+    elif isinstance(result.value, dict) and result.value.get("degraded"):
+        outcome = "degraded"
+    else:
+        outcome = "ok"
+    section_duration.labels(result.name, outcome).observe(result.elapsed)
+
+
+def server_timing(results: Dict[str, SectionResult], total: float) -> str:
+    """Server-Timing header value with one entry per section plus the total."""
+    entries = []
+    for name, result in results.items():
+        entry = f"{name};dur={result.elapsed * 1000:.1f}"
+        if not result.ok:
+            entry += ';desc="error"'
+        elif isinstance(result.value, dict) and result.value.get("degraded"):
+            entry += ';desc="degraded"'
+        entries.append(entry)
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def assemble_response(results: Dict[str, SectionResult]):
+    """
+    Build the unifiedResponse from a graph run. Failed or invalid sections
+    are listed in `errors`; the others are still returned.
+
+    Returns:
+        Tuple of (response, failure detail if every requested section failed, else None)
+    """
+    response = unifiedResponse()
+    errors = {}
+    for name in RESPONSE_SECTIONS:
+        if name not in results:
+            continue
+        result = results[name]
+        if not result.ok:
+            errors[name] = str(result.error)
+            continue
+        try:
+            # Validate each section on its own so malformed output only fails that section
+            setattr(response, name, validate_section(name, result.value))
+        except ValidationError as e:
+            log.error(f"Section '{name}' returned invalid data: {str(e)}")
+            errors[name] = f"Invalid {name} data returned by the model"
+
+    requested = [name for name in RESPONSE_SECTIONS if name in results]
+    if requested and len(errors) == len(requested):
+        return response, "; ".join(f"{name}: {message}" for name, message in errors.items())
+
+    if errors:
+        response.errors = errors
+    response.degraded = any(
+        getattr(getattr(response, name), "degraded", False) for name in RESPONSE_SECTIONS
+    )
+    return response, None
 
 
 # A unified Approach to handle multiple analyses in one request
@@ -24,9 +277,11 @@ def get_media_service():
 @router.post("/unified-analysis", response_model=unifiedResponse)
 async def unified_response(
     request: unifiedRequest,
+    http_response: Response,
     grief_service: GriefService = Depends(get_grief_service),
     planner_service: PlannerService = Depends(get_planner_service),
-    media_service: MediaService = Depends(get_media_service)
+    media_service: MediaService = Depends(get_media_service),
+    combined_service: CombinedService = Depends(get_combined_service)
 ):
     """
     Process a single request to get multiple responses:
@@ -35,46 +290,366 @@ async def unified_response(
     - Media recommendations based on emotional state
     
     The response includes only the requested analysis types.
-    The detected mood is shared between services to avoid redundant analysis.
+    The requested sections run concurrently; a quick mood-only step shares
+    detected_mood with the planner and media sections. A failing section is
+    reported in `errors` instead of failing the whole response. Sections
+    answered from fallbacks (an upstream circuit is open) set `degraded`.
+    Per-section durations are returned in the Server-Timing header.
+
+    With `combined_generation`, the grief analysis, daily plan and music
+    search query come from a single structured Gemini call (split only when
+    its output would exceed COMBINED_MAX_OUTPUT_TOKENS); the response shape
+    is unchanged.
     """
-    response = unifiedResponse()
-    detected_mood = None
-    
+    request = with_prepared_message(request)
     try:
-        # Process emotional analysis first if requested (to detect mood for other services)
-        if request.include_grief_analysis:
-            grief_response = await grief_service.analyze_and_respond(request.user_message)
-            response.grief_response = grief_response
-            
-            # Extract detected_mood to share with other services
-            if grief_response and "mood_analysis" in grief_response and "detected_mood" in grief_response["mood_analysis"]:
-                detected_mood = grief_response["mood_analysis"]["detected_mood"]
-                log.info(f"Detected mood from grief analysis: {detected_mood}")
-        
-        # Process daily plan if requested
-        if request.include_daily_plan:
-            daily_plan = await planner_service.create_daily_plan(
-                request.user_message, 
-                request.plan_preferences,
-                detected_mood
-            )
-            response.daily_plan = daily_plan
-        
-        # Process media recommendations if requested
-        if request.include_media_recommendations:
-            media_recommendations = await media_service.get_mood_based_recommendations(
+        graph = build_unified_graph(
+            request,
+            grief_service,
+            planner_service,
+            media_service,
+            combined_service=combined_service
+        )
+        started = time.perf_counter()
+        results = await graph.run()
+        http_response.headers["Server-Timing"] = server_timing(results, time.perf_counter() - started)
+    except Exception as e:
+        log.error(f"Error processing unified analysis: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to process unified analysis: {str(e)}")
+
+    for result in results.values():
+        observe_section(result)
+
+    if results.get("mood") and results["mood"].ok:
+        log.info(f"Detected mood for shared sections: {results['mood'].value}")
+
+    response, failure = assemble_response(results)
+    if failure:
+        log.error(f"Error processing unified analysis: {failure}")
+        raise HTTPException(status_code=500, detail=f"Failed to process unified analysis: {failure}")
+    return response
+
+
+@router.post("/unified-analysis/stream")
+async def unified_response_stream(
+    request: unifiedRequest,
+    http_request: Request,
+    grief_service: GriefService = Depends(get_grief_service),
+    planner_service: PlannerService = Depends(get_planner_service),
+    media_service: MediaService = Depends(get_media_service)
+):
+    """
+    Streaming variant of /unified-analysis.
+
+    Each requested section is sent as an event as soon as it finishes, and
+    daily plan items are sent individually while the plan is generated.
+    Responds with NDJSON by default, or server-sent events when the client
+    sends `Accept: text/event-stream`.
+
+    Event shapes:
+    - {"event": "plan_item", "section": "<plan section>", "data": {...}}
+    - {"event": "section", "section": "<name>", "data": {...}}
+    - {"event": "error", "section": "<name>", "detail": "..."}
+    - {"event": "done", "errors": {...}, "degraded": false}
+    """
+    request = with_prepared_message(request)
+    use_sse = "text/event-stream" in http_request.headers.get("accept", "")
+    queue: asyncio.Queue = asyncio.Queue()
+    errors: Dict[str, str] = {}
+    degraded_sections = set()
+
+    async def on_plan_item(section: str, item: Dict[str, Any]):
+        await queue.put({"event": "plan_item", "section": section, "data": item})
+
+    async def on_complete(result: SectionResult):
+        observe_section(result)
+        if result.name not in RESPONSE_SECTIONS:
+            return
+        if not result.ok:
+            errors[result.name] = str(result.error)
+            await queue.put({"event": "error", "section": result.name, "detail": errors[result.name]})
+            return
+        try:
+            section = validate_section(result.name, result.value)
+        except ValidationError as e:
+            log.error(f"Section '{result.name}' returned invalid data: {str(e)}")
+            errors[result.name] = f"Invalid {result.name} data returned by the model"
+            await queue.put({"event": "error", "section": result.name, "detail": errors[result.name]})
+            return
+        if section.degraded:
+            degraded_sections.add(result.name)
+        await queue.put({"event": "section", "section": result.name, "data": section.model_dump()})
+
+    graph = build_unified_graph(request, grief_service, planner_service, media_service, on_plan_item=on_plan_item)
+
+    async def run_graph():
+        try:
+            await graph.run(on_complete=on_complete)
+        except Exception as e:
+            log.error(f"Error processing streaming unified analysis: {str(e)}")
+            errors["unified"] = str(e)
+        finally:
+            await queue.put({"event": "done", "errors": errors or None, "degraded": bool(degraded_sections)})
+
+    def encode(event: Dict[str, Any]) -> str:
+        data = json.dumps(event)
+        if use_sse:
+            return f"event: {event['event']}\ndata: {data}\n\n"
+        return data + "\n"
+
+    async def event_stream():
+        task = asyncio.create_task(run_graph())
+        try:
+            while True:
+                event = await queue.get()
+                yield encode(event)
+                if event["event"] == "done":
+                    break
+        finally:
+            # Client went away or stream finished: stop any outstanding sections
+            if not task.done():
+                task.cancel()
+
+    media_type = "text/event-stream" if use_sse else "application/x-ndjson"
+    return StreamingResponse(event_stream(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
+class BatchMemo:
+    """
+    Per-batch memo of shared work: the first item needing a key starts it
+    and every later item awaits the same result (or error).
+    """
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+        self.reused = 0
+
+    async def get(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(func())
+        else:
+            self.reused += 1
+        # One waiting item being cancelled must not cancel the shared work
+        return await asyncio.shield(task)
+
+    def cancel(self):
+        for task in self._tasks.values():
+            task.cancel()
+
+
+class UnifiedBatch:
+    """
+    Runs the unified analysis for a batch of requests.
+
+    Identical items are analyzed once. Moods come from one vectorized pass
+    of the local classifier, with Gemini asked once per distinct message
+    it isn't confident about. Media recommendations are built once per
+    distinct mood, so the search query and Tavily lookup aren't repeated
+    for every item. At most `concurrency` items are analyzed at a time.
+    """
+    def __init__(
+        self,
+        items: List[unifiedRequest],
+        grief_service: GriefService,
+        planner_service: PlannerService,
+        media_service: MediaService,
+        concurrency: int
+    ):
+        self.grief_service = grief_service
+        self.planner_service = planner_service
+        self.media_service = media_service
+        self.total_items = len(items)
+        # Request JSON -> indexes of every item with that exact request
+        self.groups: Dict[str, List[int]] = {}
+        self.requests: Dict[str, unifiedRequest] = {}
+        for index, item in enumerate(items):
+            key = json.dumps(item.model_dump(), sort_keys=True)
+            self.groups.setdefault(key, []).append(index)
+            if key not in self.requests:
+                self.requests[key] = with_prepared_message(item)
+        self.memo = BatchMemo()
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.local_moods = self._classify_moods()
+
+    def _classify_moods(self) -> Dict[str, str]:
+        """Confident local mood labels for every distinct message that needs a mood."""
+        classifier = self.grief_service.mood_classifier
+        messages = list(dict.fromkeys(
+            request.user_message for request in self.requests.values()
+            if request.include_daily_plan or request.include_media_recommendations
+        ))
+        if classifier is None or not messages:
+            return {}
+        predictions = classifier.predict_batch(messages)
+        return {
+            message: prediction.label
+            for message, prediction in zip(messages, predictions)
+            if prediction.confidence >= settings.mood_confidence_threshold
+        }
+
+    async def detect_mood(self, user_message: str) -> str:
+        mood = self.local_moods.get(user_message)
+        if mood is not None:
+            return mood
+        return await self.memo.get(("mood", user_message), lambda: self.grief_service.detect_mood(user_message))
+
+    async def recommend_media(self, request: unifiedRequest, mood: Optional[str]) -> Dict[str, Any]:
+        def fetch():
+            return self.media_service.get_mood_based_recommendations(
                 request.user_message,
                 request.media_type,
                 request.max_media_results,
-                detected_mood
+                mood
             )
-            response.media_recommendations = media_recommendations
-            
-            # If we didn't have mood detection from grief analysis, get it from media recommendations
-            if not detected_mood and media_recommendations and "detected_mood" in media_recommendations:
-                detected_mood = media_recommendations["detected_mood"]
-        
-        return response
-    except Exception as e:
-        log.error(f"Error processing unified analysis: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to process unified analysis: {str(e)}")
\ No newline at end of file
+        if not mood:
+            # The service detects the mood from this item's own message
+            return await fetch()
+        # With a mood given, recommendations don't depend on the message
+        key = ("media", mood.strip().lower(), request.media_type, request.max_media_results)
+        return await self.memo.get(key, fetch)
+
+    async def _run(self, key: str):
+        async with self.semaphore:
+            graph = build_unified_graph(
+                self.requests[key],
+                self.grief_service,
+                self.planner_service,
+                self.media_service,
+                detect_mood=self.detect_mood,
+                recommend_media=self.recommend_media
+            )
+            try:
+                results = await graph.run()
+            except Exception as e:
+                log.error(f"Error processing batch item: {str(e)}")
+                return key, None, str(e)
+
+        for result in results.values():
+            observe_section(result)
+        response, failure = assemble_response(results)
+        if failure:
+            return key, None, f"Failed to process unified analysis: {failure}"
+        return key, response, None
+
+    async def results(self) -> AsyncIterator[unifiedBatchItem]:
+        """Yield batch items as they finish; duplicates are yielded together."""
+        tasks = [asyncio.ensure_future(self._run(key)) for key in self.groups]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                key, response, error = await finished
+                for index in self.groups[key]:
+                    yield unifiedBatchItem(index=index, result=response, error=error)
+        finally:
+            # Finished, failed or the client went away: stop outstanding work
+            for task in tasks:
+                task.cancel()
+            self.memo.cancel()
+            log.info(
+                f"Batch of {self.total_items} items: {len(self.groups)} analyzed, "
+                f"{len(self.local_moods)} moods classified locally, {self.memo.reused} shared results reused"
+            )
+
+
+@router.post("/unified-analysis/batch", response_model=unifiedBatchResponse)
+async def unified_response_batch(
+    batch: unifiedBatchRequest,
+    http_request: Request,
+    grief_service: GriefService = Depends(get_grief_service),
+    planner_service: PlannerService = Depends(get_planner_service),
+    media_service: MediaService = Depends(get_media_service)
+):
+    """
+    Run /unified-analysis for many requests at once.
+
+    Identical items are analyzed once, and mood detection and media
+    searches are shared across the batch (one search per distinct mood).
+    Each item gets its own result or error; one failing item never fails
+    the batch.
+
+    Returns all results together in request order by default. Clients
+    sending `Accept: application/x-ndjson` instead receive one
+    {"index": ..., "result": ..., "error": ...} line per item as soon as
+    it finishes.
+    """
+    if len(batch.items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(batch.items)} items; the limit is {settings.batch_max_items}"
+        )
+
+    runner = UnifiedBatch(batch.items, grief_service, planner_service, media_service, settings.batch_max_concurrency)
+
+    if "application/x-ndjson" in http_request.headers.get("accept", ""):
+        async def item_stream():
+            async for item in runner.results():
+                yield item.model_dump_json() + "\n"
+        return StreamingResponse(item_stream(), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache"})
+
+    items = [item async for item in runner.results()]
+    items.sort(key=lambda item: item.index)
+    return unifiedBatchResponse(results=items, total_items=runner.total_items, unique_items=len(runner.groups))
+
+
+async def run_unified_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Job handler: run a stored unified request through the same section
+    graph as /unified-analysis.
+
+    Raises:
+        RuntimeError: If every requested section failed
+    """
+    request = with_prepared_message(unifiedRequest.model_validate(payload))
+    container = get_container()
+    graph = build_unified_graph(
+        request,
+        container.require("grief_service"),
+        container.require("planner_service"),
+        container.require("media_service"),
+        combined_service=container.require("combined_service")
+    )
+    results = await graph.run()
+    for result in results.values():
+        observe_section(result)
+    response, failure = assemble_response(results)
+    if failure:
+        raise RuntimeError(f"Failed to process unified analysis: {failure}")
+    return response.model_dump()
+
+
+@router.post("/jobs", response_model=JobStatus, status_code=202)
+async def create_job(
+    request: JobRequest,
+    http_request: Request,
+    http_response: Response,
+    jobs: JobQueue = Depends(get_jobs)
+):
+    """
+    Queue a unified analysis to run in the background, for clients whose
+    gateway times out before long sections (e.g. the daily plan) finish.
+
+    Poll GET /jobs/{job_id} for the result, or pass `callback_url` to have
+    the final job status POSTed to you (when the server enables callbacks;
+    internal addresses are rejected). Jobs are stored durably and survive
+    restarts; results are kept for JOB_RESULT_TTL_SECONDS.
+    """
+    if request.callback_url:
+        try:
+            await check_callback_url(request.callback_url)
+        except CallbackURLError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    payload = request.model_dump(exclude={"callback_url"})
+    try:
+        job = await jobs.submit(payload, request.callback_url)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    http_response.headers["Location"] = str(http_request.url_for("get_job", job_id=job["job_id"]))
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str, jobs: JobQueue = Depends(get_jobs)):
+    """Status of a background job, including its result once it has succeeded."""
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
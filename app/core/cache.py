@@ -0,0 +1,223 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from app.core.cache_backends import CacheBackend, CacheBackendError, get_cache_backend
+from app.core.logging import log
+
+
+class TTLCache:
+    """
+    In-process LRU cache with per-entry time-to-live.
+
+    Entries are evicted when they expire or, once `max_entries` is
+    reached, in least-recently-used order. Hit, miss and eviction counts
+    are kept for observability.
+    """
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0, name: str = "cache"):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> (value, stored_at, expires_at)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get_entry(key, count=False) is not None
+
+    def get_entry(self, key: Hashable, count: bool = True) -> Optional[Tuple[Any, float]]:
+        """
+        Look up a live entry.
+
+        Returns:
+            Tuple of (value, age in seconds), or None on a miss
+        """
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is None or entry[2] <= now:
+            if entry is not None:
+                del self._entries[key]
+                self.evictions += 1
+            if count:
+                self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        if count:
+            self.hits += 1
+        return entry[0], now - entry[1]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, age: float = 0.0):
+        now = time.monotonic()
+        self._entries[key] = (value, now - age, now + (self.ttl if ttl is None else ttl))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class TieredCache:
+    """
+    Read-through cache with two tiers: an in-process TTLCache (L1) in front
+    of the shared tier (L2) configured by CACHE_BACKEND, if any.
+
+    L2 hits are copied into L1 with their original age and remaining
+    lifetime; writes go to both tiers. Keys may be any value with a stable
+    repr() and values must be JSON-serializable. The shared tier never
+    fails a lookup: after an error it is skipped for `retry_after` seconds.
+    """
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 3600.0,
+        name: str = "cache",
+        backend: Optional[CacheBackend] = None,
+        timeout: float = 0.25,
+        retry_after: float = 10.0
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.local = TTLCache(max_entries=max_entries, ttl=ttl, name=name)
+        # None means the process-wide tier opened at startup
+        self._backend = backend
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.shared_errors = 0
+        self._skip_until = 0.0
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+    @property
+    def backend(self) -> Optional[CacheBackend]:
+        return self._backend if self._backend is not None else get_cache_backend()
+
+    def _shared(self) -> Optional[CacheBackend]:
+        backend = self.backend
+        if backend is None or time.monotonic() < self._skip_until:
+            return None
+        return backend
+
+    def _shared_key(self, key: Hashable) -> str:
+        return f"{self.name}:{hashlib.sha256(repr(key).encode('utf-8')).hexdigest()}"
+
+    def _shared_failed(self, backend: CacheBackend, error: Exception):
+        self.shared_errors += 1
+        if isinstance(error, (CacheBackendError, asyncio.TimeoutError)):
+            self._skip_until = time.monotonic() + self.retry_after
+            log.warning(f"Shared {backend.kind} cache unavailable for {self.name}, using the local tier for {self.retry_after:.0f}s: {error!r}")
+        else:
+            log.warning(f"Could not use the shared {backend.kind} cache for {self.name}: {error!r}")
+
+    async def get_entry(self, key: Hashable, max_age: Optional[float] = None) -> Optional[Tuple[Any, float]]:
+        """
+        Look up a live entry, trying L1 first.
+
+        Args:
+            key: Cache key
+            max_age: Optional age in seconds beyond which an L1 entry is
+                checked against the shared tier for a fresher copy (one
+                written by another worker); the older entry is still
+                returned if none exists
+
+        Returns:
+            Tuple of (value, age in seconds), or None on a miss
+        """
+        entry = self.local.get_entry(key, count=False)
+        if entry is not None and (max_age is None or entry[1] <= max_age):
+            self.hits += 1
+            return entry
+
+        backend = self._shared()
+        shared = None
+        if backend is not None:
+            try:
+                shared = await asyncio.wait_for(backend.get(self._shared_key(key)), self.timeout)
+            except Exception as e:
+                self._shared_failed(backend, e)
+        if shared is not None:
+            value, stored_at, expires_at = shared
+            now = time.time()
+            age = max(0.0, now - stored_at)
+            if entry is None or age < entry[1]:
+                self.shared_hits += 1
+                self.hits += 1
+                self.local.set(key, value, ttl=expires_at - now, age=age)
+                return value, age
+
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    async def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = await self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    async def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        self.local.set(key, value, ttl)
+        backend = self._shared()
+        if backend is not None:
+            try:
+                await asyncio.wait_for(backend.set(self._shared_key(key), value, ttl), self.timeout)
+            except Exception as e:
+                self._shared_failed(backend, e)
+
+    async def delete(self, key: Hashable):
+        self.local.delete(key)
+        backend = self._shared()
+        if backend is not None:
+            try:
+                await asyncio.wait_for(backend.delete(self._shared_key(key)), self.timeout)
+            except Exception as e:
+                self._shared_failed(backend, e)
+
+    def clear(self):
+        """Drop this process's entries; the shared tier is left alone."""
+        self.local.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        backend = self.backend
+        return {
+            **self.local.stats(),
+            "shared": backend.kind if backend is not None else "none",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "shared_hits": self.shared_hits,
+            "shared_errors": self.shared_errors,
+        }
@@ -0,0 +1,342 @@
+"""
+Shared cache tiers behind the per-process caches.
+
+Each worker process keeps its own in-memory LRU (TTLCache). With several
+workers that memory is duplicated and warms up once per process, so a
+TieredCache can read through to a second, shared tier:
+
+- "memory": no shared tier; every process caches on its own (the default)
+- "sqlite": a local SQLite database in WAL mode, shared by the workers of
+  one host
+- "redis": any server speaking the Redis protocol (RESP), shared across
+  hosts; benchmarks/resp_server.py is a local stand-in for testing
+
+Entries are stored as JSON together with their wall-clock write and
+expiry times, so a process that reads an entry written by another knows
+its age (for stale-while-revalidate) and remaining lifetime.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from app.core.config import settings
+from app.core.logging import log
+
+# (value, stored_at, expires_at) with wall-clock timestamps
+SharedEntry = Tuple[Any, float, float]
+
+
+class CacheBackendError(Exception):
+    """Raised when the shared cache tier cannot be read or written."""
+
+
+class CacheBackend:
+    """Interface of a shared cache tier. Keys are strings; values must be JSON-serializable."""
+    kind = "memory"
+
+    async def get(self, key: str) -> Optional[SharedEntry]:
+        """
+        Look up a live entry.
+
+        Returns:
+            Tuple of (value, stored_at, expires_at), or None on a miss
+
+        Raises:
+            CacheBackendError: If the tier is unreachable
+        """
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: float, stored_at: Optional[float] = None):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.kind}
+
+
+def _encode(value: Any, stored_at: float, expires_at: float) -> str:
+    return json.dumps({"v": value, "t": stored_at, "e": expires_at}, separators=(",", ":"))
+
+
+def _decode(raw: str) -> SharedEntry:
+    entry = json.loads(raw)
+    return entry["v"], entry["t"], entry["e"]
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires_at);
+"""
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Shared tier in a local SQLite database (WAL mode, so readers never wait
+    on a writer). Every worker opens its own connection to the same file.
+    Queries run in a thread so the event loop never waits on disk; expired
+    rows are purged every `purge_every` writes.
+    """
+    kind = "sqlite"
+
+    def __init__(self, path: str, purge_every: int = 500):
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.purge_every = purge_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SQLITE_SCHEMA)
+
+    def _get(self, key: str) -> Optional[SharedEntry]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return _decode(row[0]) if row else None
+
+    def _set(self, key: str, value: Any, ttl: float, stored_at: Optional[float]):
+        now = time.time()
+        stored_at = now if stored_at is None else stored_at
+        raw = _encode(value, stored_at, now + ttl)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)", (key, raw, now + ttl)
+            )
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                self._db.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+
+    def _delete(self, key: str):
+        with self._lock:
+            self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def _size(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    async def get(self, key: str) -> Optional[SharedEntry]:
+        try:
+            return await asyncio.to_thread(self._get, key)
+        except sqlite3.Error as e:
+            raise CacheBackendError(str(e)) from e
+
+    async def set(self, key: str, value: Any, ttl: float, stored_at: Optional[float] = None):
+        try:
+            await asyncio.to_thread(self._set, key, value, ttl, stored_at)
+        except sqlite3.Error as e:
+            raise CacheBackendError(str(e)) from e
+
+    async def delete(self, key: str):
+        try:
+            await asyncio.to_thread(self._delete, key)
+        except sqlite3.Error as e:
+            raise CacheBackendError(str(e)) from e
+
+    async def close(self):
+        with self._lock:
+            self._db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.kind, "path": self.path, "writes": self._writes}
+
+
+class _RespConnection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    async def command(self, *args: Any) -> Any:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self.writer.write(b"".join(parts))
+        await self.writer.drain()
+        return await self._read_reply()
+
+    async def _read_reply(self) -> Any:
+        line = await self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by the cache server")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            raise CacheBackendError(body.decode())
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = await self.reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(body)
+            return None if length < 0 else [await self._read_reply() for _ in range(length)]
+        raise CacheBackendError(f"Unexpected reply from the cache server: {line[:40]!r}")
+
+    def close(self):
+        self.writer.close()
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Shared tier on a server speaking the Redis protocol, using a small
+    built-in RESP client (GET, SET with PX, DEL) with a pool of up to
+    `max_connections` connections. Expiry is left to the server.
+
+    Args:
+        url: redis://[:password@]host[:port][/db]
+        max_connections: Connections kept open to the server
+        timeout: Seconds a connection attempt or command may take
+    """
+    kind = "redis"
+
+    def __init__(self, url: str, max_connections: int = 8, timeout: float = 0.25):
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"Unsupported cache URL scheme: {parsed.scheme!r}")
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._idle: List[_RespConnection] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.connects = 0
+
+    async def _connect(self) -> _RespConnection:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        connection = _RespConnection(reader, writer)
+        try:
+            if self.password:
+                await connection.command("AUTH", self.password)
+            if self.db:
+                await connection.command("SELECT", self.db)
+        except BaseException:
+            connection.close()
+            raise
+        self.connects += 1
+        return connection
+
+    async def _command(self, *args: Any) -> Any:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            try:
+                if connection is None:
+                    connection = await asyncio.wait_for(self._connect(), self.timeout)
+                reply = await asyncio.wait_for(connection.command(*args), self.timeout)
+            except CacheBackendError:
+                # An error reply leaves the connection usable
+                if connection is not None:
+                    self._idle.append(connection)
+                raise
+            except (OSError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                if connection is not None:
+                    connection.close()
+                raise CacheBackendError(f"{type(e).__name__}: {str(e)}") from e
+            except BaseException:
+                # Cancelled mid-command: the reply may still arrive, so drop the connection
+                if connection is not None:
+                    connection.close()
+                raise
+            self._idle.append(connection)
+            return reply
+
+    async def get(self, key: str) -> Optional[SharedEntry]:
+        raw = await self._command("GET", key)
+        return _decode(raw.decode("utf-8")) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: float, stored_at: Optional[float] = None):
+        now = time.time()
+        stored_at = now if stored_at is None else stored_at
+        await self._command("SET", key, _encode(value, stored_at, now + ttl), "PX", max(1, int(ttl * 1000)))
+
+    async def delete(self, key: str):
+        await self._command("DEL", key)
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.kind,
+            "server": f"{self.host}:{self.port}/{self.db}",
+            "idle_connections": len(self._idle),
+            "connects": self.connects,
+        }
+
+
+def create_cache_backend(kind: str) -> Optional[CacheBackend]:
+    """
+    Build the shared tier configured by CACHE_BACKEND.
+
+    Returns:
+        The backend, or None for "memory" (per-process caching only)
+
+    Raises:
+        ValueError: For an unknown backend name
+    """
+    kind = kind.lower()
+    if kind == "memory":
+        return None
+    if kind == "sqlite":
+        return SQLiteCacheBackend(settings.cache_sqlite_path)
+    if kind == "redis":
+        return RedisCacheBackend(
+            settings.cache_redis_url,
+            max_connections=settings.cache_redis_max_connections,
+            timeout=settings.cache_shared_timeout_seconds,
+        )
+    raise ValueError(f"Unknown cache backend: {kind!r}")
+
+
+# Process-wide shared tier, opened in the application lifespan
+_backend: Optional[CacheBackend] = None
+
+
+def get_cache_backend() -> Optional[CacheBackend]:
+    """The shared cache tier, or None when caching is per-process only."""
+    return _backend
+
+
+async def startup_cache_backend():
+    global _backend
+    try:
+        _backend = await asyncio.to_thread(create_cache_backend, settings.cache_backend)
+    except (ValueError, sqlite3.Error) as e:
+        log.error(f"Shared cache unavailable, caching per process only: {str(e)}")
+        _backend = None
+        return
+    if _backend is not None:
+        log.info(f"Shared cache tier: {_backend.kind}")
+
+
+async def shutdown_cache_backend():
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
@@ -3,15 +3,161 @@ from pydantic_settings import BaseSettings
 import os
 from dotenv import load_dotenv
 
+# The only place .env is read; everything else takes its values from `settings`
 load_dotenv()
 
 class Settings(BaseSettings):
     app_env: str = Field(default="development")
     log_level: str = Field(default="INFO")
+    # "json" (one object per line) or "text"; records are written by a
+    # background thread and dropped rather than queued beyond the limit
+    log_format: str = Field(default="json")
+    log_queue_size: int = Field(default=10000)
+    # Share of INFO/DEBUG records kept per logger (and its children);
+    # warnings and errors are always kept
+    log_sample_rates: str = Field(default="httpx=0.05,app.services.media_service=0.25,app.services.youtube_service=0.25")
     gemini_api_key: str = Field(default="")
     gemini_model: str = Field(default="gemini-2.0-flash")
     tavily_api_key: str = Field(default="")
 
+    # Upstream endpoints; overridable to point at local stand-ins (see benchmarks/)
+    gemini_base_url: str = Field(default="https://generativelanguage.googleapis.com/v1beta")
+    tavily_search_url: str = Field(default="https://api.tavily.com/search")
+
+    # Shared Gemini HTTP client (connection pool and timeouts)
+    gemini_http2: bool = Field(default=False)
+    gemini_max_connections: int = Field(default=100)
+    gemini_max_keepalive_connections: int = Field(default=20)
+    gemini_keepalive_expiry_seconds: float = Field(default=30.0)
+    gemini_connect_timeout_seconds: float = Field(default=5.0)
+    gemini_read_timeout_seconds: float = Field(default=60.0)
+    gemini_pool_timeout_seconds: float = Field(default=10.0)
+
+    # Gemini response cache (used only by call sites that opt in)
+    gemini_cache_enabled: bool = Field(default=True)
+    gemini_cache_max_entries: int = Field(default=2048)
+    gemini_cache_ttl_seconds: float = Field(default=3600.0)
+    # Relevance explanations cached per (mood, video), with the same TTL
+    relevance_cache_max_entries: int = Field(default=4096)
+
+    # Gemini context caching: static system instructions are uploaded once as
+    # cachedContents and referenced by name. Instructions under the minimum
+    # size (the API rejects smaller caches) are always sent inline
+    gemini_context_cache_enabled: bool = Field(default=True)
+    gemini_context_cache_ttl_seconds: float = Field(default=3600.0)
+    gemini_context_cache_refresh_seconds: float = Field(default=300.0)
+    gemini_context_cache_min_tokens: int = Field(default=1024)
+    gemini_context_cache_retry_seconds: float = Field(default=600.0)
+
+    # Tavily search session (pool, keep-alive and timeout) and result cache
+    # (stale-while-revalidate)
+    tavily_max_connections: int = Field(default=20)
+    tavily_keepalive_expiry_seconds: float = Field(default=30.0)
+    tavily_timeout_seconds: float = Field(default=30.0)
+    tavily_cache_enabled: bool = Field(default=True)
+    tavily_cache_max_entries: int = Field(default=512)
+    tavily_cache_ttl_seconds: float = Field(default=3600.0)
+    tavily_cache_stale_seconds: float = Field(default=6 * 3600.0)
+
+    # Shared cache tier behind the per-process caches, so several workers
+    # share one warm cache: "memory" (none), "sqlite" (workers on one host)
+    # or "redis" (any Redis-protocol server). Shared lookups that fail or
+    # time out fall back to the local tier
+    cache_backend: str = Field(default="memory")
+    cache_sqlite_path: str = Field(default="cache.sqlite3")
+    cache_redis_url: str = Field(default="redis://localhost:6379/0")
+    cache_redis_max_connections: int = Field(default=8)
+    cache_shared_timeout_seconds: float = Field(default=0.25)
+    cache_shared_retry_seconds: float = Field(default=10.0)
+
+    # Startup prewarm: pooled connections opened to each configured upstream
+    # (with requests that cost no quota) before /ready reports ready, and a
+    # keep-alive pinger re-probing pools idle for longer than the interval
+    # (0 disables; capped at 2/3 of the shorter of the Gemini and Tavily
+    # keep-alive expiries). The optional warm-up request is a one-token
+    # generation
+    upstream_prewarm_connections: int = Field(default=4)
+    upstream_prewarm_timeout_seconds: float = Field(default=5.0)
+    upstream_keepalive_interval_seconds: float = Field(default=20.0)
+    upstream_warmup_request: bool = Field(default=False)
+
+    # Coalesce identical in-flight Gemini/Tavily calls into one upstream request
+    singleflight_enabled: bool = Field(default=True)
+
+    # Outbound Gemini scheduler: concurrency cap, token-bucket rate limit
+    # (set to the project's requests-per-minute quota; 0 disables), 429
+    # retries (Retry-After is capped at the max backoff), and load shedding:
+    # calls beyond the queue bound or queued longer than the wait limit fail
+    # fast and are answered from the fallbacks (0 disables either)
+    gemini_max_concurrency: int = Field(default=16)
+    gemini_requests_per_minute: float = Field(default=2000.0)
+    gemini_rate_burst: int = Field(default=20)
+    gemini_rate_limit_retries: int = Field(default=3)
+    gemini_rate_limit_max_backoff_seconds: float = Field(default=30.0)
+    gemini_max_queue: int = Field(default=256)
+    gemini_max_queue_wait_seconds: float = Field(default=30.0)
+
+    # Per-call timeout, jittered retries on transient failures, and hedging:
+    # a second copy is sent once a call outlives the profile's observed
+    # latency percentile, limited to a fraction of all requests
+    gemini_request_timeout_seconds: float = Field(default=30.0)
+    gemini_max_retries: int = Field(default=2)
+    gemini_retry_base_seconds: float = Field(default=0.5)
+    gemini_retry_max_seconds: float = Field(default=8.0)
+    gemini_hedging_enabled: bool = Field(default=True)
+    gemini_hedge_percentile: float = Field(default=0.95)
+    gemini_hedge_budget_ratio: float = Field(default=0.05)
+    gemini_hedge_min_samples: int = Field(default=20)
+
+    # Circuit breakers: after N consecutive upstream failures calls fail fast
+    # (and services answer from fallbacks) until a half-open probe succeeds
+    gemini_circuit_failure_threshold: int = Field(default=5)
+    gemini_circuit_reset_seconds: float = Field(default=30.0)
+    tavily_circuit_failure_threshold: int = Field(default=5)
+    tavily_circuit_reset_seconds: float = Field(default=30.0)
+    circuit_half_open_max_calls: int = Field(default=1)
+
+    # Batch unified analysis: items per request and items analyzed at once
+    batch_max_items: int = Field(default=100)
+    batch_max_concurrency: int = Field(default=8)
+
+    # Combined generation: output tokens one Gemini call may reserve before the
+    # requested sections are split over several concurrent calls
+    combined_max_output_tokens: int = Field(default=8192)
+
+    # Background jobs: durable SQLite queue and per-process worker pool
+    jobs_enabled: bool = Field(default=True)
+    job_db_path: str = Field(default="jobs.sqlite3")
+    job_queue_max_size: int = Field(default=1000)
+    job_worker_concurrency: int = Field(default=4)
+    job_timeout_seconds: float = Field(default=120.0)
+    job_max_attempts: int = Field(default=3)
+    job_result_ttl_seconds: float = Field(default=3600.0)
+    job_poll_interval_seconds: float = Field(default=1.0)
+    # Job callbacks POST results to a client-supplied URL, so they are off by
+    # default. With an allowlist (comma-separated host names) only those hosts
+    # are accepted; without one, only hosts resolving to public addresses, and
+    # each POST attempt connects to the address just checked
+    job_callbacks_enabled: bool = Field(default=False)
+    job_callback_allowed_hosts: str = Field(default="")
+
+    # Prometheus-format metrics at /metrics
+    metrics_enabled: bool = Field(default=True)
+
+    # Request tracing: sampled traces are exported to a JSON-lines file or an
+    # OTLP/HTTP collector ("file", "otlp" or "none")
+    tracing_enabled: bool = Field(default=False)
+    tracing_sample_rate: float = Field(default=0.01)
+    tracing_exporter: str = Field(default="file")
+    tracing_file_path: str = Field(default="traces.jsonl")
+    tracing_otlp_endpoint: str = Field(default="http://localhost:4318/v1/traces")
+    tracing_service_name: str = Field(default="grief-support-api")
+
+    # Local mood classifier; Gemini is only asked below the confidence threshold
+    mood_classifier_enabled: bool = Field(default=True)
+    mood_classifier_path: str = Field(default="")
+    mood_confidence_threshold: float = Field(default=0.6)
+
 # Create an instance of Settings to export
 settings = Settings(
     app_env=os.getenv("APP_ENV", "development"),
@@ -20,8 +166,3 @@ settings = Settings(
     gemini_model="gemini-2.0-flash",
     tavily_api_key=os.getenv("TAVILY_API_KEY", "")
 )
-
-
-
-
-
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from app.core.logging import log
+from app.core.tracing import span
+
+# A section receives the results of its dependencies (None for failed ones)
+SectionFunc = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+@dataclass
+class SectionResult:
+    """Outcome of one section of a SectionGraph run."""
+    name: str
+    value: Any = None
+    error: Optional[BaseException] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class SectionGraph:
+    """
+    Minimal dependency-aware executor for independent pieces of work.
+
+    Each section starts as soon as all of its dependencies have finished,
+    so sections without dependencies run concurrently. A failing section
+    never fails the run: its error is recorded and dependants receive
+    None for it, so they can degrade instead of aborting.
+    """
+    def __init__(self):
+        self._sections: Dict[str, Tuple[SectionFunc, Tuple[str, ...]]] = {}
+
+    def add(self, name: str, func: SectionFunc, depends_on: Iterable[str] = ()) -> "SectionGraph":
+        """
+        Register a section.
+
+        Args:
+            name: Unique section name
+            func: Coroutine function called with a dict of dependency results
+            depends_on: Names of sections that must finish first
+        """
+        if name in self._sections:
+            raise ValueError(f"Section already registered: {name}")
+        self._sections[name] = (func, tuple(depends_on))
+        return self
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sections
+
+    def _validate(self):
+        for name, (_, deps) in self._sections.items():
+            for dep in deps:
+                if dep not in self._sections:
+                    raise ValueError(f"Section '{name}' depends on unknown section '{dep}'")
+        # Kahn's algorithm to reject cycles up front
+        remaining = {name: set(deps) for name, (_, deps) in self._sections.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Dependency cycle between sections: {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    async def run(self, on_complete: Optional[Callable[[SectionResult], Awaitable[None]]] = None) -> Dict[str, SectionResult]:
+        """
+        Execute all sections, honouring dependencies.
+
+        Args:
+            on_complete: Optional coroutine called as each section finishes
+
+        Returns:
+            Dictionary mapping section name to its SectionResult
+        """
+        self._validate()
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_section(name: str) -> SectionResult:
+            func, deps = self._sections[name]
+            dep_results = {}
+            for dep in deps:
+                dep_result = await tasks[dep]
+                dep_results[dep] = dep_result.value if dep_result.ok else None
+
+            start = time.perf_counter()
+            with span(f"section.{name}"):
+                try:
+                    result = SectionResult(name=name, value=await func(dep_results))
+                except Exception as e:
+                    log.error(f"Section '{name}' failed: {str(e)}")
+                    result = SectionResult(name=name, error=e)
+            result.elapsed = time.perf_counter() - start
+
+            if on_complete is not None:
+                await on_complete(result)
+            return result
+
+        for name in self._sections:
+            tasks[name] = asyncio.create_task(run_section(name))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+        return {name: task.result() for name, task in tasks.items()}
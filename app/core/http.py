@@ -0,0 +1,219 @@
+import asyncio
+import importlib.util
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+import httpx
+
+from app.core.config import settings
+from app.core.logging import log
+from app.core.metrics import upstream_last_call
+
+# Process-wide HTTP client shared by every GeminiService instance.
+# Created in the application lifespan and closed on shutdown.
+_gemini_client: Optional[httpx.AsyncClient] = None
+
+# Long-lived aiohttp session for Tavily search, created on first use
+_tavily_session: Optional[aiohttp.ClientSession] = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 support in httpx needs the optional `h2` package."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def create_gemini_client() -> httpx.AsyncClient:
+    """
+    Build a keep-alive pooled async client for the Gemini API using the
+    pool limits and timeouts from settings.
+
+    Returns:
+        A new httpx.AsyncClient
+    """
+    http2 = settings.gemini_http2
+    if http2 and not _http2_available():
+        log.warning("GEMINI_HTTP2 is enabled but the 'h2' package is not installed; falling back to HTTP/1.1")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=settings.gemini_max_connections,
+        max_keepalive_connections=settings.gemini_max_keepalive_connections,
+        keepalive_expiry=settings.gemini_keepalive_expiry_seconds,
+    )
+    timeout = httpx.Timeout(
+        connect=settings.gemini_connect_timeout_seconds,
+        read=settings.gemini_read_timeout_seconds,
+        write=settings.gemini_connect_timeout_seconds,
+        pool=settings.gemini_pool_timeout_seconds,
+    )
+    return httpx.AsyncClient(http2=http2, limits=limits, timeout=timeout)
+
+
+def get_gemini_client() -> httpx.AsyncClient:
+    """
+    Return the shared Gemini client, creating it on first use if the
+    application lifespan has not done so (e.g. in scripts).
+    """
+    global _gemini_client
+    if _gemini_client is None or _gemini_client.is_closed:
+        _gemini_client = create_gemini_client()
+    return _gemini_client
+
+
+def get_tavily_session() -> aiohttp.ClientSession:
+    """
+    Return the shared Tavily session. Must be called from a running event loop.
+    """
+    global _tavily_session
+    if _tavily_session is None or _tavily_session.closed:
+        _tavily_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=settings.tavily_max_connections,
+                keepalive_timeout=settings.tavily_keepalive_expiry_seconds,
+            ),
+            timeout=aiohttp.ClientTimeout(total=settings.tavily_timeout_seconds),
+        )
+    return _tavily_session
+
+
+async def startup_http_clients():
+    """Open the shared upstream HTTP clients."""
+    client = get_gemini_client()
+    http2 = settings.gemini_http2 and _http2_available()
+    log.info(f"Gemini HTTP client ready (http2={http2}, max_connections={settings.gemini_max_connections})")
+    return client
+
+
+class UpstreamWarmer:
+    """
+    Opens pooled connections to the configured upstreams before the worker
+    reports ready, and keeps idle pools from going cold.
+
+    Connections are opened with requests that cost no quota: the model's
+    metadata for Gemini and the Tavily origin (whatever it answers, the
+    connection stays pooled). `connections` concurrent probes open that
+    many connections (one with HTTP/2). The keep-alive pinger re-probes an
+    upstream that has had no calls for `interval` seconds, which is kept
+    below the pools' keep-alive expiry.
+    """
+    def __init__(self, connections: int = 4, interval: float = 20.0, timeout: float = 5.0, name: str = "upstreams"):
+        self.name = name
+        self.connections = max(1, connections)
+        self.interval = interval
+        self.timeout = timeout
+        self.prewarmed: Dict[str, int] = {}
+        self.prewarm_seconds: Optional[float] = None
+        self.pings = 0
+        self.ping_failures = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def _probes(self) -> Dict[str, Callable[[], Awaitable[Any]]]:
+        """Probe per configured upstream; one without an API key is never called, so it isn't warmed."""
+        probes: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        if settings.gemini_api_key:
+            url = f"{settings.gemini_base_url.rstrip('/')}/models/{settings.gemini_model}"
+            headers = {"x-goog-api-key": settings.gemini_api_key}
+            probes["gemini"] = lambda: get_gemini_client().get(url, headers=headers)
+        if settings.tavily_api_key:
+            parts = urlsplit(settings.tavily_search_url)
+            origin = f"{parts.scheme}://{parts.netloc}/"
+
+            async def probe_tavily():
+                async with get_tavily_session().get(origin) as response:
+                    await response.read()
+            probes["tavily"] = probe_tavily
+        return probes
+
+    async def _open(self, probe: Callable[[], Awaitable[Any]]) -> List[BaseException]:
+        """Run `connections` probes at once; returns the failures."""
+        results = await asyncio.gather(
+            *(asyncio.wait_for(probe(), self.timeout) for _ in range(self.connections)),
+            return_exceptions=True
+        )
+        return [result for result in results if isinstance(result, BaseException)]
+
+    async def prewarm(self) -> Dict[str, int]:
+        """
+        Open pooled connections to every configured upstream. Failures are
+        logged and never fail startup.
+
+        Returns:
+            Upstream name -> connections opened
+        """
+        started = time.perf_counter()
+        probes = self._probes()
+        failures = await asyncio.gather(*(self._open(probe) for probe in probes.values()))
+        for upstream, errors in zip(probes, failures):
+            self.prewarmed[upstream] = self.connections - len(errors)
+            if errors:
+                log.warning(f"Could not prewarm {len(errors)}/{self.connections} {upstream} connections: {errors[0]!r}")
+        self.prewarm_seconds = time.perf_counter() - started
+        log.info(f"Prewarmed upstream connections in {self.prewarm_seconds:.2f}s: {self.prewarmed}")
+        return self.prewarmed
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._keepalive_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _keepalive_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            idle = {
+                upstream: probe for upstream, probe in self._probes().items()
+                if now - upstream_last_call.get(upstream, 0.0) >= self.interval
+            }
+            failures = await asyncio.gather(*(self._open(probe) for probe in idle.values()))
+            for upstream, errors in zip(idle, failures):
+                self.pings += 1
+                self.ping_failures += len(errors)
+                if errors:
+                    log.debug(f"Keep-alive ping to {upstream} failed: {errors[0]!r}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "prewarmed": dict(self.prewarmed),
+            "prewarm_seconds": round(self.prewarm_seconds, 3) if self.prewarm_seconds is not None else None,
+            "keepalive_running": self._task is not None and not self._task.done(),
+            "pings": self.pings,
+            "ping_failures": self.ping_failures,
+        }
+
+
+def _keepalive_interval() -> float:
+    """The configured ping interval, kept below the shorter pool keep-alive expiry (0 stays disabled)."""
+    interval = settings.upstream_keepalive_interval_seconds
+    expiry = min(settings.gemini_keepalive_expiry_seconds, settings.tavily_keepalive_expiry_seconds)
+    return min(interval, expiry * 2 / 3) if interval > 0 else 0.0
+
+
+upstream_warmer = UpstreamWarmer(
+    connections=settings.upstream_prewarm_connections,
+    interval=_keepalive_interval(),
+    timeout=settings.upstream_prewarm_timeout_seconds,
+)
+
+
+async def shutdown_http_clients():
+    """Close the shared upstream HTTP clients and release pooled connections."""
+    global _gemini_client, _tavily_session
+    await upstream_warmer.stop()
+    if _gemini_client is not None and not _gemini_client.is_closed:
+        await _gemini_client.aclose()
+    _gemini_client = None
+    if _tavily_session is not None and not _tavily_session.closed:
+        await _tavily_session.close()
+    _tavily_session = None
+    log.info("Upstream HTTP clients closed")
@@ -0,0 +1,503 @@
+"""
+Durable background jobs.
+
+Jobs are stored in a local SQLite database (WAL mode), so queued work
+survives restarts and several worker processes can share one queue. A
+worker claims a job by taking a lease on it; if the process dies, the
+lease runs out and another worker picks the job up again, up to
+`max_attempts` times. Finished jobs keep their result for a TTL and can
+optionally be POSTed to a callback URL.
+"""
+import asyncio
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+from app.core.logging import log, request_id
+from app.core.resilience import RetryPolicy, UpstreamStatusError, retry_with_backoff
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Runs one job: receives the stored payload and returns the JSON-able result
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    callback_url TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    lease_until REAL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires_at);
+"""
+
+
+class JobQueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class CallbackURLError(ValueError):
+    """Raised for a callback URL the server won't POST job results to."""
+
+
+async def check_callback_url(url: str) -> Optional[str]:
+    """
+    Make sure a client-supplied callback URL can't reach internal services.
+
+    Callbacks must be enabled (JOB_CALLBACKS_ENABLED). A host on
+    JOB_CALLBACK_ALLOWED_HOSTS is accepted as is; without an allowlist the
+    host must resolve only to public addresses (no loopback, private,
+    link-local or reserved ranges, e.g. 169.254.169.254). The callback is
+    then sent to the address checked here (see `pinned_request`), so the
+    name can't be re-resolved to an internal address in between (DNS
+    rebinding).
+
+    Returns:
+        The validated IP address to connect to, or None for an allowlisted host
+
+    Raises:
+        CallbackURLError: If the URL is not allowed
+    """
+    if not settings.job_callbacks_enabled:
+        raise CallbackURLError("Job callbacks are disabled on this server")
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        raise CallbackURLError("Callback URL must be an absolute http(s) URL")
+
+    allowed = {name.strip().lower() for name in settings.job_callback_allowed_hosts.split(",") if name.strip()}
+    if allowed:
+        if host not in allowed:
+            raise CallbackURLError(f"Callback host {host} is not allowed")
+        return
+
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        addresses = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, ValueError) as e:
+        raise CallbackURLError(f"Cannot resolve callback host {host}: {str(e)}") from e
+    ips = [ipaddress.ip_address(address[4][0].split("%", 1)[0]) for address in addresses]
+    if not ips:
+        raise CallbackURLError(f"Cannot resolve callback host {host}")
+    for ip in ips:
+        if not ip.is_global:
+            raise CallbackURLError(f"Callback host {host} resolves to a non-public address")
+    return str(ips[0])
+
+
+def pinned_request(url: str, address: Optional[str]) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+    """
+    Point a callback request at an already validated IP address.
+
+    The URL's host is replaced by `address`. The original name is kept in
+    the Host header and, for https, as the TLS server name, so SNI and
+    certificate checks still apply to it.
+
+    Returns:
+        Tuple of (URL to request, headers, httpx request extensions)
+    """
+    if address is None:
+        return url, {}, {}
+    target = httpx.URL(url)
+    extensions = {"sni_hostname": target.host} if target.scheme == "https" else {}
+    return str(target.copy_with(host=address)), {"Host": target.netloc.decode("ascii")}, extensions
+
+
+class JobStore:
+    """
+    SQLite persistence for jobs. Methods are blocking; JobQueue runs them
+    in a thread so the event loop never waits on disk.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def pending(self) -> int:
+        """Number of queued or running jobs."""
+        with self._lock:
+            row = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchone()
+        return row[0]
+
+    def add(self, payload: Dict[str, Any], callback_url: Optional[str], max_pending: int) -> Dict[str, Any]:
+        """
+        Insert a queued job.
+
+        Raises:
+            JobQueueFullError: If `max_pending` jobs are already queued or running
+        """
+        job_id = os.urandom(16).hex()
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so the capacity check and insert are atomic
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                pending = self._db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+                ).fetchone()[0]
+                if pending >= max_pending:
+                    raise JobQueueFullError(f"Job queue is full ({pending} pending jobs)")
+                self._db.execute(
+                    "INSERT INTO jobs (id, status, payload, callback_url, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, QUEUED, json.dumps(payload), callback_url, now)
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return {"job_id": job_id, "status": QUEUED, "attempts": 0, "created_at": now}
+
+    def claim(self, lease_seconds: float, max_attempts: int, ttl: float) -> Optional[Dict[str, Any]]:
+        """
+        Lease the oldest runnable job: a queued one, or a running one whose
+        lease expired (its worker died). Jobs that already used up
+        `max_attempts` are failed instead of being run again (and kept for `ttl`).
+
+        Returns:
+            The claimed job row, or None if there is nothing to run
+        """
+        now = time.time()
+        with self._lock:
+            # Select and update in one write transaction, so two workers never
+            # claim the same job (UPDATE ... RETURNING needs SQLite 3.35+)
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_until = NULL, expires_at = ? "
+                    "WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                    (FAILED, f"Job abandoned after {max_attempts} attempts", now, now + ttl, RUNNING, now, max_attempts)
+                )
+                row = self._db.execute(
+                    "SELECT id FROM jobs WHERE status = ? OR (status = ? AND lease_until < ?) ORDER BY created_at LIMIT 1",
+                    (QUEUED, RUNNING, now)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, lease_until = ? WHERE id = ?",
+                        (RUNNING, now, now + lease_seconds, row["id"])
+                    )
+                    row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return dict(row) if row is not None else None
+
+    def finish(self, job_id: str, attempt: int, result: Any, error: Optional[str], ttl: float) -> Optional[str]:
+        """
+        Record the outcome of a run, if that run still holds the job's lease.
+        A result that can't be stored as JSON fails the job.
+
+        Args:
+            job_id: The job
+            attempt: The job's attempt count when the run claimed it
+
+        Returns:
+            The recorded status (SUCCEEDED or FAILED), or None if the lease
+            was lost, i.e. another worker claimed the job again after this
+            run's lease expired
+        """
+        encoded = None
+        if error is None:
+            try:
+                encoded = json.dumps(result)
+            except (TypeError, ValueError) as e:
+                error = f"Job result is not JSON-serializable: {str(e)}"
+        now = time.time()
+        status = FAILED if error else SUCCEEDED
+        with self._lock:
+            updated = self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL, expires_at = ? "
+                "WHERE id = ? AND status = ? AND attempts = ?",
+                (status, encoded, error, now, now + ttl, job_id, RUNNING, attempt)
+            ).rowcount
+        return status if updated == 1 else None
+
+    def requeue(self, job_ids: List[str]):
+        """Hand interrupted jobs back to the queue without using up an attempt."""
+        with self._lock:
+            self._db.executemany(
+                "UPDATE jobs SET status = ?, attempts = MAX(attempts - 1, 0), lease_until = NULL WHERE id = ? AND status = ?",
+                [(QUEUED, job_id, RUNNING) for job_id in job_ids]
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)", (job_id, time.time())
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._db.execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),)).rowcount
+
+
+def job_status(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Public view of a stored job."""
+    return {
+        "job_id": row["id"],
+        "status": row["status"],
+        "attempts": row["attempts"],
+        "created_at": row["created_at"],
+        "started_at": row["started_at"],
+        "finished_at": row["finished_at"],
+        "result": json.loads(row["result"]) if row.get("result") else None,
+        "error": row["error"],
+    }
+
+
+class JobQueue:
+    """
+    Worker pool running jobs from a JobStore.
+
+    `concurrency` workers per process claim jobs as they arrive (woken
+    immediately for local submissions, and by polling for jobs queued by
+    other processes or recovered after a crash). Each run is limited to
+    `timeout` seconds; the lease covers that plus a margin.
+    """
+    def __init__(
+        self,
+        store: JobStore,
+        handler: JobHandler,
+        concurrency: int = 4,
+        max_pending: int = 1000,
+        timeout: float = 120.0,
+        max_attempts: int = 3,
+        result_ttl: float = 3600.0,
+        poll_interval: float = 1.0
+    ):
+        self.store = store
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+
+        self._wakeup = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+        self._running: Set[str] = set()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._callback_policy = RetryPolicy(max_retries=2, retry_exceptions=(httpx.TransportError,))
+
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.callbacks_failed = 0
+        self.leases_lost = 0
+
+    async def submit(self, payload: Dict[str, Any], callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queue a job.
+
+        Returns:
+            The new job's status
+
+        Raises:
+            JobQueueFullError: If the queue is at capacity
+        """
+        job = await asyncio.to_thread(self.store.add, payload, callback_url, self.max_pending)
+        self.submitted += 1
+        self._wakeup.set()
+        return {**job, "started_at": None, "finished_at": None, "result": None, "error": None}
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = await asyncio.to_thread(self.store.get, job_id)
+        return job_status(row) if row is not None else None
+
+    async def pending(self) -> int:
+        return await asyncio.to_thread(self.store.pending)
+
+    def start(self):
+        # Redirects are never followed (their target wouldn't be checked), and
+        # connections aren't reused: they are keyed by the pinned IP, so one
+        # could carry another host's TLS session
+        self._client = httpx.AsyncClient(
+            timeout=10.0,
+            follow_redirects=False,
+            limits=httpx.Limits(max_keepalive_connections=0),
+        )
+        self._workers = [asyncio.create_task(self._worker(number)) for number in range(self.concurrency)]
+        self._workers.append(asyncio.create_task(self._purge_loop()))
+
+    async def stop(self):
+        # Runs drop out of _running as they are cancelled, so note them first
+        interrupted = list(self._running)
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if interrupted:
+            # Interrupted by shutdown, not by a failure: run them again after restart
+            log.info(f"Returning {len(interrupted)} interrupted jobs to the queue")
+            await asyncio.to_thread(self.store.requeue, interrupted)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        await asyncio.to_thread(self.store.close)
+
+    async def _worker(self, number: int):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim, self.timeout + 30.0, self.max_attempts, self.result_ttl)
+            except sqlite3.Error as e:
+                log.error(f"Job worker {number} could not claim a job: {str(e)}")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # The job's log records carry its ID the way request records do
+            token = request_id.set(f"job-{job['id']}")
+            try:
+                await self._run(job)
+            except Exception as e:
+                # Never let one job take the worker down; an unrecorded job
+                # is picked up again once its lease expires
+                log.exception(f"Job worker {number} failed handling job {job['id']}: {str(e)}")
+            finally:
+                request_id.reset(token)
+
+    async def _run(self, job: Dict[str, Any]):
+        job_id = job["id"]
+        self._running.add(job_id)
+        try:
+            result, error = None, None
+            try:
+                result = await asyncio.wait_for(self.handler(json.loads(job["payload"])), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                error = f"Job timed out after {self.timeout:.0f}s"
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            # A cancellation (shutdown) propagates with the job still marked running
+
+            status = await asyncio.to_thread(self.store.finish, job_id, job["attempts"], result, error, self.result_ttl)
+        finally:
+            self._running.discard(job_id)
+        if status is None:
+            self.leases_lost += 1
+            log.warning(f"Job {job_id} outlived its lease and was claimed again; discarding this run's outcome")
+            return
+        if status == FAILED:
+            self.failed += 1
+            log.warning(f"Job {job_id} failed (attempt {job['attempts']}): {error or 'result is not JSON-serializable'}")
+        else:
+            self.succeeded += 1
+        if job["callback_url"]:
+            await self._notify(job["callback_url"], job_id)
+
+    async def _notify(self, url: str, job_id: str):
+        """
+        POST the finished job's status to its callback URL. Every attempt
+        re-validates the host and connects to the address it checked.
+        """
+        status = await self.get(job_id)
+
+        async def post():
+            address = await check_callback_url(url)
+            target, headers, extensions = pinned_request(url, address)
+            response = await self._client.post(target, json=status, headers=headers, extensions=extensions)
+            if response.status_code >= 300:
+                raise UpstreamStatusError(f"Callback answered {response.status_code}", status_code=response.status_code)
+
+        try:
+            await retry_with_backoff(post, self._callback_policy, name="Job callback")
+        except CallbackURLError as e:
+            self.callbacks_failed += 1
+            log.warning(f"Not calling back for job {job_id}: {str(e)}")
+        except Exception as e:
+            self.callbacks_failed += 1
+            log.warning(f"Callback for job {job_id} to {url} failed: {str(e)}")
+
+    async def _purge_loop(self):
+        while True:
+            await asyncio.sleep(max(60.0, min(self.result_ttl, 600.0)))
+            try:
+                purged = await asyncio.to_thread(self.store.purge_expired)
+                if purged:
+                    log.debug(f"Purged {purged} expired jobs")
+            except sqlite3.Error as e:
+                log.error(f"Could not purge expired jobs: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": "jobs",
+            "workers": self.concurrency,
+            "running": len(self._running),
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "callbacks_failed": self.callbacks_failed,
+            "leases_lost": self.leases_lost,
+        }
+
+
+_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> Optional[JobQueue]:
+    """The worker's job queue, or None when jobs are disabled or not started."""
+    return _queue
+
+
+async def startup_job_queue(handler: JobHandler):
+    global _queue
+    if not settings.jobs_enabled:
+        return
+    store = await asyncio.to_thread(JobStore, settings.job_db_path)
+    _queue = JobQueue(
+        store,
+        handler,
+        concurrency=settings.job_worker_concurrency,
+        max_pending=settings.job_queue_max_size,
+        timeout=settings.job_timeout_seconds,
+        max_attempts=settings.job_max_attempts,
+        result_ttl=settings.job_result_ttl_seconds,
+        poll_interval=settings.job_poll_interval_seconds,
+    )
+    _queue.start()
+    log.info(f"Job queue started: {_queue.concurrency} workers, database {settings.job_db_path}")
+
+
+async def shutdown_job_queue():
+    global _queue
+    if _queue is not None:
+        await _queue.stop()
+        _queue = None
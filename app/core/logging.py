@@ -1,14 +1,297 @@
+"""
+Application logging: one pipeline for loguru and the standard library.
+
+Records from both stacks go to a single loguru sink that only puts them on
+a queue; a background thread formats them (JSON lines by default) and
+writes them out in batches, so formatting and I/O never run on the event
+loop. When the queue is full, records are dropped instead of blocking.
+
+Every record is tagged with the current request ID (see
+RequestContextMiddleware). INFO and DEBUG records of chatty loggers can be
+sampled with per-logger rates (LOG_SAMPLE_RATES="httpx=0.05,..."); the
+decision is made per request, so a sampled request keeps all of its lines.
+Warnings and errors are always kept.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import re
 import sys
+import threading
+import traceback
+import uuid
+import zlib
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, TextIO
+
 from loguru import logger
+
 from app.core.config import settings
 
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Accepted client-supplied X-Request-ID values; anything else is replaced
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+_WARNING_NO = logger.level("WARNING").no
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """
+    Parse "logger=rate,logger=rate" into a mapping, clamping rates to [0, 1].
+
+    Raises:
+        ValueError: If an entry isn't of the form name=rate
+    """
+    rates: Dict[str, float] = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, rate = entry.partition("=")
+        if not sep or not name.strip():
+            raise ValueError(f"Invalid log sample rate entry: {entry!r}")
+        rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class LogSampler:
+    """
+    Per-logger sampling of records below WARNING. A logger uses the rate of
+    its closest configured ancestor ("httpx" covers "httpx._client").
+    """
+    def __init__(self, rates: Dict[str, float]):
+        self.rates = rates
+        self._resolved: Dict[str, float] = {}
+        self.sampled_out = 0
+
+    def rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            candidate = name
+            while candidate:
+                if candidate in self.rates:
+                    rate = self.rates[candidate]
+                    break
+                candidate = candidate.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def keep(self, name: str, level_no: int, rid: Optional[str]) -> bool:
+        if level_no >= _WARNING_NO:
+            return True
+        rate = self.rate(name)
+        if rate >= 1.0:
+            return True
+        # Hash the request ID, so one request's records are kept or dropped together
+        roll = zlib.crc32(rid.encode()) / 0xFFFFFFFF if rid else random.random()
+        if roll < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+def format_json(record: Dict[str, Any]) -> str:
+    entry: Dict[str, Any] = {
+        "ts": record["time"].isoformat(timespec="milliseconds"),
+        "level": record["level"].name,
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+    }
+    entry.update(record["extra"])
+    if record["exception"] is not None:
+        error_type, error, tb = record["exception"]
+        entry["exception"] = "".join(traceback.format_exception(error_type, error, tb))
+    return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def format_text(record: Dict[str, Any]) -> str:
+    rid = record["extra"].get("request_id")
+    line = (
+        f"{record['time']:%Y-%m-%d %H:%M:%S.%f}"[:-3]
+        + f" | {record['level'].name: <8} | {record['name']}:{record['function']}:{record['line']}"
+        + (f" [{rid}]" if rid else "")
+        + f" - {record['message']}"
+    )
+    if record["exception"] is not None:
+        error_type, error, tb = record["exception"]
+        line += "\n" + "".join(traceback.format_exception(error_type, error, tb)).rstrip("\n")
+    return line
+
+
+class LogWriter:
+    """
+    Loguru sink that queues records for a background writer thread. The
+    thread formats whole batches and writes each with a single call.
+    """
+    _STOP = object()
+
+    def __init__(self, stream: TextIO, json_format: bool = True, max_queue: int = 10000, batch_size: int = 256):
+        self.stream = stream
+        self.format = format_json if json_format else format_text
+        self.batch_size = batch_size
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.written = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def __call__(self, message):
+        try:
+            self.queue.put_nowait(message.record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            batch: List[Dict[str, Any]] = []
+            stopping = item is self._STOP
+            if not stopping:
+                batch.append(item)
+            while len(batch) < self.batch_size and not stopping:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+            self._write(batch)
+            if stopping:
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.format(record))
+            except Exception as e:
+                lines.append(f"Unformattable log record from {record.get('name')}: {e!r}")
+        try:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+            self.written += len(batch)
+        except Exception:
+            self.dropped += len(batch)
+
+    def stop(self, timeout: float = 2.0):
+        """Write out everything queued so far and stop the thread."""
+        if not self._thread.is_alive():
+            return
+        try:
+            self.queue.put(self._STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": "app",
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "sampled_out": sampler.sampled_out if sampler is not None else 0,
+        }
+
+
+class InterceptHandler(logging.Handler):
+    """Forward standard-library log records into loguru, keeping their logger name and call site."""
+    def emit(self, record: logging.LogRecord):
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+        logger.patch(
+            lambda entry: entry.update(name=record.name, function=record.funcName, line=record.lineno)
+        ).opt(exception=record.exc_info).log(level, record.getMessage())
+
+
+def _prepare(record: Dict[str, Any]) -> bool:
+    """
+    Sink filter: tag the request ID and apply sampling. Loguru runs it in
+    the calling thread before the record is queued for the writer thread,
+    which is what lets it read the caller's request_id contextvar.
+    """
+    rid = request_id.get()
+    if rid is not None:
+        record["extra"]["request_id"] = rid
+    return sampler is None or sampler.keep(record["name"] or "", record["level"].no, rid)
+
+
+writer: Optional[LogWriter] = None
+sampler: Optional[LogSampler] = None
+
+
 def setup_logging():
+    global writer, sampler
+    sample_error = None
+    try:
+        sampler = LogSampler(parse_sample_rates(settings.log_sample_rates))
+    except ValueError as e:
+        sampler, sample_error = LogSampler({}), str(e)
+
     logger.remove()
-    logger.add(
+    if writer is not None:
+        writer.stop()
+    writer = LogWriter(
         sys.stdout,
-        level=settings.log_level,
-        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+        json_format=settings.log_format.lower() != "text",
+        max_queue=settings.log_queue_size,
     )
+    # The message is formatted by the writer thread; loguru only renders "{message}"
+    logger.add(writer, level=settings.log_level, filter=_prepare, format=lambda record: "{message}", catch=True)
+    atexit.register(writer.stop)
+
+    # Route the standard library (our services, uvicorn, httpx, ...) into the same sink
+    logging.basicConfig(handlers=[InterceptHandler()], level=settings.log_level.upper(), force=True)
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        stdlib_logger = logging.getLogger(name)
+        stdlib_logger.handlers = []
+        stdlib_logger.propagate = True
+
+    if sample_error:
+        logger.warning(f"Ignoring LOG_SAMPLE_RATES: {sample_error}")
     return logger
 
-log = setup_logging()
\ No newline at end of file
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware giving each HTTP request an ID, taken from a valid
+    X-Request-ID header or generated, which tags every log record written
+    while handling it and is echoed in the X-Request-ID response header.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rid = None
+        for key, value in scope.get("headers", ()):
+            if key == b"x-request-id":
+                candidate = value.decode("latin-1")
+                if _REQUEST_ID_PATTERN.match(candidate):
+                    rid = candidate
+                break
+        rid = rid or uuid.uuid4().hex
+        token = request_id.set(rid)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + [(b"x-request-id", rid.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id.reset(token)
+
+
+log = setup_logging()
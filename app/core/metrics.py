@@ -0,0 +1,325 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms are plain Python objects updated on the
+event loop: recording a sample is a dict lookup and an addition (plus a
+bisect for histograms), so instrumentation can stay on in production.
+Component stats (caches, scheduler, circuits) are read lazily by
+collectors at scrape time instead of being pushed on every call.
+"""
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+from app.core.config import settings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upstream LLM calls range from tens of milliseconds (cache-warm mood) to a
+# minute (long plans), so the buckets span both ends
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+# (sample name suffix, label pairs, value)
+Sample = Tuple[str, Tuple[Tuple[str, str], ...], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs: Iterable[Tuple[str, str]]) -> str:
+    body = ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs)
+    return f"{{{body}}}" if body else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+
+    def labels(self, *values: str, **kwargs: str):
+        """Child metric for one label combination (created on first use)."""
+        key = tuple(str(kwargs[name]) for name in self.labelnames) if kwargs else tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> List[Sample]:
+        samples: List[Sample] = []
+        for key, child in self._children.items():
+            samples.extend(child.samples(tuple(zip(self.labelnames, key))))
+        return samples
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def samples(self, labels) -> List[Sample]:
+        return [("_total", labels, self.value)]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def samples(self, labels) -> List[Sample]:
+        return [("", labels, self.value)]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, labels) -> List[Sample]:
+        samples: List[Sample] = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            cumulative += count
+            samples.append(("_bucket", labels + (("le", _format_value(bound)),), cumulative))
+        samples.append(("_sum", labels, self.sum))
+        samples.append(("_count", labels, self.count))
+        return samples
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+
+# A collector returns complete metric families read at scrape time:
+# (name, type, help, [(suffix, labels, value), ...])
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Collector] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        families = [
+            (metric.name, metric.type_name, metric.documentation, metric.samples())
+            for metric in self._metrics.values()
+        ]
+        for collector in self._collectors:
+            families.extend(collector())
+
+        lines: List[str] = []
+        for name, type_name, documentation, samples in families:
+            # Counter samples carry the _total suffix, so the family is named after it
+            family = f"{name}_total" if type_name == "counter" else name
+            lines.append(f"# HELP {family} {documentation}")
+            lines.append(f"# TYPE {family} {type_name}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        lines.append("")
+        return "\n".join(lines)
+
+
+REGISTRY = Registry()
+
+# HTTP layer
+http_requests = REGISTRY.counter("http_requests", "HTTP requests by route and status", ("method", "route", "status"))
+http_request_duration = REGISTRY.histogram("http_request_duration_seconds", "HTTP request latency until the response starts", ("method", "route"))
+http_requests_in_flight = REGISTRY.gauge("http_requests_in_flight", "HTTP requests currently being handled").labels()
+
+# Unified analysis sections
+section_duration = REGISTRY.histogram("section_duration_seconds", "Latency of unified-analysis sections", ("section", "outcome"))
+section_errors = REGISTRY.counter("section_errors", "Failed unified-analysis sections", ("section",))
+
+# Upstream calls (one observation per attempt, timed from dispatch)
+upstream_duration = REGISTRY.histogram("upstream_request_duration_seconds", "Upstream API call latency by call site", ("call_site", "outcome"))
+upstream_errors = REGISTRY.counter("upstream_errors", "Failed upstream API calls by call site and reason", ("call_site", "reason"))
+upstream_in_flight = REGISTRY.gauge("upstream_requests_in_flight", "Upstream API calls in progress", ("upstream",))
+
+# Prompts whose user input was shortened to fit the template's token budget
+prompt_truncations = REGISTRY.counter("prompt_truncations", "Prompts rendered with a shortened user message", ("template",))
+
+
+# Monotonic time of the latest call to each upstream (read by the keep-alive pinger)
+upstream_last_call: Dict[str, float] = {}
+
+
+class UpstreamCallTimer:
+    """
+    Context manager recording one upstream call's latency, outcome and
+    in-flight count.
+
+        with UpstreamCallTimer("gemini", profile):
+            ...
+    """
+    __slots__ = ("upstream", "call_site", "_started")
+
+    def __init__(self, upstream: str, call_site: str):
+        self.upstream = upstream
+        self.call_site = call_site
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        upstream_last_call[self.upstream] = time.monotonic()
+        if settings.metrics_enabled:
+            upstream_in_flight.labels(self.upstream).inc()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not settings.metrics_enabled:
+            return False
+        upstream_in_flight.labels(self.upstream).dec()
+        if exc_type is None:
+            outcome = "ok"
+        elif issubclass(exc_type, asyncio.CancelledError):
+            # e.g. the losing copy of a hedged request
+            outcome = "cancelled"
+        else:
+            outcome = "error"
+            upstream_errors.labels(self.call_site, exc_type.__name__).inc()
+        upstream_duration.labels(self.call_site, outcome).observe(time.perf_counter() - self._started)
+        return False
+
+
+def stats_collector(
+    prefix: str,
+    sources: Callable[[], Iterable[Dict[str, Any]]],
+    label: str,
+    fields: Dict[str, Tuple[str, str]]
+) -> Collector:
+    """
+    Build a collector exposing numeric fields of components' stats() dicts.
+
+    Args:
+        prefix: Metric name prefix (e.g. "cache")
+        sources: Returns the stats dicts to expose; each needs a "name"
+        label: Label name carrying each component's name
+        fields: stats key -> (metric type, help text)
+    """
+    def collect():
+        stats = list(sources())
+        for key, (type_name, documentation) in fields.items():
+            name = f"{prefix}_{key}"
+            suffix = "_total" if type_name == "counter" else ""
+            samples = [
+                (suffix, ((label, entry["name"]),), float(entry[key]))
+                for entry in stats if key in entry
+            ]
+            yield name, type_name, documentation, samples
+    return collect
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request counts, latency and in-flight
+    requests. Routes are labeled by their template (e.g. /api/v1/jobs/{job_id})
+    so label cardinality stays bounded.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.metrics_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                route = scope.get("route")
+                path = getattr(route, "path", None) or "unmatched"
+                http_request_duration.labels(scope["method"], path).observe(time.perf_counter() - started)
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_requests.labels(scope["method"], path, str(status["code"])).inc()
@@ -0,0 +1,333 @@
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, FrozenSet, List, Optional, Tuple, Type, TypeVar
+
+from app.core.logging import log
+from app.core.tracing import current_span
+
+T = TypeVar("T")
+
+
+class UpstreamStatusError(Exception):
+    """Raised when an upstream API answers with an unexpected HTTP status."""
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LatencyTracker:
+    """
+    Online latency percentiles over a sliding window of recent samples,
+    so estimates follow the upstream as it speeds up or slows down.
+    """
+    def __init__(self, window: int = 512, min_samples: int = 20):
+        self.min_samples = min_samples
+        self.count = 0
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._sorted: Optional[List[float]] = None
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+        self._sorted = None
+        self.count += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Args:
+            q: Quantile between 0 and 1
+
+        Returns:
+            Latency in seconds, or None until min_samples have been seen
+        """
+        if len(self._samples) < self.min_samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self._samples)
+        index = min(len(self._sorted) - 1, int(q * len(self._sorted)))
+        return self._sorted[index]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for transient upstream failures."""
+    def __init__(
+        self,
+        max_retries: int = 2,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        retry_statuses: FrozenSet[int] = frozenset({408, 500, 502, 503, 504}),
+        retry_exceptions: Tuple[Type[BaseException], ...] = (asyncio.TimeoutError,)
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = retry_statuses
+        self.retry_exceptions = retry_exceptions
+
+    def is_retryable(self, error: BaseException) -> bool:
+        if isinstance(error, UpstreamStatusError):
+            return error.status_code in self.retry_statuses
+        return isinstance(error, self.retry_exceptions)
+
+    def delay(self, attempt: int) -> float:
+        """Sleep before retry number `attempt` (1-based): uniform in [0, base * 2^(attempt-1)]."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+async def retry_with_backoff(func: Callable[[], Awaitable[T]], policy: RetryPolicy, name: str = "upstream") -> T:
+    """
+    Call `func`, retrying retryable failures with jittered exponential backoff.
+
+    Args:
+        func: Zero-argument coroutine function performing one attempt
+        policy: Retry policy to apply
+        name: Label used in log messages
+
+    Returns:
+        The first successful result
+
+    Raises:
+        The last error once retries are exhausted or it isn't retryable
+    """
+    attempt = 0
+    while True:
+        try:
+            return await func()
+        except Exception as e:
+            attempt += 1
+            if attempt > policy.max_retries or not policy.is_retryable(e):
+                raise
+            delay = policy.delay(attempt)
+            current_span().set("retries", attempt)
+            log.warning(f"{name} call failed ({type(e).__name__}: {str(e)[:100]}), retry {attempt}/{policy.max_retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+class HedgeBudget:
+    """
+    Caps hedged requests to a fraction of total requests: each request
+    earns `ratio` tokens (up to `max_tokens`) and each hedge spends one.
+    """
+    def __init__(self, ratio: float = 0.05, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = 0.0
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedges_denied = 0
+
+    def record_request(self):
+        self.requests += 1
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            self.hedges += 1
+            return True
+        self.hedges_denied += 1
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedges_denied": self.hedges_denied,
+            "tokens": round(self.tokens, 3),
+        }
+
+
+async def hedge(func: Callable[[], Awaitable[T]], delay: float, budget: HedgeBudget) -> T:
+    """
+    Run `func`; if it hasn't finished after `delay` seconds and the budget
+    allows, start a second copy and return whichever succeeds first. The
+    slower copy is cancelled.
+
+    Args:
+        func: Zero-argument coroutine function performing the call
+        delay: Seconds to wait before hedging (e.g. the observed p95)
+        budget: Shared budget limiting the extra load
+
+    Returns:
+        The first successful result (if both fail, the primary's error)
+    """
+    budget.record_request()
+    primary = asyncio.ensure_future(func())
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not budget.try_spend():
+            return await primary
+
+        secondary = asyncio.ensure_future(func())
+        pending = {primary, secondary}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary:
+                            budget.hedge_wins += 1
+                        return task.result()
+            # Both copies failed; surface the primary's error
+            return primary.result()
+        finally:
+            secondary.cancel()
+    finally:
+        primary.cancel()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+    def __init__(self, name: str, retry_in: float, message: Optional[str] = None):
+        super().__init__(message or f"{name} circuit is open (retry in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Per-upstream circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls fail immediately with CircuitOpenError. Once `reset_timeout` has
+    passed it turns half-open and lets up to `half_open_max_calls` probe
+    calls through: a successful probe closes the circuit, a failed one
+    opens it again. Only errors accepted by `is_failure` count; others
+    (e.g. bad input) pass through without affecting the state.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        is_failure: Optional[Callable[[BaseException], bool]] = None
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self.is_failure = is_failure or (lambda error: isinstance(error, Exception))
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+            log.info(f"{self.name} circuit half-open, probing upstream")
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls would be rejected outright (probes still allowed)."""
+        state = self.state
+        return state == self.OPEN or (state == self.HALF_OPEN and self._probes >= self.half_open_max_calls)
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self.opened += 1
+        log.warning(f"{self.name} circuit opened for {self.reset_timeout:.0f}s")
+
+    def _acquire(self):
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self._probes >= self.half_open_max_calls):
+            self.rejected += 1
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            raise CircuitOpenError(self.name, retry_in)
+        if state == self.HALF_OPEN:
+            self._probes += 1
+        return state
+
+    def _release(self, state: str):
+        """Free the probe slot of a call that ended without a verdict."""
+        if state == self.HALF_OPEN and self._state == self.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def record_success(self):
+        if self._state != self.CLOSED:
+            log.info(f"{self.name} circuit closed")
+        self._state = self.CLOSED
+        self._failures = 0
+
+    def record_failure(self):
+        if self._state == self.HALF_OPEN:
+            self._open()
+            return
+        self._failures += 1
+        if self._state == self.CLOSED and self._failures >= self.failure_threshold:
+            self._open()
+
+    async def call(self, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `func` through the breaker.
+
+        Raises:
+            CircuitOpenError: Without calling `func` while the circuit is open
+        """
+        state = self._acquire()
+        try:
+            result = await func()
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            else:
+                self._release(state)
+            raise
+        except BaseException:
+            # Cancelled: no verdict
+            self._release(state)
+            raise
+        self.record_success()
+        return result
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """Context-manager form of call(), for streamed responses."""
+        state = self._acquire()
+        try:
+            yield
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            else:
+                self._release(state)
+            raise
+        except BaseException:
+            # Cancelled, or the stream was abandoned (GeneratorExit): no verdict
+            self._release(state)
+            raise
+        else:
+            self.record_success()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,317 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from app.core.logging import log
+from app.core.resilience import CircuitOpenError
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    """Dispatch order of queued upstream calls; lower values go first."""
+    CRITICAL = 0    # user-facing answer (grief response)
+    HIGH = 1        # sections other results depend on (mood, daily plan)
+    NORMAL = 2
+    LOW = 3         # decorative extras (relevance explanations)
+
+
+class RateLimitedError(Exception):
+    """Raised by an upstream call that was rejected with HTTP 429."""
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SchedulerOverloadedError(CircuitOpenError):
+    """
+    Raised instead of waiting when the admission queue is full or a queued
+    call passes its deadline. A CircuitOpenError, so callers fall back as
+    they do while the upstream's circuit is open, and the breaker doesn't
+    count it as an upstream failure.
+    """
+    def __init__(self, name: str, retry_in: float, reason: str):
+        super().__init__(name, retry_in, f"{name} scheduler overloaded: {reason} (retry in {retry_in:.0f}s)")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header given either as delta-seconds or an HTTP date.
+
+    Returns:
+        Seconds to wait, or None if the header is missing or malformed
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second."""
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1.0
+
+    def drain(self, now: float):
+        """Discard accumulated tokens so a pause isn't followed by a burst."""
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class PriorityScheduler:
+    """
+    Admission control for calls to a rate-limited upstream API.
+
+    A call is dispatched when a concurrency slot is free, the token bucket
+    has a token, and the upstream hasn't asked us to back off. Queued calls
+    are admitted strictly by priority, then in arrival order. A 429 pauses
+    all dispatch for the Retry-After period (or an exponential backoff),
+    capped at `max_backoff`, and the rejected call is re-queued.
+
+    At most `max_queue` calls wait at once (0: unbounded); when full, the
+    newest call of the lowest priority class is shed, or the new call if
+    none ranks below it. A call still queued after `max_queue_wait` seconds
+    (0: no limit) is shed too. Shed calls fail with SchedulerOverloadedError.
+    """
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        rate_per_minute: float = 0.0,
+        burst: int = 1,
+        max_retries: int = 3,
+        base_backoff: float = 1.0,
+        max_backoff: float = 30.0,
+        max_queue: int = 0,
+        max_queue_wait: float = 0.0
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.bucket = TokenBucket(rate_per_minute / 60.0, burst) if rate_per_minute > 0 else None
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_queue = max(0, max_queue)
+        self.max_queue_wait = max_queue_wait
+
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._queued: Dict[Priority, int] = {priority: 0 for priority in Priority}
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self._wakeup_at = 0.0
+
+        self.dispatched = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.shed = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(self._queued.values())
+
+    @property
+    def in_flight(self) -> int:
+        return self._active
+
+    def _dispatch(self):
+        """Admit queued calls, highest priority first, while budget allows."""
+        while self._waiters and self._active < self.max_concurrency:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                # Cancelled or shed while queued
+                heapq.heappop(self._waiters)
+                continue
+            now = time.monotonic()
+            delay = self._paused_until - now
+            if self.bucket is not None:
+                delay = max(delay, self.bucket.delay(now))
+            if delay > 0:
+                self._schedule_wakeup(delay)
+                return
+            heapq.heappop(self._waiters)
+            if self.bucket is not None:
+                self.bucket.take(now)
+            self._queued[Priority(priority)] -= 1
+            self._active += 1
+            self.dispatched += 1
+            future.set_result(None)
+
+    def _schedule_wakeup(self, delay: float):
+        loop = asyncio.get_running_loop()
+        wake_at = loop.time() + delay
+        if self._wakeup is not None and not self._wakeup.cancelled() and self._wakeup_at <= wake_at:
+            return
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+        self._wakeup_at = wake_at
+        self._wakeup = loop.call_at(wake_at, self._on_wakeup)
+
+    def _on_wakeup(self):
+        self._wakeup = None
+        self._dispatch()
+
+    def _release(self):
+        self._active -= 1
+        self._dispatch()
+
+    def _overloaded(self, reason: str) -> SchedulerOverloadedError:
+        retry_in = max(self.base_backoff, self._paused_until - time.monotonic())
+        return SchedulerOverloadedError(self.name, retry_in, reason)
+
+    def _shed(self, waiter: Tuple[int, int, asyncio.Future], reason: str):
+        """Fail a queued call; it leaves the heap lazily, like a cancelled one."""
+        priority, _, future = waiter
+        if not future.done():
+            future.set_exception(self._overloaded(reason))
+            self._queued[Priority(priority)] -= 1
+            self.shed += 1
+
+    async def _acquire(self, priority: Priority):
+        priority = Priority(priority)
+        if self.max_queue and self.queue_depth >= self.max_queue:
+            # Make room by shedding the newest call of the lowest priority, if it ranks below this one
+            victim = max((waiter for waiter in self._waiters if not waiter[2].done()), default=None)
+            if victim is None or victim[0] <= priority:
+                self.shed += 1
+                raise self._overloaded(f"queue full ({self.max_queue} calls)")
+            self._shed(victim, f"queue full, shed for a {priority.name} call")
+
+        loop = asyncio.get_running_loop()
+        enqueued = time.monotonic()
+        future = loop.create_future()
+        waiter = (int(priority), next(self._sequence), future)
+        heapq.heappush(self._waiters, waiter)
+        self._queued[priority] += 1
+        deadline = None
+        if self.max_queue_wait > 0:
+            deadline = loop.call_later(self.max_queue_wait, self._shed, waiter, f"queued over {self.max_queue_wait:g}s")
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if not future.done() or future.cancelled():
+                self._queued[priority] -= 1
+            elif future.exception() is None:
+                # Admitted just as we were cancelled; hand the slot on
+                self._release()
+            raise
+        finally:
+            if deadline is not None:
+                deadline.cancel()
+
+        waited = time.monotonic() - enqueued
+        self.wait_count += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        if waited > 1.0:
+            log.debug(f"{self.name} call ({priority.name}) queued {waited:.2f}s, queue depth {self.queue_depth}")
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.NORMAL) -> AsyncIterator[None]:
+        """
+        Hold one dispatch slot for the duration of the block, e.g. while a
+        streamed response is consumed. 429s raised inside pause dispatch but
+        are not retried.
+        """
+        await self._acquire(priority)
+        try:
+            yield
+        except RateLimitedError as e:
+            self.rate_limited += 1
+            self.backoff(min(self.max_backoff, e.retry_after if e.retry_after is not None else self.base_backoff))
+            raise
+        finally:
+            self._release()
+
+    async def run(self, func: Callable[[], Awaitable[T]], priority: Priority = Priority.NORMAL) -> T:
+        """
+        Run `func` once admitted, retrying it after 429 responses.
+
+        Args:
+            func: Zero-argument coroutine function performing the call
+            priority: Priority class of the call
+
+        Returns:
+            The call's result
+
+        Raises:
+            RateLimitedError: If the call is still rejected after max_retries
+            SchedulerOverloadedError: If the call is shed while queued
+        """
+        attempt = 0
+        while True:
+            await self._acquire(priority)
+            try:
+                return await func()
+            except RateLimitedError as e:
+                attempt += 1
+                self.rate_limited += 1
+                delay = e.retry_after
+                if delay is None:
+                    delay = self.base_backoff * 2 ** (attempt - 1)
+                # A huge Retry-After mustn't stall every queued call
+                delay = min(self.max_backoff, delay)
+                self.backoff(delay)
+                if attempt > self.max_retries:
+                    raise
+                self.retries += 1
+                log.warning(f"{self.name} rate limited, retrying in {delay:.1f}s (attempt {attempt}/{self.max_retries})")
+            finally:
+                self._release()
+
+    def backoff(self, delay: float):
+        """Pause all dispatch for `delay` seconds."""
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + delay)
+        if self.bucket is not None:
+            self.bucket.drain(now)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "queued_by_priority": {priority.name.lower(): count for priority, count in self._queued.items()},
+            "dispatched": self.dispatched,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "shed": self.shed,
+            "paused_for_seconds": max(0.0, self._paused_until - time.monotonic()),
+            "avg_wait_seconds": self.wait_total / self.wait_count if self.wait_count else 0.0,
+            "max_wait_seconds": self.wait_max,
+        }
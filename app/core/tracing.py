@@ -0,0 +1,373 @@
+"""
+Request-scoped tracing.
+
+A trace is started per HTTP request (subject to sampling) and kept in a
+contextvar, so spans opened anywhere in the request's tasks nest under the
+current one without passing anything around. When a request isn't
+sampled, `span()` returns a shared no-op object after a single contextvar
+lookup, so instrumentation costs almost nothing.
+
+Finished traces are handed to a background exporter that writes JSON lines
+to a file or posts OTLP/HTTP JSON to a collector.
+"""
+import asyncio
+import functools
+import json
+import os
+import random
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.logging import log
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error", "_token")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set(self, key: str, value: Any) -> "Span":
+        self.attributes[key] = value
+        return self
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(exc)
+        if self._token is not None:
+            try:
+                _current_span.reset(self._token)
+            except ValueError:
+                # Exited from a different context (e.g. an abandoned generator)
+                pass
+        return False
+
+    def finish(self, error: Optional[BaseException] = None):
+        if self.end_ns:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {str(error)[:200]}"
+        self.trace.spans.append(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Returned for unsampled requests; every operation does nothing."""
+    __slots__ = ()
+
+    def set(self, key: str, value: Any) -> "_NoopSpan":
+        return self
+
+    def finish(self, error: Optional[BaseException] = None):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    __slots__ = ("trace_id", "spans")
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.spans: List[Span] = []
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def parse_traceparent(header: Optional[str]):
+    """
+    Parse a W3C traceparent header.
+
+    Returns:
+        Tuple of (trace id, parent span id, sampled flag), or None if invalid
+    """
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+def should_sample() -> bool:
+    rate = settings.tracing_sample_rate
+    return settings.tracing_enabled and rate > 0 and (rate >= 1 or random.random() < rate)
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes: Any):
+    """
+    Start the trace for a request and return its root span (or NOOP_SPAN
+    when not sampled). A sampled upstream traceparent forces sampling and
+    continues the caller's trace.
+    """
+    parent = parse_traceparent(traceparent) if settings.tracing_enabled else None
+    if parent is not None and parent[2]:
+        trace, parent_id = Trace(parent[0]), parent[1]
+    elif should_sample():
+        trace, parent_id = Trace(), None
+    else:
+        _current_trace.set(None)
+        return NOOP_SPAN
+    _current_trace.set(trace)
+    return Span(trace, name, parent_id, attributes)
+
+
+def current_span():
+    """The innermost active span, or NOOP_SPAN."""
+    if _current_trace.get() is None:
+        return NOOP_SPAN
+    return _current_span.get() or NOOP_SPAN
+
+
+def span(name: str, **attributes: Any):
+    """
+    Open a child span of the current span; use as a context manager.
+
+        with span("tavily.search", query=query) as s:
+            ...
+            s.set("results", len(videos))
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return NOOP_SPAN
+    parent = _current_span.get()
+    return Span(trace, name, parent.span_id if parent else None, attributes)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator wrapping an async function (e.g. a service method) in a span."""
+    def decorator(func: Callable):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return await func(*args, **kwargs)
+            with span(span_name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Export ---------------------------------------------------------------------
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(traces: List[Trace]) -> Dict[str, Any]:
+    """Encode finished traces as an OTLP/HTTP JSON ExportTraceServiceRequest."""
+    spans = []
+    for trace in traces:
+        for item in trace.spans:
+            encoded = {
+                "traceId": trace.trace_id,
+                "spanId": item.span_id,
+                "name": item.name,
+                "kind": 1,
+                "startTimeUnixNano": str(item.start_ns),
+                "endTimeUnixNano": str(item.end_ns),
+                "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in item.attributes.items()],
+                "status": {"code": 2, "message": item.error} if item.error else {"code": 1},
+            }
+            if item.parent_id:
+                encoded["parentSpanId"] = item.parent_id
+            spans.append(encoded)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": settings.tracing_service_name}}]},
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+class TraceExporter:
+    """
+    Batches finished traces off the request path and ships them to a
+    JSON-lines file or an OTLP/HTTP collector. When the queue is full,
+    traces are dropped rather than slowing requests down.
+    """
+    def __init__(self, kind: str, file_path: str = "", otlp_endpoint: str = "", max_queue: int = 1000, batch_size: int = 64):
+        self.kind = kind
+        self.file_path = Path(file_path) if file_path else None
+        self.otlp_endpoint = otlp_endpoint
+        self.batch_size = batch_size
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.exported = 0
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def submit(self, trace: Trace):
+        try:
+            self.queue.put_nowait(trace)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def start(self):
+        if self.kind == "otlp":
+            self._client = httpx.AsyncClient(timeout=5.0)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        # Flush whatever is still queued
+        await self._flush(self._drain())
+        if self._client is not None:
+            await self._client.aclose()
+
+    def _drain(self) -> List[Trace]:
+        batch = []
+        while not self.queue.empty() and len(batch) < self.batch_size:
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            batch.extend(self._drain())
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Trace]):
+        if not batch:
+            return
+        try:
+            if self.kind == "file" and self.file_path is not None:
+                lines = "".join(json.dumps(item.to_dict()) + "\n" for trace in batch for item in trace.spans)
+                await asyncio.to_thread(self._append, lines)
+            elif self.kind == "otlp" and self._client is not None:
+                response = await self._client.post(self.otlp_endpoint, json=to_otlp(batch))
+                if response.status_code >= 300:
+                    raise RuntimeError(f"collector answered {response.status_code}")
+            self.exported += len(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            log.warning(f"Trace export failed, dropped {len(batch)} traces: {str(e)}")
+
+    def _append(self, lines: str):
+        with open(self.file_path, "a", encoding="utf-8") as handle:
+            handle.write(lines)
+
+
+_exporter: Optional[TraceExporter] = None
+
+
+def finish_trace(root) -> None:
+    """End the request's root span and queue the trace for export."""
+    if root is NOOP_SPAN:
+        return
+    root.finish()
+    if _exporter is not None:
+        _exporter.submit(root.trace)
+
+
+async def startup_tracing():
+    global _exporter
+    kind = settings.tracing_exporter.lower()
+    if not settings.tracing_enabled or kind in ("", "none"):
+        return
+    if kind not in ("file", "otlp"):
+        log.warning(f"Unknown TRACING_EXPORTER '{kind}', traces will not be exported")
+        return
+    _exporter = TraceExporter(kind, settings.tracing_file_path, settings.tracing_otlp_endpoint)
+    _exporter.start()
+    log.info(f"Tracing enabled: sample rate {settings.tracing_sample_rate}, exporting to {kind}")
+
+
+async def shutdown_tracing():
+    global _exporter
+    if _exporter is not None:
+        await _exporter.stop()
+        _exporter = None
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span of each sampled HTTP request."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.tracing_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope.get("headers", ()):
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        root = start_trace("http.request", traceparent, **{"http.method": scope["method"], "http.target": scope["path"]})
+        if root is NOOP_SPAN:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.set("http.status_code", message["status"])
+            await send(message)
+
+        with root:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    root.name = f"{scope['method']} {route}"
+        finish_trace(root)
@@ -1,20 +1,78 @@
-import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes.api import router as api_router
+from app.api.routes.api import router as api_router, run_unified_job
 from app.core.config import settings
-from app.core.logging import log
-import os
-from dotenv import load_dotenv
+from app.core.logging import RequestContextMiddleware, log
+from app.core import logging as app_logging
+from app.core.cache_backends import get_cache_backend, startup_cache_backend, shutdown_cache_backend
+from app.core.http import startup_http_clients, shutdown_http_clients, upstream_warmer
+from app.core.jobs import get_job_queue, startup_job_queue, shutdown_job_queue
+from app.core.metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware, stats_collector
+from app.core.tracing import TracingMiddleware, startup_tracing, shutdown_tracing
+from app.services.container import current_container, startup_container, shutdown_container
+from app.services.gemini_service import (
+    gemini_circuit,
+    gemini_context_cache,
+    gemini_hedge_budget,
+    gemini_latency,
+    gemini_response_cache,
+    gemini_scheduler,
+    gemini_singleflight,
+)
+from app.services.media_service import relevance_text_cache
+from app.services.youtube_service import tavily_circuit, tavily_search_cache, tavily_singleflight
 
-# Load environment variables
-load_dotenv()
+# Application lifespan: startup and shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log.info(f"Starting application in {settings.app_env} environment")
+    log.info(f"API documentation available at /docs and /redoc")
+    
+    # Validate required API keys are set
+    # Removed groq_api_key check since it's no longer used
+    if not settings.gemini_api_key:
+        log.warning("GEMINI_API_KEY is not set. Day planning functionality will be limited.")
+    # Removed youtube_api_key check since it's no longer used
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-)
+    # Open the shared, connection-pooled upstream HTTP clients
+    await startup_http_clients()
+
+    # Start the background span exporter (no-op unless tracing is enabled)
+    await startup_tracing()
+
+    # Open the shared cache tier the per-process caches read through to
+    await startup_cache_backend()
+
+    # Build the shared services once for this worker and check readiness
+    container = await startup_container()
+
+    # Open pooled upstream connections now rather than on the first requests,
+    # optionally send a warm-up generation, and keep idle pools warm
+    await upstream_warmer.prewarm()
+    if settings.upstream_warmup_request:
+        await container.warm_up()
+    upstream_warmer.start()
+
+    # Start the background job workers (recovers jobs left by a previous run)
+    await startup_job_queue(run_unified_job)
+
+    container.serving = True
+    log.info(f"Worker ready: {container.ready}")
+
+    yield
+
+    log.info("Shutting down application")
+    # Report not ready first, so load balancers stop routing here
+    container.serving = False
+    await shutdown_job_queue()
+    await shutdown_container()
+    # Delete the Gemini context caches while the HTTP client is still open
+    await gemini_context_cache.close()
+    await shutdown_cache_backend()
+    await shutdown_tracing()
+    await shutdown_http_clients()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -22,7 +80,8 @@ app = FastAPI(
     description="API for providing emotional support and resources for those experiencing grief",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -34,22 +93,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Startup event handler
-@app.on_event("startup")
-async def startup_event():
-    log.info(f"Starting application in {settings.app_env} environment")
-    log.info(f"API documentation available at /docs and /redoc")
-    
-    # Validate required API keys are set
-    # Removed groq_api_key check since it's no longer used
-    if not settings.gemini_api_key:
-        log.warning("GEMINI_API_KEY is not set. Day planning functionality will be limited.")
-    # Removed youtube_api_key check since it's no longer used
+# Request counts, latency and in-flight requests for /metrics
+app.add_middleware(MetricsMiddleware)
 
-# Shutdown event handler
-@app.on_event("shutdown")
-async def shutdown_event():
-    log.info("Shutting down application")
+# Root span of sampled requests
+app.add_middleware(TracingMiddleware)
+
+# Request ID for log records; added last so it wraps everything else
+app.add_middleware(RequestContextMiddleware)
 
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
@@ -59,13 +110,157 @@ app.include_router(api_router, prefix="/api/v1")
 async def health_check():
     """
     Health check endpoint to verify the API is running.
-    Returns the current environment and status.
+    Returns the current environment and status, plus the Gemini scheduler's
+    queue depth and wait times, latency percentiles, hedging counters,
+    context caching, the response caches and their shared tier, the state
+    of the upstream circuit breakers, the job workers and the log writer.
     """
+    jobs = get_job_queue()
+    cache_backend = get_cache_backend()
     return {
         "status": "healthy",
         "environment": settings.app_env,
-        "version": app.version
+        "version": app.version,
+        "gemini_scheduler": gemini_scheduler.stats(),
+        "gemini_latency": {profile: tracker.stats() for profile, tracker in gemini_latency.items()},
+        "gemini_hedging": gemini_hedge_budget.stats(),
+        "gemini_context_cache": gemini_context_cache.stats(),
+        "caches": {
+            "shared": cache_backend.stats() if cache_backend is not None else None,
+            **{cache.name: cache.stats() for cache in (gemini_response_cache, tavily_search_cache, relevance_text_cache)}
+        },
+        "circuits": {breaker.name: breaker.stats() for breaker in (gemini_circuit, tavily_circuit)},
+        "jobs": {**jobs.stats(), "pending": await jobs.pending()} if jobs is not None else None,
+        "logging": app_logging.writer.stats() if app_logging.writer is not None else None
+    }
+
+# Readiness probe, separate from the liveness-style /health
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness endpoint for load balancers and orchestrators.
+    Returns 200 once this worker has finished its startup phase (services
+    built, upstream connections prewarmed) and its required readiness
+    checks (Gemini) pass; 503 otherwise, including while shutting down.
+    Other checks, such as whether Tavily is configured, are reported but
+    don't affect the status.
+    """
+    container = current_container()
+    ready = container is not None and container.ready
+    body = {
+        "ready": ready,
+        "checks": container.readiness if container is not None else {},
+        "upstreams": upstream_warmer.stats(),
     }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+# Component stats are read when /metrics is scraped
+REGISTRY.register_collector(stats_collector(
+    "cache",
+    lambda: (gemini_response_cache.stats(), tavily_search_cache.stats(), relevance_text_cache.stats()),
+    "cache",
+    {
+        "hits": ("counter", "Cache hits"),
+        "misses": ("counter", "Cache misses"),
+        "shared_hits": ("counter", "Hits served by the shared cache tier"),
+        "shared_errors": ("counter", "Failed shared cache tier operations"),
+        "evictions": ("counter", "Cache evictions"),
+        "hit_ratio": ("gauge", "Cache hit ratio since startup"),
+        "size": ("gauge", "Entries currently cached"),
+    }
+))
+REGISTRY.register_collector(stats_collector(
+    "context_cache",
+    lambda: (gemini_context_cache.stats(),),
+    "cache",
+    {
+        "live": ("gauge", "Live cachedContents handles"),
+        "hits": ("counter", "Calls that referenced a cached system instruction"),
+        "misses": ("counter", "Calls that sent a cacheable instruction inline"),
+        "created": ("counter", "Context caches created"),
+        "refreshed": ("counter", "Context cache TTL extensions"),
+        "invalidated": ("counter", "Handles rejected by the upstream"),
+        "errors": ("counter", "Failed context cache operations"),
+    }
+))
+REGISTRY.register_collector(stats_collector(
+    "singleflight",
+    lambda: (gemini_singleflight.stats(), tavily_singleflight.stats()),
+    "upstream",
+    {
+        "calls": ("counter", "Upstream calls started"),
+        "coalesced": ("counter", "Calls that joined an identical in-flight call"),
+        "in_flight": ("gauge", "Distinct upstream calls in flight"),
+    }
+))
+REGISTRY.register_collector(stats_collector(
+    "scheduler",
+    lambda: (gemini_scheduler.stats(),),
+    "upstream",
+    {
+        "queue_depth": ("gauge", "Calls waiting for admission"),
+        "in_flight": ("gauge", "Admitted calls in progress"),
+        "dispatched": ("counter", "Calls admitted"),
+        "rate_limited": ("counter", "429 responses received"),
+        "retries": ("counter", "Calls re-queued after a 429"),
+        "shed": ("counter", "Calls failed fast because the queue was full or their wait too long"),
+        "avg_wait_seconds": ("gauge", "Mean time spent queued"),
+        "max_wait_seconds": ("gauge", "Longest time spent queued"),
+    }
+))
+REGISTRY.register_collector(stats_collector(
+    "circuit",
+    lambda: (
+        {**breaker.stats(), "open": int(breaker.state != breaker.CLOSED)}
+        for breaker in (gemini_circuit, tavily_circuit)
+    ),
+    "upstream",
+    {
+        "open": ("gauge", "1 while the circuit is open or half-open"),
+        "opened": ("counter", "Times the circuit has opened"),
+        "rejected": ("counter", "Calls rejected while open"),
+    }
+))
+REGISTRY.register_collector(stats_collector(
+    "upstream",
+    lambda: ({**gemini_hedge_budget.stats(), "name": "gemini"},),
+    "upstream",
+    {
+        "hedges": ("counter", "Hedged requests sent"),
+        "hedge_wins": ("counter", "Hedged requests that answered first"),
+        "hedges_denied": ("counter", "Hedges skipped for lack of budget"),
+    }
+))
+REGISTRY.register_collector(stats_collector(
+    "jobs",
+    lambda: (queue.stats() for queue in (get_job_queue(),) if queue is not None),
+    "queue",
+    {
+        "running": ("gauge", "Jobs running in this worker"),
+        "submitted": ("counter", "Jobs submitted to this worker"),
+        "succeeded": ("counter", "Jobs completed successfully"),
+        "failed": ("counter", "Jobs that failed or timed out"),
+        "callbacks_failed": ("counter", "Job callbacks that could not be delivered"),
+        "leases_lost": ("counter", "Job runs that finished after their lease expired"),
+    }
+))
+
+REGISTRY.register_collector(stats_collector(
+    "log_records",
+    lambda: (writer.stats() for writer in (app_logging.writer,) if writer is not None),
+    "pipeline",
+    {
+        "queued": ("gauge", "Log records waiting for the writer thread"),
+        "written": ("counter", "Log records written"),
+        "dropped": ("counter", "Log records dropped because the queue was full"),
+        "sampled_out": ("counter", "INFO/DEBUG log records skipped by sampling"),
+    }
+))
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text-format metrics for this worker."""
+    return Response(content=REGISTRY.render(), headers={"Content-Type": CONTENT_TYPE})
 
 @app.get("/")
 async def root():
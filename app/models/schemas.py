@@ -9,22 +9,40 @@ class MoodAnalysis(BaseModel):
     mood_intensity: int = Field(..., ge=1, le=10, description="Intensity of the mood on a scale of 1-10")
     grief_stage: Optional[str] = Field(None, description="Detected stage of grief if applicable")
 
+# Set by the server when a section was answered from the fallback library;
+# readOnly keeps it out of the schema Gemini is asked to fill
+def _degraded_field():
+    return Field(False, description="True when served from fallbacks while an upstream is unavailable", json_schema_extra={"readOnly": True})
+
 class GriefResponse(BaseModel):
     emotional_validation: str = Field(..., description="Validation of user's emotions")
     mood_analysis: Optional[MoodAnalysis] = Field(None, description="Analysis of the user's emotional state")
     coping_strategies: List[str] = Field(..., description="Suggested coping strategies")
+    degraded: bool = _degraded_field()
 
 class PlannerRequest(BaseModel):
     user_message: str = Field(..., description="User post describing their feelings or situation")
     preferences: Optional[Dict[str, Any]] = Field(default_factory=dict, description="User preferences for planning")
 
+def _plan_items(*keys: str) -> Dict[str, Any]:
+    """Describe the expected keys of plan items (items stay free-form string maps)."""
+    return {
+        "items": {
+            "type": "object",
+            "properties": {key: {"type": "string"} for key in keys},
+            "required": list(keys),
+            "additionalProperties": {"type": "string"},
+        }
+    }
+
 class DailyPlan(BaseModel):
-    morning: List[Dict[str, str]] = Field(..., description="Morning activities")
-    afternoon: List[Dict[str, str]] = Field(..., description="Afternoon activities")
-    evening: List[Dict[str, str]] = Field(..., description="Evening activities")
-    food_recommendations: List[Dict[str, str]] = Field(..., description="Food recommendations")
-    healing_activities: List[Dict[str, str]] = Field(..., description="Healing activities")
-    memory_rituals: Optional[List[Dict[str, str]]] = Field(default_factory=list, description="Memory rituals")
+    morning: List[Dict[str, str]] = Field(..., description="Morning activities", json_schema_extra=_plan_items("time", "activity", "benefit"))
+    afternoon: List[Dict[str, str]] = Field(..., description="Afternoon activities", json_schema_extra=_plan_items("time", "activity", "benefit"))
+    evening: List[Dict[str, str]] = Field(..., description="Evening activities", json_schema_extra=_plan_items("time", "activity", "benefit"))
+    food_recommendations: List[Dict[str, str]] = Field(..., description="Food recommendations", json_schema_extra=_plan_items("meal", "food", "benefit"))
+    healing_activities: List[Dict[str, str]] = Field(..., description="Healing activities", json_schema_extra=_plan_items("activity", "benefit", "how_to"))
+    memory_rituals: Optional[List[Dict[str, str]]] = Field(default_factory=list, description="Memory rituals", json_schema_extra=_plan_items("ritual", "benefit", "guidance"))
+    degraded: bool = _degraded_field()
 
 class MoodBasedMediaRequest(BaseModel):
     user_message: str = Field(..., description="User post to analyze for mood")
@@ -47,6 +65,7 @@ class MediaResponse(BaseModel):
     search_query_used: str = Field(..., description="Search query generated based on mood")
     media_type: str = Field(..., description="Type of media recommended")
     recommendations: List[YouTubeVideo] = Field(..., description="List of recommended media items")
+    degraded: bool = _degraded_field()
 
 
 class unifiedRequest(BaseModel):
@@ -65,9 +84,59 @@ class unifiedRequest(BaseModel):
     media_type: Optional[Literal["music", "videos", "inspiration", "comedy", "relaxation"]] = "music"
     max_media_results: Optional[int] = 5
 
+    # Generate grief analysis, daily plan and the music search query together in
+    # one structured Gemini call (split only when it would exceed the output
+    # budget). Ignored by the streaming and batch endpoints.
+    combined_generation: bool = False
+
 
 class unifiedResponse(BaseModel):
     """A unified response containing multiple analysis results"""
     grief_response: Optional[GriefResponse] = None
     daily_plan: Optional[DailyPlan] = None
-    media_recommendations: Optional[MediaResponse] = None
\ No newline at end of file
+    media_recommendations: Optional[MediaResponse] = None
+    
+    # Per-section error messages for requested sections that failed
+    errors: Optional[Dict[str, str]] = None
+    
+    # True if any section was served from fallbacks
+    degraded: bool = False
+
+class unifiedBatchRequest(BaseModel):
+    """Several unified requests analyzed together"""
+    items: List[unifiedRequest] = Field(..., min_length=1, description="Requests to analyze")
+
+
+class unifiedBatchItem(BaseModel):
+    """Outcome of one item of a batch, identified by its position in the request"""
+    index: int
+    result: Optional[unifiedResponse] = None
+    error: Optional[str] = None
+
+
+class unifiedBatchResponse(BaseModel):
+    """Results of a batch, in request order"""
+    results: List[unifiedBatchItem]
+    total_items: int
+    unique_items: int = Field(..., description="Distinct requests actually analyzed after deduplication")
+
+
+class JobRequest(unifiedRequest):
+    """A unified request run in the background"""
+    callback_url: Optional[str] = Field(
+        None,
+        pattern=r"^https?://",
+        description="URL that receives the job status (POST, JSON) once the job finishes; "
+                    "only accepted when the server enables callbacks, and never for internal addresses"
+    )
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    attempts: int = Field(0, description="Times a worker has started the job")
+    created_at: float = Field(..., description="Unix timestamp")
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[unifiedResponse] = None
+    error: Optional[str] = None
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, Field, create_model
+
+from app.core.config import settings
+from app.core.tracing import current_span, traced
+from app.models.schemas import DailyPlan, GriefResponse, unifiedRequest
+from app.services.gemini_service import GENERATION_PROFILES, GeminiService
+from app.services.prompts import combined_system_prompt, render_prompt
+
+log = logging.getLogger(__name__)
+
+# Fields Gemini fills for the grief section (degraded is set by the server)
+GRIEF_FIELDS: Tuple[str, ...] = tuple(name for name in GriefResponse.model_fields if name != "degraded")
+
+FIELD_DEFINITIONS: Dict[str, Tuple[Any, Any]] = {
+    **{name: (GriefResponse.model_fields[name].annotation, GriefResponse.model_fields[name]) for name in GRIEF_FIELDS},
+    "daily_plan": (DailyPlan, Field(..., description="Supportive daily plan")),
+    "detected_mood": (str, Field(..., description="Primary emotional state")),
+    "search_query": (str, Field(..., description="YouTube search query for supportive music")),
+}
+
+
+def _profile_tokens(profile: str) -> int:
+    return GENERATION_PROFILES[profile]["maxOutputTokens"]
+
+
+@dataclass(frozen=True)
+class CombinedUnit:
+    """One section's share of a combined call: its output fields and reserved output tokens."""
+    section: str
+    fields: Tuple[str, ...]
+    output_tokens: int
+
+
+@lru_cache(maxsize=32)
+def combined_model(fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """Response model with exactly `fields`; one class per combination, so its Gemini schema is cached."""
+    return create_model("CombinedAnalysis", **{field: FIELD_DEFINITIONS[field] for field in fields})
+
+
+def plan_units(request: unifiedRequest) -> List[CombinedUnit]:
+    """
+    The units a combined call has to produce for a request. Each reserves
+    the output tokens its section would be allowed on its own.
+    """
+    units = []
+    if request.include_grief_analysis:
+        units.append(CombinedUnit("grief_response", GRIEF_FIELDS, _profile_tokens("grief")))
+    if request.include_daily_plan:
+        units.append(CombinedUnit("daily_plan", ("daily_plan",), _profile_tokens("plan")))
+    if request.include_media_recommendations:
+        if request.include_grief_analysis:
+            # The mood comes from the grief section's mood_analysis
+            units.append(CombinedUnit("media_recommendations", ("search_query",), _profile_tokens("query")))
+        else:
+            units.append(CombinedUnit(
+                "media_recommendations",
+                ("detected_mood", "search_query"),
+                _profile_tokens("mood") + _profile_tokens("query")
+            ))
+    return units
+
+
+def split_units(units: List[CombinedUnit], budget: int) -> List[List[CombinedUnit]]:
+    """
+    Pack units into as few calls as possible without any call reserving
+    more than `budget` output tokens (first-fit decreasing). A unit larger
+    than the budget gets a call of its own.
+
+    Returns:
+        Groups of units, one per Gemini call, in request order within a group
+    """
+    groups: List[List[CombinedUnit]] = []
+    for unit in sorted(units, key=lambda unit: unit.output_tokens, reverse=True):
+        for group in groups:
+            if sum(member.output_tokens for member in group) + unit.output_tokens <= budget:
+                group.append(unit)
+                break
+        else:
+            groups.append([unit])
+    order = {unit.section: position for position, unit in enumerate(units)}
+    return [sorted(group, key=lambda unit: order[unit.section]) for group in groups]
+
+
+class CombinedService:
+    """
+    Generates several sections of a unified request with one structured
+    Gemini call: the grief analysis, the daily plan and the music search
+    query (plus the mood when no grief analysis is requested). Sections are
+    split across concurrent calls only when their combined output would
+    exceed the output-token budget.
+    """
+    def __init__(self, gemini_service: Optional[GeminiService] = None, max_output_tokens: Optional[int] = None):
+        self.gemini_service = gemini_service or GeminiService()
+        self.max_output_tokens = max_output_tokens or settings.combined_max_output_tokens
+
+    @staticmethod
+    def applies(request: unifiedRequest) -> bool:
+        """True when combining saves calls, i.e. at least two sections are requested."""
+        return request.combined_generation and len(plan_units(request)) >= 2
+
+    @traced("CombinedService.generate")
+    async def generate(self, request: unifiedRequest) -> Dict[str, Any]:
+        """
+        Generate the requested sections' model output.
+
+        Args:
+            request: The unified request
+
+        Returns:
+            Dictionary with "grief_response" and "daily_plan" (section
+            dicts), "detected_mood" and "search_query" for those that were
+            requested. Parts of a failed call are missing, so the caller can
+            produce them separately.
+
+        Raises:
+            The first call's error if every call failed
+        """
+        groups = split_units(plan_units(request), self.max_output_tokens)
+        current_span().set("combined.calls", len(groups))
+        if len(groups) > 1:
+            log.info(f"Combined generation split into {len(groups)} calls: {[[unit.section for unit in group] for group in groups]}")
+
+        results = await asyncio.gather(
+            *(self._generate_group(request, group) for group in groups),
+            return_exceptions=True
+        )
+        parts: Dict[str, Any] = {}
+        errors: List[BaseException] = []
+        for group, result in zip(groups, results):
+            if isinstance(result, BaseException):
+                log.warning(f"Combined call for {[unit.section for unit in group]} failed: {str(result)}")
+                errors.append(result)
+                continue
+            parts.update(result)
+        if errors and not parts:
+            raise errors[0]
+
+        if not parts.get("detected_mood") and parts.get("grief_response"):
+            mood_analysis = parts["grief_response"].get("mood_analysis") or {}
+            parts["detected_mood"] = mood_analysis.get("detected_mood")
+        return parts
+
+    async def _generate_group(self, request: unifiedRequest, group: List[CombinedUnit]) -> Dict[str, Any]:
+        fields = tuple(field for unit in group for field in unit.fields)
+        prompt = render_prompt(
+            "combined",
+            user_message=request.user_message,
+            preferences=json.dumps(request.plan_preferences or {})
+        )
+        output = await self.gemini_service.generate_structured(
+            prompt,
+            combined_model(fields),
+            profile="combined",
+            system_instruction=combined_system_prompt(fields),
+            max_output_tokens=min(self.max_output_tokens, sum(unit.output_tokens for unit in group))
+        )
+        data = output.model_dump()
+
+        parts: Dict[str, Any] = {}
+        for unit in group:
+            if unit.section == "grief_response":
+                parts["grief_response"] = GriefResponse.model_validate({field: data[field] for field in GRIEF_FIELDS}).model_dump()
+            elif unit.section == "daily_plan":
+                parts["daily_plan"] = data["daily_plan"]
+            else:
+                parts["search_query"] = data["search_query"].strip().replace('"', '')
+                if "detected_mood" in data:
+                    parts["detected_mood"] = data["detected_mood"].strip()
+        return parts
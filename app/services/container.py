@@ -0,0 +1,164 @@
+import asyncio
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.http import get_gemini_client
+from app.core.logging import log
+from app.core.scheduler import Priority
+from app.services.combined_service import CombinedService
+from app.services.gemini_service import GeminiService
+from app.services.grief_service import GriefService
+from app.services.llm_service import LLMService
+from app.services.media_service import MediaService
+from app.services.planner_service import PlannerService
+from app.services.mood_classifier import MoodClassifier, get_mood_classifier
+from app.services.youtube_service import YouTubeService
+
+
+class ServiceUnavailableError(RuntimeError):
+    """Raised when a service could not be built at startup (e.g. missing API key)."""
+
+
+class ServiceContainer:
+    """
+    Application-scoped holder for the API services.
+
+    Every service is built once per worker and they all share a single
+    GeminiService, and therefore the same pooled HTTP client.
+    """
+    # Readiness checks that gate `ready`; the others are informational
+    # (without Tavily only video search is degraded)
+    REQUIRED_CHECKS = ("gemini_configured", "gemini_client_open")
+
+    def __init__(self):
+        self.gemini_service: Optional[GeminiService] = None
+        self.youtube_service: Optional[YouTubeService] = None
+        self.llm_service: Optional[LLMService] = None
+        self.grief_service: Optional[GriefService] = None
+        self.planner_service: Optional[PlannerService] = None
+        self.media_service: Optional[MediaService] = None
+        self.combined_service: Optional[CombinedService] = None
+        self.mood_classifier: Optional[MoodClassifier] = None
+        self.startup_error: Optional[str] = None
+        self.readiness: Dict[str, bool] = {}
+        # Set by the lifespan once startup (including upstream prewarm) is done
+        self.serving = False
+
+    def build(self) -> "ServiceContainer":
+        """
+        Construct the service graph. A missing Gemini key leaves the
+        Gemini-backed services unset instead of failing startup, matching
+        the previous per-request behaviour.
+        """
+        self.youtube_service = YouTubeService()
+        # Loaded once per worker from the on-disk model file
+        self.mood_classifier = get_mood_classifier()
+        try:
+            self.gemini_service = GeminiService()
+        except ValueError as e:
+            self.startup_error = str(e)
+            log.warning(f"Gemini-backed services are unavailable: {self.startup_error}")
+            return self
+
+        self.llm_service = LLMService(gemini_service=self.gemini_service)
+        self.grief_service = GriefService(llm_service=self.llm_service, mood_classifier=self.mood_classifier)
+        self.planner_service = PlannerService(gemini_service=self.gemini_service, mood_classifier=self.mood_classifier)
+        self.media_service = MediaService(
+            gemini_service=self.gemini_service,
+            youtube_service=self.youtube_service,
+            mood_classifier=self.mood_classifier
+        )
+        self.combined_service = CombinedService(gemini_service=self.gemini_service)
+        log.info("Service container built")
+        return self
+
+    async def check_readiness(self) -> Dict[str, bool]:
+        """
+        Run the startup readiness checks.
+
+        Returns:
+            Dictionary mapping check name to whether it passed
+        """
+        self.readiness = {
+            "gemini_configured": self.gemini_service is not None,
+            "tavily_configured": bool(self.youtube_service and self.youtube_service.tavily_api_key),
+            "gemini_client_open": not get_gemini_client().is_closed,
+        }
+        for name, passed in self.readiness.items():
+            if not passed:
+                required = name in self.REQUIRED_CHECKS
+                log.warning(f"Readiness check failed: {name}{'' if required else ' (informational)'}")
+        return self.readiness
+
+    async def warm_up(self) -> bool:
+        """
+        Send one minimal Gemini generation through the full call path before
+        serving traffic. A failure is logged and doesn't block startup.
+
+        Returns:
+            Whether the warm-up request succeeded
+        """
+        if self.gemini_service is None:
+            return False
+        try:
+            await asyncio.wait_for(
+                self.gemini_service.generate_content(
+                    "Reply with OK.",
+                    profile="mood",
+                    max_output_tokens=1,
+                    priority=Priority.LOW
+                ),
+                settings.upstream_prewarm_timeout_seconds
+            )
+            return True
+        except Exception as e:
+            log.warning(f"Gemini warm-up request failed: {str(e)}")
+            return False
+
+    @property
+    def ready(self) -> bool:
+        return self.serving and bool(self.readiness) and all(
+            self.readiness.get(name, False) for name in self.REQUIRED_CHECKS
+        )
+
+    def require(self, name: str):
+        """
+        Return a built service by attribute name.
+
+        Raises:
+            ServiceUnavailableError: If the service could not be built
+        """
+        service = getattr(self, name)
+        if service is None:
+            raise ServiceUnavailableError(self.startup_error or f"{name} is not available")
+        return service
+
+
+_container: Optional[ServiceContainer] = None
+
+
+def get_container() -> ServiceContainer:
+    """Return the worker's service container, building it lazily if needed."""
+    global _container
+    if _container is None:
+        _container = ServiceContainer().build()
+    return _container
+
+
+def current_container() -> Optional[ServiceContainer]:
+    """The worker's service container if it has been built, without building it."""
+    return _container
+
+
+async def startup_container() -> ServiceContainer:
+    """Build the container and run readiness checks before serving traffic."""
+    global _container
+    _container = ServiceContainer().build()
+    await _container.check_readiness()
+    log.info(f"Service readiness: {_container.readiness} (env={settings.app_env})")
+    return _container
+
+
+async def shutdown_container():
+    global _container
+    _container = None
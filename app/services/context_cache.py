@@ -0,0 +1,204 @@
+"""
+Gemini context caching for static system instructions.
+
+A large, fixed instruction block is uploaded once as a `cachedContents`
+resource. Later requests then reference it by name, so the upstream skips
+re-reading (and re-billing at the full rate) the prefix on every call.
+
+Handles are created lazily in the background on first use. Until a handle
+exists, and whenever caching fails, the instruction is sent inline as
+`systemInstruction`. A user request never waits on cache management.
+Handles are extended shortly before they expire and deleted on shutdown.
+"""
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+
+from app.core.logging import log
+from app.services.prompts import estimate_tokens
+
+# Statuses generateContent answers with when a referenced cache has expired
+# or was deleted; the request is then repeated with the inline instruction
+CACHE_REJECTED_STATUSES = frozenset({400, 403, 404})
+# Stop handing out a handle this long before it expires
+EXPIRY_SAFETY_SECONDS = 5.0
+
+
+@dataclass
+class _Handle:
+    text: str
+    name: Optional[str] = None
+    expires_at: float = 0.0
+    retry_at: float = 0.0
+    task: Optional[asyncio.Task] = None
+
+
+class GeminiContextCache:
+    """
+    Maps system instructions to live Gemini cachedContents names.
+
+    lookup() never blocks: it returns a usable handle or None and schedules
+    whatever creation or refresh is due.
+    """
+    def __init__(
+        self,
+        api_root: str,
+        model: str,
+        api_key: str,
+        client_factory: Callable[[], httpx.AsyncClient],
+        ttl: float = 3600.0,
+        refresh_margin: float = 300.0,
+        min_tokens: int = 1024,
+        retry_after: float = 600.0,
+        timeout: float = 30.0,
+        enabled: bool = True,
+        name: str = "gemini_context"
+    ):
+        self.name = name
+        self.api_root = api_root.rstrip("/")
+        self.model = model
+        self.headers = {"Content-Type": "application/json", "x-goog-api-key": api_key}
+        self.client_factory = client_factory
+        self.ttl = ttl
+        self.refresh_margin = min(refresh_margin, ttl / 2)
+        self.min_tokens = min_tokens
+        self.retry_after = retry_after
+        self.timeout = timeout
+        self.enabled = enabled and bool(api_key)
+
+        self._handles: Dict[str, _Handle] = {}
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.refreshed = 0
+        self.invalidated = 0
+        self.errors = 0
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def cacheable(self, text: str) -> bool:
+        return self.enabled and estimate_tokens(text) >= self.min_tokens
+
+    def lookup(self, text: str) -> Optional[str]:
+        """
+        Return the cachedContents name for an instruction, if one is live.
+
+        Args:
+            text: The system instruction
+
+        Returns:
+            Resource name (e.g. "cachedContents/abc123"), or None to send the
+            instruction inline
+        """
+        if not self.cacheable(text):
+            return None
+        key = self._key(text)
+        handle = self._handles.get(key)
+        if handle is None:
+            handle = self._handles[key] = _Handle(text)
+        now = time.monotonic()
+
+        if handle.name is not None and now < handle.expires_at - EXPIRY_SAFETY_SECONDS:
+            if now >= handle.expires_at - self.refresh_margin and now >= handle.retry_at:
+                self._schedule(handle, self._refresh)
+            self.hits += 1
+            return handle.name
+
+        handle.name = None
+        if now >= handle.retry_at:
+            self._schedule(handle, self._create)
+        self.misses += 1
+        return None
+
+    def invalidate(self, text: str):
+        """Forget a handle the upstream no longer accepts; it is recreated on next use."""
+        handle = self._handles.get(self._key(text))
+        if handle is not None and handle.name is not None:
+            log.warning(f"Gemini rejected cached content {handle.name}, sending the instruction inline")
+            handle.name = None
+            self.invalidated += 1
+
+    def _schedule(self, handle: _Handle, operation: Callable[[_Handle], Any]):
+        if handle.task is not None:
+            return
+        handle.task = asyncio.ensure_future(operation(handle))
+        handle.task.add_done_callback(lambda _: setattr(handle, "task", None))
+
+    async def _send(self, method: str, url: str, payload: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        request = self.client_factory().request(method, url, headers=self.headers, json=payload)
+        return await asyncio.wait_for(request, self.timeout)
+
+    async def _create(self, handle: _Handle):
+        started = time.monotonic()
+        payload = {
+            "model": f"models/{self.model}",
+            "systemInstruction": {"parts": [{"text": handle.text}]},
+            "ttl": f"{int(self.ttl)}s",
+        }
+        try:
+            response = await self._send("POST", f"{self.api_root}/cachedContents", payload)
+            if response.status_code != 200:
+                raise ValueError(f"status {response.status_code}: {response.text[:200]}")
+            handle.name = response.json()["name"]
+            handle.expires_at = started + self.ttl
+            self.created += 1
+            log.info(f"Created Gemini context cache {handle.name} (~{estimate_tokens(handle.text)} tokens)")
+        except Exception as e:
+            self.errors += 1
+            handle.retry_at = time.monotonic() + self.retry_after
+            log.warning(f"Could not create Gemini context cache, sending instructions inline for {self.retry_after:.0f}s: {str(e)}")
+
+    async def _refresh(self, handle: _Handle):
+        started = time.monotonic()
+        name = handle.name
+        try:
+            response = await self._send("PATCH", f"{self.api_root}/{name}?updateMask=ttl", {"ttl": f"{int(self.ttl)}s"})
+            if response.status_code in CACHE_REJECTED_STATUSES:
+                # Already gone upstream; recreate on next use
+                handle.name = None
+                return
+            if response.status_code != 200:
+                raise ValueError(f"status {response.status_code}: {response.text[:200]}")
+            handle.expires_at = started + self.ttl
+            self.refreshed += 1
+            log.debug(f"Extended Gemini context cache {name}")
+        except Exception as e:
+            # The handle stays usable until it expires; try again later
+            self.errors += 1
+            handle.retry_at = time.monotonic() + min(self.retry_after, self.refresh_margin / 2)
+            log.warning(f"Could not extend Gemini context cache {name}: {str(e)}")
+
+    async def close(self):
+        """Cancel pending cache operations and delete live handles upstream."""
+        handles = list(self._handles.values())
+        self._handles.clear()
+        for handle in handles:
+            if handle.task is not None:
+                handle.task.cancel()
+        for handle in handles:
+            if handle.name is None or time.monotonic() >= handle.expires_at:
+                continue
+            try:
+                await self._send("DELETE", f"{self.api_root}/{handle.name}")
+            except Exception as e:
+                log.debug(f"Could not delete Gemini context cache {handle.name}: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "name": self.name,
+            "enabled": self.enabled,
+            "live": sum(1 for handle in self._handles.values() if handle.name is not None and now < handle.expires_at),
+            "hits": self.hits,
+            "misses": self.misses,
+            "created": self.created,
+            "refreshed": self.refreshed,
+            "invalidated": self.invalidated,
+            "errors": self.errors,
+        }
@@ -0,0 +1,307 @@
+"""
+Precomputed degraded responses, served when an upstream circuit is open.
+
+Everything here is built and validated once at import, so a fallback is a
+dictionary lookup plus a copy. Responses are keyed by a small set of
+canonical moods (the local classifier's labels); free-form mood text is
+mapped onto them with `normalize_mood`.
+"""
+import copy
+import re
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote_plus
+
+from app.models.schemas import DailyPlan, GriefResponse, MediaResponse, MoodAnalysis
+
+DEFAULT_MOOD = "default"
+
+# Words a model (or a user) might use for each canonical mood
+_MOOD_SYNONYMS: Dict[str, List[str]] = {
+    "grieving": ["grieving", "grief", "loss", "mourning", "bereaved", "bereavement", "heartbroken"],
+    "sad": ["sad", "sadness", "sorrow", "unhappy", "down", "depressed", "melancholy", "hurt"],
+    "lonely": ["lonely", "loneliness", "alone", "isolated", "abandoned"],
+    "anxious": ["anxious", "anxiety", "worried", "worry", "nervous", "fear", "afraid", "scared", "panic"],
+    "overwhelmed": ["overwhelmed", "stressed", "stress", "exhausted", "burnout", "tired", "drained"],
+    "angry": ["angry", "anger", "frustrated", "frustration", "furious", "mad", "resentful", "irritated"],
+    "hopeful": ["hopeful", "hope", "optimistic", "encouraged", "healing"],
+    "happy": ["happy", "happiness", "joy", "joyful", "excited", "excitement", "cheerful", "elated"],
+    "grateful": ["grateful", "gratitude", "thankful", "blessed", "appreciative"],
+    "calm": ["calm", "peaceful", "peace", "content", "relaxed", "serene", "okay"],
+}
+_SYNONYM_INDEX = {word: mood for mood, words in _MOOD_SYNONYMS.items() for word in words}
+_WORD = re.compile(r"[a-z]+")
+
+
+def normalize_mood(mood: Optional[str]) -> str:
+    """Map free-form mood text (e.g. "deep sadness") to a canonical mood key."""
+    if not mood:
+        return DEFAULT_MOOD
+    for word in _WORD.findall(mood.lower()):
+        canonical = _SYNONYM_INDEX.get(word)
+        if canonical:
+            return canonical
+    return DEFAULT_MOOD
+
+
+# Grief responses -----------------------------------------------------------
+
+_VALIDATION = {
+    "grieving": "Losing someone you love changes everything, and the pain you're feeling reflects how much they mattered to you. There is no right way or timeline to grieve.",
+    "sad": "It's okay to feel sad. What you're carrying is real, and you don't have to hide it or rush to feel better.",
+    "lonely": "Feeling alone can be one of the hardest parts of what you're going through. Your need for connection is completely valid.",
+    "anxious": "It makes sense that you feel anxious when so much feels uncertain. Your mind is trying to protect you, even if it feels exhausting.",
+    "overwhelmed": "It sounds like you're carrying a lot right now. Feeling overwhelmed is a natural response when there is simply too much at once.",
+    "angry": "Anger is a natural and valid response, especially when things feel unfair. It often shows how much something matters to you.",
+    "hopeful": "It's wonderful that you're noticing some hope. Those moments are worth honoring, even if harder days still come.",
+    "happy": "It's lovely to hear you're feeling good. Moments of joy are worth savoring and celebrating.",
+    "grateful": "The gratitude you're feeling is a beautiful thing to notice, and it can be a real source of strength.",
+    "calm": "It's good to hear you're feeling steady. Moments of calm are a valuable place to rest and recharge.",
+    DEFAULT_MOOD: "Thank you for sharing how you're feeling. Whatever you're experiencing right now is valid, and you don't have to go through it alone.",
+}
+
+_DIFFICULT_STRATEGIES = [
+    "1. Take five slow breaths, breathing in for four counts and out for six, to help your body settle.",
+    "2. Reach out to one person you trust, even with a short message, and let them know how you're doing.",
+    "3. Write down what you're feeling for ten minutes without editing or judging it.",
+    "4. Take care of one basic need right now: drink some water, eat something nourishing, or step outside.",
+    "5. Be gentle with yourself today and set one small, achievable goal rather than a long to-do list.",
+]
+
+_STRATEGIES = {
+    "grieving": [
+        "1. Allow yourself to feel the waves of grief as they come, without judging how you 'should' feel.",
+        "2. Set aside a quiet moment to remember your loved one, such as looking at a photo or writing them a letter.",
+        "3. Share a memory with someone who also knew them, or with a friend who will listen.",
+        "4. Keep a simple daily routine for meals, rest and movement to give your days some structure.",
+        "5. Consider a grief support group or counselor; talking with others who understand can ease the weight.",
+    ],
+    "lonely": [
+        "1. Send a message to one person you haven't spoken to in a while, even just to say hello.",
+        "2. Spend some time in a shared space like a park, library or cafe to feel connected to others.",
+        "3. Look for a local or online support group where people share similar experiences.",
+        "4. Create a small comforting ritual for the hardest time of day, such as a warm drink and music.",
+        "5. Write down what kind of connection you miss most, and one small step toward it.",
+    ],
+    "anxious": [
+        "1. Ground yourself with the 5-4-3-2-1 exercise: notice five things you see, four you feel, three you hear, two you smell and one you taste.",
+        "2. Breathe slowly, making each exhale longer than the inhale, for two minutes.",
+        "3. Write your worries down and mark which ones you can act on today and which you can set aside.",
+        "4. Limit news and social media for the rest of the day.",
+        "5. Move your body gently, such as a short walk or stretching, to release nervous energy.",
+    ],
+    "overwhelmed": [
+        "1. Write down everything on your mind, then choose just one thing to do next.",
+        "2. Ask someone for help with one specific task; people often want to help but don't know how.",
+        "3. Take a ten-minute break away from screens and demands.",
+        "4. Let go of anything that can wait until tomorrow, and give yourself permission to do less.",
+        "5. Protect your sleep tonight by winding down early and keeping your evening quiet.",
+    ],
+    "angry": [
+        "1. Give the energy somewhere to go: a brisk walk, a run, or some physical work.",
+        "2. Write an unsent letter saying everything you feel, without holding back.",
+        "3. Pause before responding to anyone while the feeling is strong; take twenty slow breaths first.",
+        "4. Name what the anger is protecting, such as hurt, fear or a sense of injustice.",
+        "5. Talk it through with someone who can listen without trying to fix it.",
+    ],
+}
+
+_POSITIVE_STRATEGIES = [
+    "1. Take a moment to notice and name what is helping you feel this way.",
+    "2. Write down three good things from today so you can return to them on harder days.",
+    "3. Share the feeling with someone you care about.",
+    "4. Do something that keeps the momentum going, such as time outdoors or a favorite activity.",
+    "5. Plan one small thing to look forward to this week.",
+]
+
+_STRATEGIES["sad"] = _DIFFICULT_STRATEGIES
+_STRATEGIES[DEFAULT_MOOD] = _DIFFICULT_STRATEGIES
+for _mood in ("hopeful", "happy", "grateful", "calm"):
+    _STRATEGIES[_mood] = _POSITIVE_STRATEGIES
+
+
+# Daily plans ---------------------------------------------------------------
+
+def _item(**fields: str) -> Dict[str, str]:
+    return fields
+
+
+_BASE_PLAN: Dict[str, List[Dict[str, str]]] = {
+    "morning": [
+        _item(time="8:00 AM", activity="Wake gently and take five slow, deep breaths before getting up", benefit="Starts the day with calm rather than urgency"),
+        _item(time="8:30 AM", activity="Drink a glass of water and eat a simple breakfast", benefit="Steadies energy and mood"),
+        _item(time="9:30 AM", activity="Take a short walk outside or sit by a window", benefit="Daylight and fresh air support mood and sleep"),
+    ],
+    "afternoon": [
+        _item(time="12:30 PM", activity="Eat a balanced lunch away from screens", benefit="Gives your mind and body a real break"),
+        _item(time="2:00 PM", activity="Do one small, manageable task", benefit="Provides a sense of accomplishment"),
+        _item(time="4:00 PM", activity="Check in with a friend or family member", benefit="Keeps you connected to people who care"),
+    ],
+    "evening": [
+        _item(time="6:30 PM", activity="Prepare a comforting dinner", benefit="Nourishes you and adds structure to the evening"),
+        _item(time="8:00 PM", activity="Read, listen to calm music or take a warm shower", benefit="Helps you wind down"),
+        _item(time="9:30 PM", activity="Put screens away and reflect on one thing that went okay today", benefit="Supports restful sleep"),
+    ],
+    "food_recommendations": [
+        _item(meal="Breakfast", food="Oatmeal with berries and nuts", benefit="Slow-release energy and antioxidants"),
+        _item(meal="Lunch", food="Vegetable soup with whole-grain bread", benefit="Warm, easy to digest and nourishing"),
+        _item(meal="Dinner", food="Salmon or lentils with leafy greens", benefit="Omega-3s and magnesium support mood"),
+        _item(meal="Snack", food="A banana with a handful of almonds", benefit="Steady blood sugar between meals"),
+    ],
+    "healing_activities": [
+        _item(activity="Journaling", benefit="Helps process emotions", how_to="Write freely for ten minutes about whatever is on your mind"),
+        _item(activity="Breathing exercise", benefit="Calms the nervous system", how_to="Breathe in for four counts, hold for four, out for six; repeat five times"),
+        _item(activity="Gentle movement", benefit="Releases tension held in the body", how_to="Stretch or walk slowly for fifteen minutes"),
+    ],
+    "memory_rituals": [],
+}
+
+_LOSS_RITUALS = [
+    _item(ritual="Light a candle in their memory", benefit="Creates a quiet moment of connection", guidance="Choose a set time each evening and sit with the candle for a few minutes"),
+    _item(ritual="Look through photos or keepsakes", benefit="Honors the bond you shared", guidance="Go at your own pace and stop whenever you need to"),
+    _item(ritual="Write a letter to your loved one", benefit="Gives words to what is unsaid", guidance="Tell them about your day, or what you miss most"),
+]
+
+_PLAN_OVERRIDES: Dict[str, Dict[str, List[Dict[str, str]]]] = {
+    "grieving": {
+        "memory_rituals": _LOSS_RITUALS,
+        "afternoon": [
+            _item(time="12:30 PM", activity="Eat a simple lunch, even if your appetite is low", benefit="Grief is physically draining; food helps you cope"),
+            _item(time="2:00 PM", activity="Spend time on something your loved one enjoyed", benefit="Keeps their memory close in a gentle way"),
+            _item(time="4:00 PM", activity="Call or message someone who knew them", benefit="Shared memories ease the isolation of grief"),
+        ],
+    },
+    "lonely": {
+        "afternoon": [
+            _item(time="12:30 PM", activity="Have lunch somewhere with other people around, like a cafe or park", benefit="Being among others eases isolation"),
+            _item(time="2:00 PM", activity="Join an online or local group around an interest", benefit="Opens the door to new connections"),
+            _item(time="4:00 PM", activity="Call someone rather than texting", benefit="Hearing a voice feels more connecting"),
+        ],
+    },
+    "anxious": {
+        "healing_activities": [
+            _item(activity="5-4-3-2-1 grounding", benefit="Brings attention back to the present", how_to="Name five things you see, four you feel, three you hear, two you smell, one you taste"),
+            _item(activity="Worry time", benefit="Contains anxious thoughts", how_to="Set a 15-minute window to write worries down, then close the notebook"),
+            _item(activity="Progressive muscle relaxation", benefit="Releases physical tension", how_to="Tense and release each muscle group from feet to head"),
+        ],
+    },
+    "overwhelmed": {
+        "afternoon": [
+            _item(time="12:30 PM", activity="Take a full lunch break with no tasks", benefit="Rest makes the rest of the day more manageable"),
+            _item(time="2:00 PM", activity="Pick the single most important task and do only that", benefit="Reduces the sense of everything at once"),
+            _item(time="4:00 PM", activity="Ask someone to take one thing off your plate", benefit="Shares the load"),
+        ],
+    },
+    "angry": {
+        "morning": [
+            _item(time="8:00 AM", activity="Start with some vigorous movement, like a brisk walk or workout", benefit="Gives strong feelings a physical outlet"),
+            _item(time="8:45 AM", activity="Eat a steady breakfast", benefit="Low blood sugar can make anger harder to manage"),
+            _item(time="9:30 AM", activity="Write down what is making you angry", benefit="Turns a swirl of feelings into something clearer"),
+        ],
+    },
+}
+for _mood in ("hopeful", "happy", "grateful", "calm"):
+    _PLAN_OVERRIDES[_mood] = {
+        "evening": [
+            _item(time="6:30 PM", activity="Share a meal or call with someone you enjoy", benefit="Good moments grow when they're shared"),
+            _item(time="8:00 PM", activity="Write down three good things from today", benefit="Strengthens positive feelings"),
+            _item(time="9:30 PM", activity="Wind down with a relaxing routine", benefit="Protects your sleep and energy"),
+        ],
+    }
+
+
+# Media: curated YouTube searches (no Tavily or Gemini call needed) ----------
+
+MEDIA_QUERIES: Dict[str, List[str]] = {
+    "grieving": ["healing piano music for grief and loss", "gentle music for comfort after loss", "peaceful instrumental music for remembrance"],
+    "sad": ["soothing music for sadness", "gentle acoustic music for hard days", "calming piano for emotional healing"],
+    "lonely": ["comforting music for loneliness", "warm acoustic songs for company", "soft instrumental music for quiet evenings"],
+    "anxious": ["calming music for anxiety relief", "slow breathing meditation music", "relaxing ambient music to reduce stress"],
+    "overwhelmed": ["relaxing music to unwind and destress", "peaceful nature sounds for calm", "slow instrumental music for rest"],
+    "angry": ["calming music to release anger", "meditation music to let go of frustration", "soothing instrumental music for tension"],
+    "hopeful": ["uplifting instrumental music for hope", "inspiring music for new beginnings", "gentle uplifting acoustic songs"],
+    "happy": ["upbeat celebration music for happy moments", "feel good music playlist", "joyful acoustic songs"],
+    "grateful": ["peaceful music for gratitude and reflection", "uplifting gratitude meditation music", "warm acoustic songs of thanks"],
+    "calm": ["peaceful ambient music for relaxation", "calm piano music for focus", "gentle nature sounds for peace"],
+    DEFAULT_MOOD: ["calming music for emotional healing", "relaxing piano music", "peaceful instrumental music"],
+}
+
+
+def _search_link(query: str) -> Dict[str, Any]:
+    return {
+        "title": query.capitalize(),
+        "description": f"YouTube search for \"{query}\"",
+        "thumbnail_url": "",
+        "video_url": f"https://www.youtube.com/results?search_query={quote_plus(query)}",
+        "video_id": "",
+        "relevance_explanation": "A curated search for music that may support how you're feeling right now.",
+    }
+
+
+# Precompute and validate everything once ------------------------------------
+
+def _build_plan(mood: str) -> Dict[str, Any]:
+    plan = {**_BASE_PLAN, **_PLAN_OVERRIDES.get(mood, {})}
+    return DailyPlan.model_validate({**plan, "degraded": True}).model_dump()
+
+
+_GRIEF_FALLBACKS: Dict[str, Dict[str, Any]] = {
+    mood: GriefResponse(
+        emotional_validation=_VALIDATION[mood],
+        mood_analysis=None,
+        coping_strategies=_STRATEGIES[mood],
+        degraded=True,
+    ).model_dump()
+    for mood in _VALIDATION
+}
+_PLAN_FALLBACKS: Dict[str, Dict[str, Any]] = {mood: _build_plan(mood) for mood in _VALIDATION}
+_MEDIA_FALLBACKS: Dict[str, List[Dict[str, Any]]] = {
+    mood: [_search_link(query) for query in queries] for mood, queries in MEDIA_QUERIES.items()
+}
+
+
+def fallback_grief_response(mood: Optional[str] = None, intensity: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Degraded grief response for a mood.
+
+    Args:
+        mood: Detected mood, if any (free-form text is normalized)
+        intensity: Optional 1-10 intensity for mood_analysis
+
+    Returns:
+        GriefResponse-shaped dictionary flagged as degraded
+    """
+    response = copy.deepcopy(_GRIEF_FALLBACKS[normalize_mood(mood)])
+    if mood:
+        response["mood_analysis"] = MoodAnalysis(
+            detected_mood=mood,
+            mood_intensity=intensity or 5,
+            grief_stage=None
+        ).model_dump()
+    return response
+
+
+def fallback_daily_plan(mood: Optional[str] = None) -> Dict[str, Any]:
+    """Curated daily plan template for a mood, flagged as degraded."""
+    return copy.deepcopy(_PLAN_FALLBACKS[normalize_mood(mood)])
+
+
+def fallback_search_query(mood: Optional[str] = None) -> str:
+    """Curated music search query for a mood (used instead of asking Gemini)."""
+    return MEDIA_QUERIES[normalize_mood(mood)][0]
+
+
+def fallback_media(mood: Optional[str] = None, max_results: int = 5) -> Dict[str, Any]:
+    """
+    Degraded media recommendations: curated YouTube searches for the mood.
+
+    Returns:
+        MediaResponse-shaped dictionary flagged as degraded
+    """
+    key = normalize_mood(mood)
+    return MediaResponse(
+        detected_mood=mood or "unknown",
+        search_query_used=MEDIA_QUERIES[key][0],
+        media_type="music",
+        recommendations=copy.deepcopy(_MEDIA_FALLBACKS[key][:max_results]),
+        degraded=True,
+    ).model_dump()
@@ -1,34 +1,198 @@
-import os
 import json
-import logging
-import requests
+import time
 import asyncio
-from typing import Dict, Any, Optional
-from dotenv import load_dotenv
+from collections import defaultdict
+import hashlib
+import logging
+import httpx
+from pydantic import BaseModel, ValidationError
+from typing import Dict, Any, AsyncIterator, Optional, Type, TypeVar
 
 from app.core.logging import log
 from app.core.config import settings
+from app.core.http import get_gemini_client
+from app.core.cache import TieredCache
+from app.core.singleflight import SingleFlight
+from app.core.scheduler import PriorityScheduler, Priority, RateLimitedError, parse_retry_after
+from app.core.metrics import UpstreamCallTimer
+from app.core.tracing import current_span, span
+from app.core.resilience import CircuitBreaker, HedgeBudget, LatencyTracker, RetryPolicy, UpstreamStatusError, hedge, retry_with_backoff
+from app.utils.json_extract import JSONExtractionError, extract_json
+from app.utils.gemini_schema import gemini_response_schema
+from app.models.schemas import DailyPlan
+from app.services.context_cache import CACHE_REJECTED_STATUSES, GeminiContextCache
+from app.services.prompts import render_prompt, system_prompt
+
+DEFAULT_GENERATION_CONFIG: Dict[str, Any] = {
+    "temperature": 0.4,
+    "topP": 0.8,
+    "topK": 40,
+    "maxOutputTokens": 8192
+}
+
+# Per call-site overrides of the default generationConfig, so small tasks
+# don't reserve (or sample) a full 8192-token answer
+GENERATION_PROFILES: Dict[str, Dict[str, Any]] = {
+    "default": {},
+    "grief": {"temperature": 0.5, "maxOutputTokens": 1024},
+    "plan": {"temperature": 0.5, "maxOutputTokens": 3072},
+    "mood": {"temperature": 0.0, "maxOutputTokens": 16},
+    "query": {"temperature": 0.3, "maxOutputTokens": 48},
+    "relevance": {"temperature": 0.4, "maxOutputTokens": 768},
+    "relevance_single": {"temperature": 0.4, "maxOutputTokens": 96},
+    "combined": {"temperature": 0.5, "maxOutputTokens": 8192},
+}
+
+# Scheduler priority of each call site; user-facing text goes first
+PROFILE_PRIORITIES: Dict[str, Priority] = {
+    "default": Priority.NORMAL,
+    "grief": Priority.CRITICAL,
+    "plan": Priority.HIGH,
+    "mood": Priority.HIGH,
+    "query": Priority.NORMAL,
+    "relevance": Priority.LOW,
+    "relevance_single": Priority.LOW,
+    "combined": Priority.CRITICAL,
+}
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# Response cache for call sites that opt in (read through to the shared tier,
+# so workers reuse each other's answers), and the coalescing layer that lets
+# concurrent identical prompts share one upstream request
+gemini_response_cache = TieredCache(
+    max_entries=settings.gemini_cache_max_entries,
+    ttl=settings.gemini_cache_ttl_seconds,
+    name="gemini_responses",
+    timeout=settings.cache_shared_timeout_seconds,
+    retry_after=settings.cache_shared_retry_seconds,
+)
+gemini_singleflight = SingleFlight(name="gemini")
+# Every upstream call from this worker is admitted through one scheduler
+gemini_scheduler = PriorityScheduler(
+    name="gemini",
+    max_concurrency=settings.gemini_max_concurrency,
+    rate_per_minute=settings.gemini_requests_per_minute,
+    burst=settings.gemini_rate_burst,
+    max_retries=settings.gemini_rate_limit_retries,
+    max_backoff=settings.gemini_rate_limit_max_backoff_seconds,
+    max_queue=settings.gemini_max_queue,
+    max_queue_wait=settings.gemini_max_queue_wait_seconds,
+)
 
-# Load environment variables if not already loaded
-load_dotenv()
+# Transient failures (5xx, timeouts, dropped connections) are retried with
+# jittered backoff; slow calls may be hedged within a shared budget
+gemini_retry_policy = RetryPolicy(
+    max_retries=settings.gemini_max_retries,
+    base_delay=settings.gemini_retry_base_seconds,
+    max_delay=settings.gemini_retry_max_seconds,
+    retry_exceptions=(asyncio.TimeoutError, httpx.TransportError),
+)
+gemini_hedge_budget = HedgeBudget(ratio=settings.gemini_hedge_budget_ratio)
+# Upstream latency per generation profile; drives the hedge delay
+gemini_latency: Dict[str, LatencyTracker] = defaultdict(
+    lambda: LatencyTracker(min_samples=settings.gemini_hedge_min_samples)
+)
+# Opens after repeated outage-like failures (after retries), so callers fail
+# fast and services can answer from their fallbacks
+gemini_circuit = CircuitBreaker(
+    name="gemini",
+    failure_threshold=settings.gemini_circuit_failure_threshold,
+    reset_timeout=settings.gemini_circuit_reset_seconds,
+    half_open_max_calls=settings.circuit_half_open_max_calls,
+    is_failure=lambda error: isinstance(error, RateLimitedError) or gemini_retry_policy.is_retryable(error),
+)
+
+# Static system instructions are cached upstream as cachedContents once
+# they are large enough for the API to accept
+gemini_context_cache = GeminiContextCache(
+    api_root=settings.gemini_base_url,
+    model=settings.gemini_model,
+    api_key=settings.gemini_api_key,
+    client_factory=get_gemini_client,
+    ttl=settings.gemini_context_cache_ttl_seconds,
+    refresh_margin=settings.gemini_context_cache_refresh_seconds,
+    min_tokens=settings.gemini_context_cache_min_tokens,
+    retry_after=settings.gemini_context_cache_retry_seconds,
+    timeout=settings.gemini_request_timeout_seconds,
+    enabled=settings.gemini_context_cache_enabled,
+)
+
+SAFETY_SETTINGS = [
+    {
+        "category": "HARM_CATEGORY_HARASSMENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_HATE_SPEECH",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    }
+]
 
 class GeminiService:
     """
     Service class for interacting with Google's Gemini-2.0-flash API
     """
-    def __init__(self):
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[TieredCache] = None,
+        singleflight: Optional[SingleFlight] = None,
+        scheduler: Optional[PriorityScheduler] = None,
+        circuit: Optional[CircuitBreaker] = None,
+        context_cache: Optional[GeminiContextCache] = None
+    ):
         self.api_key = settings.gemini_api_key
         if not self.api_key:
             log.error("GEMINI_API_KEY not found in environment variables")
             raise ValueError("GEMINI_API_KEY not configured in .env file")
         # Use model from settings
         self.model = settings.gemini_model
-        self.base_url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent"
+        api_root = settings.gemini_base_url.rstrip("/")
+        self.base_url = f"{api_root}/models/{self.model}:generateContent"
+        self.stream_url = f"{api_root}/models/{self.model}:streamGenerateContent?alt=sse"
         self.headers = {
             "Content-Type": "application/json",
             "x-goog-api-key": self.api_key
         }
-        log.info(f"GeminiService initialized with {self.model} model")
+        # Optional explicit client; otherwise the shared pooled client is used
+        self._client = client
+        # Response cache for call sites that opt in; any object with async get/set works
+        self.cache = cache if cache is not None else gemini_response_cache
+        self.singleflight = singleflight if singleflight is not None else gemini_singleflight
+        self.scheduler = scheduler if scheduler is not None else gemini_scheduler
+        self.circuit = circuit if circuit is not None else gemini_circuit
+        self.context_cache = context_cache if context_cache is not None else gemini_context_cache
+        log.debug(f"GeminiService initialized with {self.model} model")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The pooled async HTTP client used for Gemini requests."""
+        if self._client is not None and not self._client.is_closed:
+            return self._client
+        return get_gemini_client()
+
+    async def detect_mood(self, user_message: str) -> str:
+        """
+        Detect the primary mood of a message with a short, single-word prompt.
+        
+        Args:
+            user_message: The user's post describing their feelings
+        
+        Returns:
+            A single word or short phrase describing the mood
+        """
+        mood_prompt = render_prompt("mood", user_message=user_message)
+        mood_response = await self.generate_content(mood_prompt, use_cache=True, profile="mood")
+        return mood_response.strip()
 
     async def generate_daily_plan(self, user_message: str, preferences: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
@@ -41,143 +205,313 @@ class GeminiService:
         Returns:
             Daily plan data as a dictionary
         """
-        preferences_str = json.dumps(preferences) if preferences else "{}"
-        
-        prompt = f"""
-        Below is a message from someone experiencing grief. Create a compassionate and personalized daily plan 
-        that supports their emotional well-being.
-        
-        USER MESSAGE: {user_message}
-        
-        USER PREFERENCES: {preferences_str}
-        
-        As an empathetic wellness planner, create a detailed daily structure that acknowledges their grief
-        while helping them move through their day with care and purpose. The plan should include:
-        
-        1. Morning activities focused on gentle self-care and setting intentions
-        2. Afternoon activities that provide healthy distraction and purpose
-        3. Evening activities for reflection and rest
-        4. Food recommendations that support emotional well-being
-        5. Healing activities distributed throughout the day
-        6. Memory rituals that honor their loss
-        
-        Format your response as strict JSON with no additional explanatory text:
-        
-        {{
-            "morning": [
-                {{"time": "8:00 AM", "activity": "Activity description", "benefit": "Why this helps"}}
-            ],
-            "afternoon": [
-                {{"time": "1:00 PM", "activity": "Activity description", "benefit": "Why this helps"}}
-            ],
-            "evening": [
-                {{"time": "7:00 PM", "activity": "Activity description", "benefit": "Why this helps"}}
-            ],
-            "food_recommendations": [
-                {{"meal": "Breakfast/Lunch/Dinner/Snack", "suggestion": "Food suggestion", "benefit": "Emotional/nutritional benefit"}}
-            ],
-            "healing_activities": [
-                {{"time": "Time", "activity": "Healing activity", "benefit": "Why this helps"}}
-            ],
-            "memory_rituals": [
-                {{"activity": "Ritual description", "purpose": "Emotional purpose"}}
-            ]
-        }}
-        """
-        
+        prompt = render_prompt(
+            "daily_plan_detailed",
+            user_message=user_message,
+            preferences=json.dumps(preferences) if preferences else "{}"
+        )
+
         try:
             log.info("Generating daily plan with Gemini")
-            response = await self.generate_content(prompt)
-            
-            # Extract JSON from response
-            response_text = response
-            
-            # Find JSON in the response if it's wrapped in markdown code blocks
-            if "```json" in response_text:
-                json_start = response_text.find("```json") + 7
-                json_end = response_text.find("```", json_start)
-                response_text = response_text[json_start:json_end].strip()
-            elif "```" in response_text:
-                json_start = response_text.find("```") + 3
-                json_end = response_text.find("```", json_start)
-                response_text = response_text[json_start:json_end].strip()
-                
-            log.debug(f"Gemini raw response: {response_text[:100]}...")
-            
-            # Parse the JSON response
-            plan_data = json.loads(response_text)
-            return plan_data
+            plan = await self.generate_structured(
+                prompt,
+                DailyPlan,
+                profile="plan",
+                system_instruction=system_prompt("daily_plan_detailed")
+            )
+            return plan.model_dump()
             
-        except json.JSONDecodeError as e:
+        except ValueError as e:
             log.error(f"Error parsing Gemini response as JSON: {str(e)}")
-            log.debug(f"Raw response: {response_text}")
             raise ValueError("Failed to parse Gemini response as valid JSON")
         except Exception as e:
             log.error(f"Error generating daily plan with Gemini: {str(e)}")
             raise
 
-    async def generate_content(self, prompt: str) -> str:
+    @staticmethod
+    def _normalize_prompt(prompt: str) -> str:
+        """Collapse whitespace so indentation differences don't change the cache key."""
+        return " ".join(prompt.split())
+
+    @staticmethod
+    def build_generation_config(
+        profile: str = "default",
+        response_model: Optional[Type[BaseModel]] = None,
+        temperature: Optional[float] = None,
+        max_output_tokens: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Build the generationConfig for a call site.
+        
+        Args:
+            profile: Name of an entry in GENERATION_PROFILES
+            response_model: Optional pydantic model to constrain the output to
+            temperature: Optional override of the profile's temperature
+            max_output_tokens: Optional override of the profile's output limit
+            
+        Returns:
+            generationConfig dictionary
+        """
+        if profile not in GENERATION_PROFILES:
+            raise ValueError(f"Unknown generation profile: {profile}")
+        generation_config = {**DEFAULT_GENERATION_CONFIG, **GENERATION_PROFILES[profile]}
+        if temperature is not None:
+            generation_config["temperature"] = temperature
+        if max_output_tokens is not None:
+            generation_config["maxOutputTokens"] = max_output_tokens
+        if response_model is not None:
+            generation_config["responseMimeType"] = "application/json"
+            generation_config["responseSchema"] = gemini_response_schema(response_model)
+        return generation_config
+
+    def _cache_key(self, prompt: str, generation_config: Dict[str, Any], system_instruction: Optional[str] = None) -> str:
+        key_material = json.dumps(
+            [self.model, self._normalize_prompt(prompt), generation_config, system_instruction],
+            sort_keys=True,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+    async def generate_content(
+        self,
+        prompt: str,
+        use_cache: bool = False,
+        cache_ttl: Optional[float] = None,
+        profile: str = "default",
+        response_model: Optional[Type[BaseModel]] = None,
+        priority: Optional[Priority] = None,
+        timeout: Optional[float] = None,
+        system_instruction: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_output_tokens: Optional[int] = None
+    ) -> str:
         """
         Generate content using Google's Gemini API with gemini-2.0-flash model
         
         Args:
             prompt: The prompt to send to the model
+            use_cache: Opt in to the response cache for prompts whose answer
+                depends only on the prompt text (e.g. mood -> search query)
+            cache_ttl: Optional per-call TTL override in seconds
+            profile: Generation profile for the call site (see GENERATION_PROFILES)
+            response_model: Optional pydantic model; requests JSON output
+                constrained to its schema
+            priority: Scheduler priority (defaults to the profile's)
+            timeout: Per-attempt timeout in seconds (defaults to settings)
+            system_instruction: Optional static instructions, sent as the
+                systemInstruction (or a cachedContents handle for it)
+            temperature: Optional override of the profile's temperature
+            max_output_tokens: Optional override of the profile's output limit
             
         Returns:
             String response from Gemini
         """
+        if priority is None:
+            priority = PROFILE_PRIORITIES.get(profile, Priority.NORMAL)
+        generation_config = self.build_generation_config(profile, response_model, temperature, max_output_tokens)
+        use_cache = use_cache and settings.gemini_cache_enabled and self.cache is not None
+        request_key = self._cache_key(prompt, generation_config, system_instruction)
+
+        if use_cache:
+            cached = await self.cache.get(request_key)
+            if cached is not None:
+                log.debug("Gemini response cache hit")
+                return cached
+
+        async def request():
+            content_text = await self._call_upstream(prompt, generation_config, profile, priority, timeout, system_instruction)
+            if use_cache:
+                await self.cache.set(request_key, content_text, ttl=cache_ttl)
+            return content_text
+
+        if not settings.singleflight_enabled:
+            return await request()
+        # Identical prompts already in flight share a single upstream call
+        return await self.singleflight.do(request_key, request)
+
+    async def _call_upstream(
+        self,
+        prompt: str,
+        generation_config: Dict[str, Any],
+        profile: str,
+        priority: Priority,
+        timeout: Optional[float],
+        system_instruction: Optional[str] = None
+    ) -> str:
+        """
+        One logical Gemini call: scheduled, time-limited, retried on
+        transient failures and hedged when it outlives the profile's p95.
+        Raises CircuitOpenError immediately while the circuit is open.
+        """
+        timeout = timeout or settings.gemini_request_timeout_seconds
+        tracker = gemini_latency[profile]
+
+        async def timed_request() -> str:
+            # Timed from dispatch, so queueing in the scheduler isn't counted
+            started = time.monotonic()
+            try:
+                with UpstreamCallTimer("gemini", profile), span("gemini.attempt", call_site=profile):
+                    content_text = await asyncio.wait_for(
+                        self._request_content(prompt, generation_config, system_instruction), timeout
+                    )
+            except asyncio.TimeoutError:
+                # Count the timeout so the percentiles still see the slow tail
+                tracker.observe(timeout)
+                log.warning(f"Gemini call ({profile}) timed out after {timeout:.1f}s")
+                raise
+            tracker.observe(time.monotonic() - started)
+            return content_text
+
+        async def attempt() -> str:
+            return await self.scheduler.run(timed_request, priority)
+
+        async def hedged_attempt() -> str:
+            delay = tracker.percentile(settings.gemini_hedge_percentile) if settings.gemini_hedging_enabled else None
+            if delay is None:
+                return await attempt()
+            return await hedge(attempt, delay, gemini_hedge_budget)
+
+        with span("gemini.call", call_site=profile, prompt_chars=len(prompt), priority=priority.name.lower()) as call_span:
+            content_text = await self.circuit.call(lambda: retry_with_backoff(hedged_attempt, gemini_retry_policy, name="Gemini"))
+            call_span.set("response_chars", len(content_text))
+            return content_text
+
+    async def generate_structured(
+        self,
+        prompt: str,
+        response_model: Type[ModelT],
+        profile: str = "default",
+        use_cache: bool = False,
+        system_instruction: Optional[str] = None,
+        max_output_tokens: Optional[int] = None
+    ) -> ModelT:
+        """
+        Generate output constrained to a pydantic model's schema and validate
+        it into the model. Heuristic JSON extraction is only a fallback.
+        
+        Args:
+            prompt: The prompt to send to the model
+            response_model: Pydantic model class the output must match
+            profile: Generation profile for the call site
+            use_cache: Opt in to the response cache
+            system_instruction: Optional static instructions for the model
+            max_output_tokens: Optional override of the profile's output limit
+            
+        Returns:
+            Validated instance of response_model
+        """
+        response_text = await self.generate_content(
+            prompt,
+            use_cache=use_cache,
+            profile=profile,
+            response_model=response_model,
+            system_instruction=system_instruction,
+            max_output_tokens=max_output_tokens
+        )
+        try:
+            return response_model.model_validate_json(response_text)
+        except ValidationError as e:
+            log.warning(f"Schema-constrained output did not validate as {response_model.__name__}, trying extraction: {str(e)[:200]}")
         try:
-            payload = {
-                "contents": [
-                    {
-                        "role": "user",
-                        "parts": [{"text": prompt}]
-                    }
-                ],
-                "generationConfig": {
-                    "temperature": 0.4,
-                    "topP": 0.8,
-                    "topK": 40,
-                    "maxOutputTokens": 8192
-                },
-                "safetySettings": [
-                    {
-                        "category": "HARM_CATEGORY_HARASSMENT",
-                        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                    },
-                    {
-                        "category": "HARM_CATEGORY_HATE_SPEECH",
-                        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                    },
-                    {
-                        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                    },
-                    {
-                        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                    }
-                ]
-            }
+            return response_model.model_validate(extract_json(response_text, expect=dict))
+        except (JSONExtractionError, ValidationError) as e:
+            log.error(f"Could not parse Gemini output as {response_model.__name__}: {str(e)[:200]}")
+            raise ValueError(f"Gemini returned invalid {response_model.__name__} data") from e
+
+    @staticmethod
+    def _build_payload(
+        prompt: str,
+        generation_config: Dict[str, Any],
+        system_instruction: Optional[str] = None,
+        cached_content: Optional[str] = None
+    ) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "contents": [
+                {
+                    "role": "user",
+                    "parts": [{"text": prompt}]
+                }
+            ],
+            "generationConfig": generation_config,
+            "safetySettings": SAFETY_SETTINGS
+        }
+        # A cached content already carries the system instruction
+        if cached_content is not None:
+            payload["cachedContent"] = cached_content
+        elif system_instruction:
+            payload["systemInstruction"] = {"parts": [{"text": system_instruction}]}
+        return payload
+
+    async def _send(
+        self,
+        url: str,
+        prompt: str,
+        generation_config: Dict[str, Any],
+        system_instruction: Optional[str] = None,
+        stream: bool = False
+    ) -> httpx.Response:
+        """
+        POST a generate request, referencing the system instruction's cached
+        content when one is live. If Gemini no longer accepts the handle, the
+        request is repeated once with the instruction inline.
+        
+        Returns:
+            The response (unread when streaming; the caller must close it)
+        """
+        cached_content = None
+        if system_instruction and self.context_cache is not None:
+            cached_content = self.context_cache.lookup(system_instruction)
+        payload = self._build_payload(prompt, generation_config, system_instruction, cached_content)
+        # Reuse pooled keep-alive connections from the shared async client
+        request = self.client.build_request("POST", url, headers=self.headers, json=payload)
+        response = await self.client.send(request, stream=stream)
+
+        if cached_content is not None and response.status_code in CACHE_REJECTED_STATUSES:
+            await response.aclose()
+            self.context_cache.invalidate(system_instruction)
+            payload = self._build_payload(prompt, generation_config, system_instruction)
+            request = self.client.build_request("POST", url, headers=self.headers, json=payload)
+            response = await self.client.send(request, stream=stream)
+        elif cached_content is not None:
+            current_span().set("cached_content", cached_content)
+        return response
+
+    async def _request_content(self, prompt: str, generation_config: Dict[str, Any], system_instruction: Optional[str] = None) -> str:
+        """
+        Send a single generateContent request to Gemini.
+        
+        Args:
+            prompt: The prompt to send to the model
+            generation_config: The generationConfig block for the request
+            system_instruction: Optional static instructions for the model
             
-            # Run the API call in a separate thread to avoid blocking
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: requests.post(
-                    self.base_url,
-                    headers=self.headers,
-                    json=payload
-                )
-            )
+        Returns:
+            String response from Gemini
+        """
+        try:
+            response = await self._send(self.base_url, prompt, generation_config, system_instruction)
             
+            if response.status_code == 429:
+                raise RateLimitedError(
+                    "Gemini rate limit exceeded",
+                    retry_after=parse_retry_after(response.headers.get("Retry-After"))
+                )
             if response.status_code != 200:
                 log.error(f"API request failed with status code: {response.status_code}")
                 log.error(f"Response: {response.text}")
-                raise Exception(f"API request failed with status code: {response.status_code}")
+                raise UpstreamStatusError(
+                    f"API request failed with status code: {response.status_code}",
+                    status_code=response.status_code
+                )
                 
             response_json = response.json()
             
+            usage = response_json.get("usageMetadata") or {}
+            if usage:
+                current_span().set("tokens.prompt", usage.get("promptTokenCount", 0)).set(
+                    "tokens.response", usage.get("candidatesTokenCount", 0)
+                ).set("tokens.cached", usage.get("cachedContentTokenCount", 0))
+
             # Extract the content from the API response based on Gemini's response structure
             try:
                 content_text = response_json["candidates"][0]["content"]["parts"][0]["text"]
@@ -187,6 +521,78 @@ class GeminiService:
                 log.debug(f"Response JSON: {json.dumps(response_json)[:500]}...")
                 raise ValueError(f"Unexpected response structure from Gemini API: {str(e)}")
             
+        except RateLimitedError:
+            raise
         except Exception as e:
             log.error(f"Error generating content with Gemini API: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    async def stream_content(
+        self,
+        prompt: str,
+        profile: str = "default",
+        response_model: Optional[Type[BaseModel]] = None,
+        priority: Optional[Priority] = None,
+        system_instruction: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream generated text from Gemini's streamGenerateContent endpoint.
+        
+        Args:
+            prompt: The prompt to send to the model
+            profile: Generation profile for the call site
+            response_model: Optional pydantic model to constrain the output to
+            priority: Scheduler priority (defaults to the profile's)
+            system_instruction: Optional static instructions for the model
+            
+        Yields:
+            Text chunks as they arrive
+        """
+        generation_config = self.build_generation_config(profile, response_model)
+        if priority is None:
+            priority = PROFILE_PRIORITIES.get(profile, Priority.NORMAL)
+        # Not made current: the generator may be resumed from other contexts
+        stream_span = span("gemini.stream", call_site=profile, prompt_chars=len(prompt))
+        response_chars = 0
+        try:
+            with UpstreamCallTimer("gemini", profile):
+                # The slot is held until the stream has been consumed
+                async with self.circuit.guard(), self.scheduler.slot(priority):
+                    response = await self._send(self.stream_url, prompt, generation_config, system_instruction, stream=True)
+                    try:
+                        if response.status_code == 429:
+                            raise RateLimitedError(
+                                "Gemini rate limit exceeded",
+                                retry_after=parse_retry_after(response.headers.get("Retry-After"))
+                            )
+                        if response.status_code != 200:
+                            error_text = (await response.aread()).decode("utf-8", errors="replace")
+                            log.error(f"Streaming API request failed with status code: {response.status_code}")
+                            log.error(f"Response: {error_text}")
+                            raise UpstreamStatusError(
+                                f"API request failed with status code: {response.status_code}",
+                                status_code=response.status_code
+                            )
+
+                        # Server-sent events: one "data: {json}" line per chunk
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[len("data:"):].strip()
+                            if not data:
+                                continue
+                            chunk = json.loads(data)
+                            for candidate in chunk.get("candidates", [])[:1]:
+                                for part in candidate.get("content", {}).get("parts", []):
+                                    text = part.get("text")
+                                    if text:
+                                        response_chars += len(text)
+                                        yield text
+                    finally:
+                        await response.aclose()
+        except Exception as e:
+            stream_span.finish(e)
+            log.error(f"Error streaming content with Gemini API: {str(e)}")
+            raise
+        finally:
+            stream_span.set("response_chars", response_chars).finish()
@@ -1,13 +1,14 @@
 # Groq LLM integration service
 from app.core.config import settings
 from app.core.logging import log
-from app.services.gemini_service import GeminiService
+from typing import Optional, Type
+from app.services.gemini_service import GeminiService, ModelT
 
 class LLMService:
-    def __init__(self):
+    def __init__(self, gemini_service: Optional[GeminiService] = None):
         self.model = settings.gemini_model
         self.gemini_api_key = settings.gemini_api_key
-        self.gemini_service = GeminiService()
+        self.gemini_service = gemini_service or GeminiService()
     
     async def generate_response(self, user_message: str, system_prompt: str = None, temperature: float = 0.7):
         """
@@ -21,9 +22,11 @@ class LLMService:
         Returns:
             The text response from the LLM
         """
-        # Use GeminiService to generate the response
-        # You may want to pass system_prompt and temperature if GeminiService supports them
-        return await self.gemini_service.generate_content(user_message)
+        return await self.gemini_service.generate_content(
+            user_message,
+            system_instruction=system_prompt,
+            temperature=temperature
+        )
     
     async def generate_content(self, prompt: str, temperature: float = 0.7):
         """
@@ -42,3 +45,29 @@ class LLMService:
             system_prompt="You are a helpful AI assistant responding with raw content.",
             temperature=temperature
         )
+
+    async def generate_structured(
+        self,
+        prompt: str,
+        response_model: Type[ModelT],
+        profile: str = "default",
+        system_prompt: Optional[str] = None
+    ) -> ModelT:
+        """
+        Generate output constrained to, and validated into, a pydantic model.
+        
+        Args:
+            prompt: The full prompt to send to the model
+            response_model: Pydantic model class describing the output
+            profile: Generation profile for the call site
+            system_prompt: Optional system instructions for the model
+        
+        Returns:
+            Validated instance of response_model
+        """
+        return await self.gemini_service.generate_structured(
+            prompt,
+            response_model,
+            profile=profile,
+            system_instruction=system_prompt
+        )
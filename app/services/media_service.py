@@ -1,18 +1,54 @@
+import asyncio
 import json
 import logging
+from typing import Dict, List, Optional
+from app.core.cache import TieredCache
 from app.services.gemini_service import GeminiService
 from app.services.youtube_service import YouTubeService
+from app.services.mood_classifier import MoodClassifier, detect_mood, get_mood_classifier
 from app.core.config import settings
+from app.core.resilience import CircuitOpenError
+from app.core.tracing import traced
+from app.services.fallbacks import fallback_media, fallback_search_query
+from app.services.prompts import render_prompt
+from app.utils.json_extract import extract_json
 
 log = logging.getLogger(__name__)
 
+# Relevance explanations per (mood, video), shared across requests and, via
+# the shared cache tier, across workers; a search returning partly known
+# videos only asks Gemini about the new ones
+relevance_text_cache = TieredCache(
+    max_entries=settings.relevance_cache_max_entries,
+    ttl=settings.gemini_cache_ttl_seconds,
+    name="relevance_texts",
+    timeout=settings.cache_shared_timeout_seconds,
+    retry_after=settings.cache_shared_retry_seconds,
+)
+
 class MediaService:
-    def __init__(self):
-        self.gemini_service = GeminiService()
-        self.youtube_service = YouTubeService()
+    def __init__(
+        self,
+        gemini_service: Optional[GeminiService] = None,
+        youtube_service: Optional[YouTubeService] = None,
+        mood_classifier: Optional[MoodClassifier] = None,
+        relevance_cache: Optional[TieredCache] = None
+    ):
+        self.gemini_service = gemini_service or GeminiService()
+        self.youtube_service = youtube_service or YouTubeService()
+        self.mood_classifier = mood_classifier or get_mood_classifier()
+        self.relevance_cache = relevance_cache if relevance_cache is not None else relevance_text_cache
         self.tavily_api_key = settings.tavily_api_key
     
-    async def get_mood_based_recommendations(self, user_message: str, media_type: str = None, max_results: int = 5, detected_mood: str = None):
+    @traced("MediaService.get_mood_based_recommendations")
+    async def get_mood_based_recommendations(
+        self,
+        user_message: str,
+        media_type: str = None,
+        max_results: int = 5,
+        detected_mood: str = None,
+        search_query: str = None
+    ):
         """
         Get media recommendations based on user's mood using Tavily API for music
         
@@ -21,10 +57,15 @@ class MediaService:
             media_type: Type of media to recommend (music, videos, etc)
             max_results: Maximum number of results to return
             detected_mood: Optional pre-detected mood to avoid duplicate analysis
+            search_query: Optional pre-generated search query (e.g. from a
+                combined generation call)
             
         Returns:
-            Dictionary with mood analysis and media recommendations
+            Dictionary with mood analysis and media recommendations. While the
+            Gemini or Tavily circuit is open, curated fallbacks are used and
+            the result is flagged as degraded.
         """
+        degraded = False
         try:
             # Default to "music" if media_type is None or empty
             media_type = "music" if not media_type else media_type.lower()
@@ -42,54 +83,155 @@ class MediaService:
             # Step 1: Use provided mood or analyze mood from user message
             if not detected_mood:
                 log.info(f"Analyzing mood for music recommendations")
-                mood_prompt = f'''
-                Analyze the following message and identify the person's primary emotional state:
-                "{user_message}"
-                Return only a single word or short phrase describing their primary mood (like happy, sad, excited, anxious, etc.).
-                '''
-                mood_response = await self.gemini_service.generate_content(mood_prompt)
-                detected_mood = mood_response.strip()
+                try:
+                    detected_mood = await detect_mood(user_message, self.gemini_service, self.mood_classifier)
+                except CircuitOpenError as e:
+                    log.warning(f"Mood detection unavailable: {str(e)}")
+                    detected_mood = "unknown"
+                    degraded = True
                 log.info(f"Detected mood: {detected_mood}")
             else:
                 log.info(f"Using provided mood: {detected_mood}")
             
             # Step 2: Create search query for music based on mood - adaptive to all moods
-            query_prompt = f'''
-            Create a search query for finding YouTube music videos that would support someone feeling "{detected_mood}".
-            If the mood is positive (like happy, joyful, excited), suggest uplifting, celebratory music.
-            If the mood is negative (like sad, angry, grieving), suggest soothing, healing music.
-            Return only the search query text, nothing else (no quotes).
-            Examples:
-            - For grief: "healing piano music for grief and loss"
-            - For joyful: "upbeat celebration music for happy moments"
-            '''
-            query_response = await self.gemini_service.generate_content(query_prompt)
-            search_query = query_response.strip().replace('"', '')  # Remove quotes if present
-            log.info(f"Generated search query: {search_query}")
+            if search_query:
+                log.info(f"Using provided search query: {search_query}")
+            else:
+                query_prompt = render_prompt("search_query", mood=detected_mood)
+                try:
+                    query_response = await self.gemini_service.generate_content(query_prompt, use_cache=True, profile="query")
+                    search_query = query_response.strip().replace('"', '')  # Remove quotes if present
+                    log.info(f"Generated search query: {search_query}")
+                except CircuitOpenError as e:
+                    search_query = fallback_search_query(detected_mood)
+                    degraded = True
+                    log.warning(f"Using curated search query '{search_query}': {str(e)}")
             
             # Step 3: Use Tavily to search for YouTube music videos
-            videos = await self.youtube_service.search_videos(search_query, max_results)
+            try:
+                videos = await self.youtube_service.search_videos(search_query, max_results)
+            except CircuitOpenError as e:
+                log.warning(f"Serving curated media recommendations: {str(e)}")
+                return fallback_media(detected_mood, max_results)
             
-            # Step 4: For each video, generate a relevance explanation
-            video_results = []
-            for video in videos:
-                explanation_prompt = f'''
-                Explain in one brief, compassionate sentence why the music video titled 
-                "{video['title']}" might help someone feeling {detected_mood}.
-                '''
-                relevance = await self.gemini_service.generate_content(explanation_prompt)
-                
-                video["relevance_explanation"] = relevance.strip()
-                video_results.append(video)
+            # Step 4: Generate relevance explanations for all videos in one call
+            video_results = await self._explain_relevance(videos, detected_mood)
             
             # Return the results with mood analysis
             return {
                 "detected_mood": detected_mood,
                 "search_query_used": search_query,
                 "media_type": "music",
-                "recommendations": video_results
+                "recommendations": video_results,
+                "degraded": degraded
             }
                 
         except Exception as e:
             log.error(f"Error getting music recommendations: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    @traced("MediaService.explain_relevance")
+    async def _explain_relevance(self, videos: List[Dict], detected_mood: str) -> List[Dict]:
+        """
+        Attach a relevance_explanation to every video. Explanations are
+        cached per (mood, video), so only videos without one are sent to
+        Gemini, in a single batched call.
+        
+        Args:
+            videos: Video dictionaries returned by YouTubeService
+            detected_mood: The mood the recommendations are for
+            
+        Returns:
+            The same videos with relevance_explanation filled in
+        """
+        if not videos:
+            return videos
+
+        use_cache = settings.gemini_cache_enabled
+        keys = [(detected_mood, video.get("video_url") or video["title"]) for video in videos]
+        explanations: Dict[int, str] = {}
+        if use_cache:
+            cached = await asyncio.gather(*(self.relevance_cache.get(key) for key in keys))
+            explanations = {index: text for index, text in enumerate(cached) if text}
+
+        pending = [index for index in range(len(videos)) if index not in explanations]
+        if pending:
+            try:
+                generated = await self._generate_explanations([videos[index] for index in pending], detected_mood)
+            except CircuitOpenError as e:
+                # Explanations are optional; don't retry them one by one
+                log.warning(f"Skipping relevance explanations: {str(e)}")
+                generated = {}
+            for position, text in generated.items():
+                explanations[pending[position]] = text
+            if use_cache and generated:
+                await asyncio.gather(*(
+                    self.relevance_cache.set(keys[pending[position]], text) for position, text in generated.items()
+                ))
+
+        for index, video in enumerate(videos):
+            video["relevance_explanation"] = explanations.get(index)
+        return videos
+
+    async def _generate_explanations(self, videos: List[Dict], detected_mood: str) -> Dict[int, str]:
+        """
+        Generate explanations with one batched Gemini call. Entries missing
+        from (or unparseable in) the batched answer fall back to concurrent
+        per-video calls.
+
+        Returns:
+            {index in videos: explanation} for the explanations generated
+
+        Raises:
+            CircuitOpenError: If the Gemini circuit is open
+        """
+        explanations: Dict[int, str] = {}
+        titles = "\n".join(f'{index}. "{video["title"]}"' for index, video in enumerate(videos))
+        batch_prompt = render_prompt("relevance_batch", mood=detected_mood, titles=titles)
+        try:
+            response_text = await self.gemini_service.generate_content(batch_prompt, use_cache=True, profile="relevance")
+            explanations = self._parse_explanations(response_text, len(videos))
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            log.warning(f"Batched relevance explanation failed, falling back to per-video calls: {str(e)}")
+
+        missing = [index for index in range(len(videos)) if index not in explanations]
+        if missing:
+            log.info(f"Generating {len(missing)} relevance explanations individually")
+            results = await asyncio.gather(
+                *(self._explain_single(videos[index], detected_mood) for index in missing),
+                return_exceptions=True
+            )
+            for index, result in zip(missing, results):
+                if isinstance(result, Exception):
+                    log.error(f"Relevance explanation failed for video {index}: {str(result)}")
+                    continue
+                explanations[index] = result
+        return explanations
+
+    async def _explain_single(self, video: Dict, detected_mood: str) -> str:
+        explanation_prompt = render_prompt("relevance_single", title=video["title"], mood=detected_mood)
+        relevance = await self.gemini_service.generate_content(explanation_prompt, use_cache=True, profile="relevance_single")
+        return relevance.strip()
+
+    @staticmethod
+    def _parse_explanations(response_text: str, count: int) -> Dict[int, str]:
+        """
+        Parse the batched explanation answer into {video index: explanation}.
+        Items are matched by their "index" field, or by position when it is missing.
+        """
+        items = extract_json(response_text, expect=list)
+
+        explanations: Dict[int, str] = {}
+        for position, item in enumerate(items):
+            if isinstance(item, dict):
+                index = item.get("index", position)
+                explanation = item.get("explanation")
+            else:
+                index, explanation = position, item
+            if not isinstance(index, int) or not 0 <= index < count:
+                continue
+            if isinstance(explanation, str) and explanation.strip():
+                explanations[index] = explanation.strip()
+        return explanations
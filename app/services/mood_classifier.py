@@ -0,0 +1,206 @@
+import re
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logging import log
+from app.core.resilience import CircuitOpenError
+from app.core.tracing import current_span
+
+DEFAULT_MODEL_PATH = Path(__file__).resolve().parent.parent / "resources" / "mood_model.npz"
+
+_TOKEN_PATTERN = re.compile(r"[a-z']+")
+_NEGATIONS = frozenset({"not", "no", "never", "don't", "dont", "isn't", "can't", "cannot", "won't", "without"})
+
+
+@dataclass
+class MoodPrediction:
+    """Result of the local mood classifier."""
+    label: str
+    intensity: int
+    confidence: float
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; a negation marks the following word (e.g. "not_happy")."""
+    tokens = []
+    negate = False
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if token in _NEGATIONS:
+            negate = True
+            continue
+        tokens.append(f"not_{token}" if negate else token)
+        negate = False
+    return tokens
+
+
+def hash_features(tokens: Sequence[str], n_features: int) -> List[int]:
+    """Hashed unigram and bigram feature indices for one message."""
+    grams = list(tokens)
+    grams.extend(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+    return [zlib.crc32(gram.encode("utf-8")) % n_features for gram in grams]
+
+
+class MoodClassifier:
+    """
+    In-process mood classifier: a linear model over hashed word n-grams plus
+    a small lexicon prior, evaluated with NumPy for whole batches at once.
+
+    The model file is a compressed .npz produced by scripts/build_mood_model.py.
+    """
+    def __init__(
+        self,
+        labels: Sequence[str],
+        weights: np.ndarray,
+        bias: np.ndarray,
+        lexicon: Dict[str, Tuple[int, float]],
+        intensifiers: Dict[str, float]
+    ):
+        self.labels = list(labels)
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.n_features = self.weights.shape[0]
+        self.lexicon = lexicon
+        self.intensifiers = intensifiers
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_MODEL_PATH) -> "MoodClassifier":
+        """
+        Load a classifier from its .npz model file.
+
+        Args:
+            path: Location of the model file
+
+        Returns:
+            A ready MoodClassifier
+        """
+        with np.load(path, allow_pickle=False) as data:
+            lexicon = {
+                str(word): (int(label), float(weight))
+                for word, label, weight in zip(data["lexicon_words"], data["lexicon_labels"], data["lexicon_weights"])
+            }
+            intensifiers = {
+                str(word): float(weight)
+                for word, weight in zip(data["intensifier_words"], data["intensifier_weights"])
+            }
+            return cls(
+                labels=[str(label) for label in data["labels"]],
+                weights=data["weights"],
+                bias=data["bias"],
+                lexicon=lexicon,
+                intensifiers=intensifiers,
+            )
+
+    def predict(self, message: str) -> MoodPrediction:
+        return self.predict_batch([message])[0]
+
+    def predict_batch(self, messages: Sequence[str]) -> List[MoodPrediction]:
+        """
+        Classify many messages in one vectorized pass.
+
+        Args:
+            messages: User messages to classify
+
+        Returns:
+            One MoodPrediction per message, in order
+        """
+        if not messages:
+            return []
+
+        rows: List[int] = []
+        cols: List[int] = []
+        scales = np.ones(len(messages), dtype=np.float32)
+        lexicon_logits = np.zeros((len(messages), len(self.labels)), dtype=np.float32)
+        intensity_boost = np.zeros(len(messages), dtype=np.float32)
+
+        for row, message in enumerate(messages):
+            tokens = tokenize(message)
+            features = hash_features(tokens, self.n_features)
+            rows.extend([row] * len(features))
+            cols.extend(features)
+            scales[row] = 1.0 / np.sqrt(max(len(features), 1))
+            for token in tokens:
+                entry = self.lexicon.get(token)
+                if entry is not None:
+                    lexicon_logits[row, entry[0]] += entry[1]
+                boost = self.intensifiers.get(token)
+                if boost is not None:
+                    intensity_boost[row] += boost
+            intensity_boost[row] += 0.5 * min(message.count("!"), 4)
+
+        logits = np.zeros((len(messages), len(self.labels)), dtype=np.float32)
+        if cols:
+            np.add.at(logits, np.asarray(rows), self.weights[np.asarray(cols)])
+        logits = logits * scales[:, None] + self.bias + lexicon_logits
+
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+        best = probabilities.argmax(axis=1)
+        confidence = probabilities[np.arange(len(messages)), best]
+        # Intensity on the API's 1-10 scale: model certainty plus explicit intensifiers
+        intensity = np.clip(np.rint(3.0 + 4.0 * confidence + intensity_boost), 1, 10).astype(int)
+
+        return [
+            MoodPrediction(label=self.labels[label], intensity=int(level), confidence=float(score))
+            for label, level, score in zip(best, intensity, confidence)
+        ]
+
+
+_classifier: Optional[MoodClassifier] = None
+_load_attempted = False
+
+
+def get_mood_classifier() -> Optional[MoodClassifier]:
+    """
+    Return the process-wide classifier, loading it on first use.
+    Returns None when it is disabled or the model file can't be loaded.
+    """
+    global _classifier, _load_attempted
+    if _load_attempted or not settings.mood_classifier_enabled:
+        return _classifier
+    _load_attempted = True
+    path = Path(settings.mood_classifier_path) if settings.mood_classifier_path else DEFAULT_MODEL_PATH
+    try:
+        _classifier = MoodClassifier.load(path)
+        log.info(f"Mood classifier loaded from {path} ({len(_classifier.labels)} moods)")
+    except (OSError, KeyError, ValueError) as e:
+        log.warning(f"Mood classifier unavailable, using the LLM for mood detection: {str(e)}")
+    return _classifier
+
+
+async def detect_mood(user_message: str, gemini_service, classifier: Optional[MoodClassifier] = None) -> str:
+    """
+    Detect the user's mood locally, calling Gemini only when the classifier
+    is unavailable or its confidence is below the configured threshold.
+    While the Gemini circuit is open the local guess is used regardless.
+
+    Args:
+        user_message: The user's message
+        gemini_service: GeminiService used for the LLM fallback
+        classifier: Optional classifier (defaults to the shared one)
+
+    Returns:
+        A single word or short phrase describing the mood
+    """
+    classifier = classifier or get_mood_classifier()
+    prediction = None
+    if classifier is not None:
+        prediction = classifier.predict(user_message)
+        current_span().set("mood.local_confidence", round(prediction.confidence, 3))
+        if prediction.confidence >= settings.mood_confidence_threshold:
+            log.debug(f"Local mood classifier: {prediction.label} ({prediction.confidence:.2f})")
+            return prediction.label
+        log.debug(f"Local mood confidence {prediction.confidence:.2f} below threshold, asking Gemini")
+    try:
+        return await gemini_service.detect_mood(user_message)
+    except CircuitOpenError:
+        if prediction is None:
+            raise
+        log.warning(f"Gemini unavailable, using low-confidence local mood: {prediction.label}")
+        return prediction.label
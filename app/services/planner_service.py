@@ -1,15 +1,44 @@
 import json
 import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from pydantic import ValidationError
 from app.services.gemini_service import GeminiService
+from app.models.schemas import DailyPlan
+from app.services.mood_classifier import MoodClassifier, get_mood_classifier
+from app.services.fallbacks import fallback_daily_plan
+from app.services.prompts import render_prompt, system_prompt
+from app.core.resilience import CircuitOpenError
+from app.core.tracing import traced
+from app.utils.json_extract import JSONArrayItemScanner, extract_json
 from app.core.config import settings
 
 log = logging.getLogger(__name__)
 
 class PlannerService:
-    def __init__(self):
-        self.gemini_service = GeminiService()
+    def __init__(self, gemini_service: Optional[GeminiService] = None, mood_classifier: Optional[MoodClassifier] = None):
+        self.gemini_service = gemini_service or GeminiService()
+        self.mood_classifier = mood_classifier or get_mood_classifier()
         self.gemini_api_key = settings.gemini_api_key
     
+    def _build_prompt(self, user_message: str, preferences: dict = None, detected_mood: str = None) -> str:
+        if preferences is None:
+            preferences = {}
+            
+        # Detect mood locally if not provided (no extra LLM call)
+        if not detected_mood and self.mood_classifier is not None:
+            prediction = self.mood_classifier.predict(user_message)
+            if prediction.confidence >= settings.mood_confidence_threshold:
+                detected_mood = prediction.label
+
+        mood_context = f" feeling {detected_mood}" if detected_mood else ""
+        return render_prompt(
+            "daily_plan",
+            user_message=user_message,
+            mood_context=mood_context,
+            preferences=json.dumps(preferences)
+        )
+
+    @traced("PlannerService.create_daily_plan")
     async def create_daily_plan(self, user_message: str, preferences: dict = None, detected_mood: str = None):
         """
         Create a personalized daily plan based on user's emotional state and preferences.
@@ -22,77 +51,95 @@ class PlannerService:
         Returns:
             Dictionary with daily plan structure
         """
-        if preferences is None:
-            preferences = {}
-            
-        # Detect mood if not provided
-        if detected_mood:
-            mood_context = f"The person is feeling {detected_mood} and shared: "
-        else:
-            mood_context = ""
-            
-        # Build prompt for Gemini model
-        prompt = f"""
-        Create a supportive daily plan for someone who {mood_context}shared:
-        "{user_message}"
-        
-        User preferences: {json.dumps(preferences)}
+        prompt = self._build_prompt(user_message, preferences, detected_mood)
         
-        Format your response as JSON with the following structure:
-        {{
-            "morning": [
-                {{"time": "7:00 AM", "activity": "Gentle wake up with deep breathing", "benefit": "Helps center yourself"}}
-            ],
-            "afternoon": [
-                {{"time": "12:00 PM", "activity": "Light lunch with nutrient-rich foods", "benefit": "Provides energy"}}
-            ],
-            "evening": [
-                {{"time": "7:00 PM", "activity": "Relaxing activity like reading", "benefit": "Wind down before bed"}}
-            ],
-            "food_recommendations": [
-                {{"meal": "Breakfast", "food": "Oatmeal with berries", "benefit": "Steady energy and antioxidants"}}
-            ],
-            "healing_activities": [
-                {{"activity": "10-minute journaling", "benefit": "Process emotions", "how_to": "Write freely about feelings"}}
-            ],
-            "memory_rituals": [
-                {{"ritual": "Looking at photos", "benefit": "Honors memories", "guidance": "Set a specific time"}}
-            ]
-        }}
+        try:
+            log.info("Creating daily plan based on user's grief state")
+            plan = await self.gemini_service.generate_structured(
+                prompt,
+                DailyPlan,
+                profile="plan",
+                system_instruction=system_prompt("daily_plan")
+            )
+            return self._finalize_plan(plan.model_dump())
+            
+        except CircuitOpenError as e:
+            log.warning(f"Serving fallback daily plan: {str(e)}")
+            return self._fallback_plan(user_message, detected_mood)
+        except Exception as e:
+            log.error(f"Error creating daily plan: {str(e)}")
+            raise
+
+    @traced("PlannerService.stream_daily_plan")
+    async def stream_daily_plan(
+        self,
+        user_message: str,
+        preferences: dict = None,
+        detected_mood: str = None,
+        on_item: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None
+    ):
+        """
+        Create a daily plan using Gemini's streaming endpoint, reporting each
+        plan item as soon as it has been fully generated.
         
-        Ensure all sections have at least 3 items, and the plan is sensitive to the person's grief state.
-        Make sure your JSON is properly formatted.
+        Args:
+            user_message: The user's message describing their emotional state
+            preferences: Optional dict of user preferences (wake time, interests, etc.)
+            detected_mood: Optional pre-detected mood to avoid duplicate analysis
+            on_item: Optional coroutine called with (section name, item) per completed item
+            
+        Returns:
+            Dictionary with the complete daily plan structure
         """
+        prompt = self._build_prompt(user_message, preferences, detected_mood)
+        scanner = JSONArrayItemScanner()
+        chunks: List[str] = []
         
         try:
-            log.info("Creating daily plan based on user's grief state")
-            response_text = await self.gemini_service.generate_content(prompt)
+            log.info("Streaming daily plan based on user's grief state")
+            async for chunk in self.gemini_service.stream_content(
+                prompt,
+                profile="plan",
+                response_model=DailyPlan,
+                system_instruction=system_prompt("daily_plan")
+            ):
+                chunks.append(chunk)
+                for section, item in scanner.feed(chunk):
+                    if on_item is not None:
+                        await on_item(section, item)
+            return self._finalize_plan(self._parse_plan("".join(chunks)))
             
-            # Parse JSON response
-            try:
-                plan_data = json.loads(response_text)
-            except json.JSONDecodeError:
-                log.error("Failed to parse Gemini response as JSON")
-                # Extract JSON if it's embedded in text
-                json_start = response_text.find('{')
-                json_end = response_text.rfind('}') + 1
-                if json_start >= 0 and json_end > json_start:
-                    json_text = response_text[json_start:json_end]
-                    plan_data = json.loads(json_text)
-                else:
-                    raise ValueError("Couldn't extract JSON from response")
-                    
-            # Ensure all required fields are present
-            required_fields = ["morning", "afternoon", "evening", "food_recommendations", "healing_activities"]
-            for field in required_fields:
-                if field not in plan_data:
-                    plan_data[field] = []
-                    
-            if "memory_rituals" not in plan_data:
-                plan_data["memory_rituals"] = []
+        except CircuitOpenError as e:
+            log.warning(f"Serving fallback daily plan: {str(e)}")
+            return self._fallback_plan(user_message, detected_mood)
+        except Exception as e:
+            log.error(f"Error streaming daily plan: {str(e)}")
+            raise
+
+    def _fallback_plan(self, user_message: str, detected_mood: str = None) -> Dict[str, Any]:
+        """Curated plan template for the mood (best local guess if none was given)."""
+        if not detected_mood and self.mood_classifier is not None:
+            detected_mood = self.mood_classifier.predict(user_message).label
+        return fallback_daily_plan(detected_mood)
+
+    @staticmethod
+    def _parse_plan(response_text: str) -> Dict[str, Any]:
+        try:
+            return DailyPlan.model_validate_json(response_text).model_dump()
+        except ValidationError:
+            # Handles code fences, surrounding text and truncated output
+            return extract_json(response_text, expect=dict)
+
+    @staticmethod
+    def _finalize_plan(plan_data: Dict[str, Any]) -> Dict[str, Any]:
+        # Ensure all required fields are present
+        required_fields = ["morning", "afternoon", "evening", "food_recommendations", "healing_activities"]
+        for field in required_fields:
+            if field not in plan_data:
+                plan_data[field] = []
                 
-            return plan_data
+        if "memory_rituals" not in plan_data:
+            plan_data["memory_rituals"] = []
             
-        except Exception as e:
-            log.error(f"Error creating daily plan: {str(e)}")
-            raise
\ No newline at end of file
+        return plan_data
+
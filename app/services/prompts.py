@@ -0,0 +1,303 @@
+"""
+Central registry of the prompts sent to Gemini.
+
+Templates are whitespace-normalized and parsed once at import. Each one has
+a version ID (bump it when the wording changes, so traces and cached answers
+can be told apart) and an input-token budget. A request's user message is
+shortened once, by `prepare_user_message`, to USER_MESSAGE_BUDGET: the
+smallest room any template that embeds it leaves for the message. Every
+section of the request then sends the same text and shares cache keys.
+Rendering still shortens a field that would push a prompt over its own
+budget (e.g. alongside long preferences), as a safety net.
+
+Structured call sites get their output shape from the responseSchema, so
+their templates only carry instructions, not JSON examples. Their fixed
+instructions live in a separate `system` text, sent as Gemini's
+systemInstruction, and can therefore be context-cached upstream.
+"""
+import re
+import string
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.logging import log
+from app.core.metrics import prompt_truncations
+from app.core.tracing import current_span
+
+# Gemini averages roughly four characters per token on English text
+CHARS_PER_TOKEN = 4
+# Never shorten a message below this, even if a template's budget is tight
+MIN_MESSAGE_TOKENS = 64
+TRUNCATION_MARKER = " [...] "
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate Gemini token count of a text."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def normalize_template(text: str) -> str:
+    """Strip indentation and blank lines and collapse runs of spaces."""
+    lines = (re.sub(r"[ \t]+", " ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def normalize_message(text: str) -> str:
+    """Collapse runs of spaces and blank lines in user text without joining paragraphs."""
+    text = re.sub(r"[ \t\r\f\v]+", " ", text)
+    return re.sub(r"\s*\n\s*(\n\s*)+", "\n\n", text).strip()
+
+
+@lru_cache(maxsize=512)
+def shorten_message(text: str, max_tokens: int) -> str:
+    """
+    Shorten a message to about `max_tokens`, keeping its beginning and its
+    end (where people usually state what they need) and cutting at word
+    boundaries. Memoized, so repeated calls for the same message are free
+    and return the identical string.
+    """
+    text = normalize_message(text)
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    room = max(0, max_chars - len(TRUNCATION_MARKER))
+    head = text[:room * 2 // 3]
+    tail = text[len(text) - (room - len(head)):]
+    head = head.rsplit(None, 1)[0] if " " in head else head
+    tail = tail.split(None, 1)[-1] if " " in tail else tail
+    return head + TRUNCATION_MARKER + tail
+
+
+class PromptTemplate:
+    """
+    A versioned prompt with `{field}` placeholders, plus optional static
+    `system` instructions without placeholders.
+
+    `budget` caps the estimated input tokens of the rendered prompt and its
+    system instructions; the `shorten` field (the user's message) absorbs
+    any overflow.
+    """
+    def __init__(
+        self,
+        name: str,
+        version: int,
+        text: str,
+        budget: int,
+        shorten: Optional[str] = "user_message",
+        system: str = ""
+    ):
+        self.name = name
+        self.version = version
+        self.id = f"{name}@v{version}"
+        self.text = normalize_template(text)
+        self.system = normalize_template(system) or None
+        self.budget = budget
+        self.shorten = shorten
+
+        self._pieces: List[Tuple[str, Optional[str]]] = []
+        for literal, field, spec, conversion in string.Formatter().parse(self.text):
+            if spec or conversion:
+                raise ValueError(f"Prompt {self.id}: format specs are not supported ({field})")
+            self._pieces.append((literal, field))
+        self.fields = frozenset(field for _, field in self._pieces if field is not None)
+        if shorten is not None and shorten not in self.fields:
+            raise ValueError(f"Prompt {self.id} has no field '{shorten}' to shorten")
+        self.static_tokens = estimate_tokens("".join(literal for literal, _ in self._pieces) + (self.system or ""))
+
+    @property
+    def message_room(self) -> int:
+        """Tokens left for the `shorten` field once the static text is counted."""
+        return max(MIN_MESSAGE_TOKENS, self.budget - self.static_tokens)
+
+    def render(self, **values: Any) -> str:
+        """
+        Fill in the template, shortening the `shorten` field if the prompt
+        would still exceed its budget (a message from prepare_user_message
+        normally fits already).
+
+        Raises:
+            KeyError: If a placeholder has no value
+        """
+        missing = self.fields.difference(values)
+        if missing:
+            raise KeyError(f"Prompt {self.id} is missing values for {sorted(missing)}")
+        text_values = {field: str(values[field]) for field in self.fields}
+
+        if self.shorten is not None:
+            fixed_tokens = self.static_tokens + sum(
+                estimate_tokens(value) for field, value in text_values.items() if field != self.shorten
+            )
+            allowed = max(MIN_MESSAGE_TOKENS, self.budget - fixed_tokens)
+            original = text_values[self.shorten] = normalize_message(text_values[self.shorten])
+            if estimate_tokens(original) > allowed:
+                text_values[self.shorten] = shorten_message(original, allowed)
+                prompt_truncations.labels(self.name).inc()
+                current_span().set("prompt.truncated_from", estimate_tokens(original))
+                log.debug(f"Shortened {self.shorten} for prompt {self.id} from ~{estimate_tokens(original)} to ~{allowed} tokens")
+
+        prompt = "".join(
+            literal + (text_values[field] if field is not None else "")
+            for literal, field in self._pieces
+        )
+        current_span().set("prompt.template", self.id).set("prompt.tokens", estimate_tokens(prompt))
+        return prompt
+
+
+PROMPTS: Dict[str, PromptTemplate] = {}
+
+
+def register(template: PromptTemplate) -> PromptTemplate:
+    if template.name in PROMPTS:
+        raise ValueError(f"Prompt {template.name} is already registered")
+    PROMPTS[template.name] = template
+    return template
+
+
+def render_prompt(name: str, **values: Any) -> str:
+    """
+    Render a registered prompt.
+
+    Args:
+        name: Template name
+        **values: Placeholder values
+
+    Returns:
+        The prompt text, within the template's token budget
+    """
+    return PROMPTS[name].render(**values)
+
+
+def prepare_user_message(text: str) -> str:
+    """
+    Shorten a request's user message once, to USER_MESSAGE_BUDGET, before it
+    is handed to the services. Every template then receives the same text.
+
+    Args:
+        text: The message as received
+
+    Returns:
+        The normalized message, shortened if it is over the shared budget
+    """
+    original = normalize_message(text)
+    if estimate_tokens(original) <= USER_MESSAGE_BUDGET:
+        return original
+    current_span().set("prompt.message_shortened_from", estimate_tokens(original))
+    log.debug(f"Shortened user_message from ~{estimate_tokens(original)} to ~{USER_MESSAGE_BUDGET} tokens for all sections")
+    return shorten_message(original, USER_MESSAGE_BUDGET)
+
+
+def system_prompt(name: str) -> Optional[str]:
+    """The static system instructions of a registered prompt, if it has any."""
+    return PROMPTS[name].system
+
+
+register(PromptTemplate("grief", 3, """
+    Analyze this message from someone{mood_context}:
+    "{user_message}"
+""", budget=1200, system="""
+    You support people through grief and other strong emotions. For each message, provide:
+    - emotional_validation: a compassionate validation of their emotions and experience
+    - mood_analysis: detected_mood (e.g. joy, sadness, anger, excited, anxious), mood_intensity (1-10), and grief_stage (denial, anger, bargaining, depression or acceptance) if applicable, otherwise null
+    - coping_strategies: 5 specific, actionable strategies for their emotional state, each starting with its number ("1. ...")
+
+    For positive moods, give strategies to maintain and build on those emotions; for negative ones, supportive coping strategies.
+    Be compassionate, validating and practical.
+"""))
+
+register(PromptTemplate("daily_plan", 3, """
+    Create a daily plan for someone{mood_context} who shared:
+    "{user_message}"
+
+    User preferences: {preferences}
+""", budget=1200, system="""
+    You create supportive daily plans for people going through grief or strong emotions.
+    Give every section at least 3 items and keep the plan sensitive to the person's grief state.
+"""))
+
+register(PromptTemplate("daily_plan_detailed", 3, """
+    USER MESSAGE: {user_message}
+    USER PREFERENCES: {preferences}
+""", budget=1400, system="""
+    Create a compassionate, personalized daily plan for someone experiencing grief, acknowledging their grief while helping them move through the day with care and purpose.
+
+    Include:
+    1. Morning activities for gentle self-care and setting intentions
+    2. Afternoon activities that provide healthy distraction and purpose
+    3. Evening activities for reflection and rest
+    4. Food recommendations that support emotional well-being
+    5. Healing activities throughout the day
+    6. Memory rituals that honor their loss
+"""))
+
+register(PromptTemplate("mood", 2, """
+    Identify the primary emotional state of the person who wrote:
+    "{user_message}"
+    Answer with only a single word or short phrase (e.g. happy, sad, excited, anxious).
+""", budget=600))
+
+register(PromptTemplate("search_query", 2, """
+    Write a YouTube search query for music videos that would support someone feeling "{mood}".
+    Positive moods (happy, joyful, excited): uplifting, celebratory music. Negative moods (sad, angry, grieving): soothing, healing music.
+    Examples: grief -> healing piano music for grief and loss; joyful -> upbeat celebration music for happy moments
+    Return only the search query text, without quotes.
+""", budget=200, shorten="mood"))
+
+register(PromptTemplate("relevance_batch", 2, """
+    For each music video below, explain in one brief, compassionate sentence why it might help someone feeling {mood}.
+    VIDEOS:
+    {titles}
+    Return only a JSON array with one object per video, using the number shown as "index":
+    [{{"index": 0, "explanation": "..."}}]
+""", budget=1000, shorten=None))
+
+register(PromptTemplate("relevance_single", 2, """
+    Explain in one brief, compassionate sentence why the music video titled "{title}" might help someone feeling {mood}.
+""", budget=200, shorten="title"))
+
+# Combined generation: one call fills the fields of several sections. The
+# system instructions are assembled from the requested fields' instructions
+register(PromptTemplate("combined", 1, """
+    Message:
+    "{user_message}"
+
+    User preferences: {preferences}
+""", budget=1600, system="""
+    You support people through grief and other strong emotions. Fill in every field of the response schema for the message, following the instructions for each field below.
+    Be compassionate, validating and practical.
+"""))
+
+# Shared allowance for the user's message: the tightest room among the
+# templates that embed it
+USER_MESSAGE_BUDGET = min(
+    template.message_room for template in PROMPTS.values() if template.shorten == "user_message"
+)
+
+COMBINED_FIELD_INSTRUCTIONS: Dict[str, str] = {
+    field: normalize_template(text) for field, text in {
+        "emotional_validation": "emotional_validation: a compassionate validation of their emotions and experience",
+        "mood_analysis": """
+            mood_analysis: detected_mood (e.g. joy, sadness, anger, excited, anxious), mood_intensity (1-10), and grief_stage (denial, anger, bargaining, depression or acceptance) if applicable, otherwise null
+        """,
+        "coping_strategies": """
+            coping_strategies: 5 specific, actionable strategies for their emotional state, each starting with its number ("1. ...").
+            For positive moods, strategies to maintain and build on those emotions; for negative ones, supportive coping strategies
+        """,
+        "daily_plan": """
+            daily_plan: a supportive daily plan that honors the user preferences and is sensitive to the person's grief state, with at least 3 items in every section
+        """,
+        "detected_mood": "detected_mood: their primary emotional state as a single word or short phrase",
+        "search_query": """
+            search_query: a YouTube search query for music videos that would support them. Positive moods: uplifting, celebratory music; negative moods: soothing, healing music.
+            Only the query text, without quotes (e.g. healing piano music for grief and loss)
+        """,
+    }.items()
+}
+
+
+@lru_cache(maxsize=32)
+def combined_system_prompt(fields: Tuple[str, ...]) -> str:
+    """
+    System instructions for a combined call producing `fields`. Built once
+    per field combination, so the text (and its context cache) is stable.
+    """
+    return "\n".join([PROMPTS["combined"].system] + [COMBINED_FIELD_INSTRUCTIONS[field] for field in fields])
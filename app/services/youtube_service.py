@@ -1,26 +1,137 @@
+import asyncio
+import copy
+import aiohttp
 import logging
 import json
-import aiohttp
-import os
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from app.core.cache import TieredCache
+from app.core.singleflight import SingleFlight
 from app.core.config import settings
+from app.core.http import get_tavily_session
+from app.core.metrics import UpstreamCallTimer
+from app.core.resilience import CircuitBreaker, UpstreamStatusError
+from app.core.tracing import span, traced
 
 log = logging.getLogger(__name__)
 
+# Results are kept for the fresh TTL plus the stale window; stale entries are
+# served immediately while a background refresh runs. Lookups read through
+# to the shared cache tier, so one worker's search serves the others.
+tavily_search_cache = TieredCache(
+    max_entries=settings.tavily_cache_max_entries,
+    ttl=settings.tavily_cache_ttl_seconds + settings.tavily_cache_stale_seconds,
+    name="tavily_search",
+    timeout=settings.cache_shared_timeout_seconds,
+    retry_after=settings.cache_shared_retry_seconds,
+)
+tavily_singleflight = SingleFlight(name="tavily")
+
+
+def _is_tavily_outage(error: BaseException) -> bool:
+    if isinstance(error, UpstreamStatusError):
+        return error.status_code >= 500 or error.status_code == 429
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+tavily_circuit = CircuitBreaker(
+    name="tavily",
+    failure_threshold=settings.tavily_circuit_failure_threshold,
+    reset_timeout=settings.tavily_circuit_reset_seconds,
+    half_open_max_calls=settings.circuit_half_open_max_calls,
+    is_failure=_is_tavily_outage,
+)
+
 class YouTubeService:
-    def __init__(self):
-        # Use environment variable directly to ensure we have the latest value
-        self.tavily_api_key = os.getenv("TAVILY_API_KEY") or settings.tavily_api_key
-        # Use the correct Tavily API endpoint
-        self.tavily_search_url = "https://api.tavily.com/search"
-        
-    async def search_videos(self, query: str, max_results: int = 5):
+    def __init__(
+        self,
+        cache: Optional[TieredCache] = None,
+        singleflight: Optional[SingleFlight] = None,
+        circuit: Optional[CircuitBreaker] = None
+    ):
+        self.tavily_api_key = settings.tavily_api_key
+        self.tavily_search_url = settings.tavily_search_url
+        self.cache = cache if cache is not None else tavily_search_cache
+        self.fresh_ttl = settings.tavily_cache_ttl_seconds
+        self.singleflight = singleflight if singleflight is not None else tavily_singleflight
+        self.circuit = circuit if circuit is not None else tavily_circuit
+        self._refreshing: Set[Tuple] = set()
+        self._background_tasks: Set[asyncio.Task] = set()
+
+    @traced("YouTubeService.search_videos")
+    async def search_videos(self, query: str, max_results: int = 5, include_domains: Sequence[str] = ("youtube.com",)):
+        """
+        Search for YouTube music videos using Tavily API.
+        Results are cached per (query, max_results, domains); stale results are
+        returned immediately and refreshed in the background. While the Tavily
+        circuit is open, uncached searches raise CircuitOpenError at once.
+
+        Args:
+            query: Search query string
+            max_results: Maximum number of results to return
+            include_domains: Domains to restrict the search to
+
+        Returns:
+            List of video information dictionaries
+        """
+        cache_key = (query.strip().lower(), max_results, tuple(sorted(include_domains)))
+        use_cache = settings.tavily_cache_enabled
+
+        if use_cache:
+            # A stale local entry is checked against the shared tier, where
+            # another worker may already have refreshed it
+            entry = await self.cache.get_entry(cache_key, max_age=self.fresh_ttl)
+            if entry is not None:
+                videos, age = entry
+                if age > self.fresh_ttl:
+                    self._schedule_refresh(cache_key, query, max_results, include_domains)
+                # Callers mutate the video dicts, so never hand out the cached objects
+                return copy.deepcopy(videos)
+
+        async def fetch():
+            videos = await self.circuit.call(lambda: self._fetch_videos(query, max_results, include_domains))
+            if use_cache:
+                await self.cache.set(cache_key, copy.deepcopy(videos))
+            return videos
+
+        # Concurrent identical searches share one Tavily request
+        if settings.singleflight_enabled:
+            videos = await self.singleflight.do(cache_key, fetch)
+        else:
+            videos = await fetch()
+        return copy.deepcopy(videos)
+
+    def _schedule_refresh(self, cache_key: Tuple, query: str, max_results: int, include_domains: Sequence[str]):
+        """Start at most one background refresh per stale cache key."""
+        if cache_key in self._refreshing:
+            return
+        self._refreshing.add(cache_key)
+
+        async def refresh():
+            try:
+                videos = await self.singleflight.do(
+                    cache_key,
+                    lambda: self.circuit.call(lambda: self._fetch_videos(query, max_results, include_domains))
+                )
+                await self.cache.set(cache_key, copy.deepcopy(videos))
+                log.debug(f"Refreshed cached Tavily results for: {query}")
+            except Exception as e:
+                log.warning(f"Background Tavily refresh failed, keeping stale results: {str(e)}")
+            finally:
+                self._refreshing.discard(cache_key)
+
+        task = asyncio.create_task(refresh())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _fetch_videos(self, query: str, max_results: int, include_domains: Sequence[str]) -> List[Dict[str, str]]:
         """
-        Search for YouTube music videos using Tavily API
-        
+        Run a Tavily search on the shared session.
+
         Args:
             query: Search query string
             max_results: Maximum number of results to return
-            
+            include_domains: Domains to restrict the search to
+
         Returns:
             List of video information dictionaries
         """
@@ -28,27 +139,25 @@ class YouTubeService:
             if not self.tavily_api_key:
                 log.error("Tavily API key not configured")
                 raise ValueError("Tavily API key not configured in .env file")
-                
+
             log.info(f"Searching for music with Tavily API: {query}")
             search_query = f"{query} youtube music therapy videos"
-            
+
             # Use the correct authentication format for Tavily API
             headers = {
                 "Content-Type": "application/json",
                 "Authorization": f"Bearer {self.tavily_api_key}"  # This is the correct format
             }
-            
+
             payload = {
                 "query": search_query,
-                "search_depth": "advanced", 
-                "include_domains": ["youtube.com"],
+                "search_depth": "advanced",
+                "include_domains": list(include_domains),
                 "max_results": max_results
             }
-            
-            async with aiohttp.ClientSession() as session:
-                log.info(f"Using Tavily API key: {self.tavily_api_key[:5]}...")
-                log.info(f"Headers: Authorization: Bearer {self.tavily_api_key[:5]}...")
-                log.info(f"Tavily Search URL: {self.tavily_search_url}")
+
+            session = get_tavily_session()
+            with UpstreamCallTimer("tavily", "tavily"), span("tavily.search", query_chars=len(search_query)) as search_span:
                 async with session.post(
                     self.tavily_search_url,
                     headers=headers,
@@ -56,7 +165,7 @@ class YouTubeService:
                 ) as response:
                     if response.status == 200:
                         result = await response.json()
-                        
+
                         # Process search results
                         videos = []
                         for item in result.get("results", []):
@@ -65,7 +174,7 @@ class YouTubeService:
                             video_id = ""
                             if "v=" in url:
                                 video_id = url.split("v=")[1].split("&")[0]
-                            
+
                             video_data = {
                                 "title": item.get("title", ""),
                                 "description": item.get("content", ""),
@@ -74,14 +183,15 @@ class YouTubeService:
                                 "video_id": video_id
                             }
                             videos.append(video_data)
-                        
+
+                        search_span.set("results", len(videos))
                         log.info(f"Found {len(videos)} music videos with Tavily")
                         return videos
                     else:
                         error_text = await response.text()
                         log.error(f"Tavily API error: {response.status} - {error_text}")
-                        raise Exception(f"Tavily API error: {response.status}")
-                
+                        raise UpstreamStatusError(f"Tavily API error: {response.status}", status_code=response.status)
+
         except Exception as e:
             log.error(f"Error searching with Tavily: {str(e)}")
             raise
@@ -0,0 +1,98 @@
+"""
+Derive Gemini `responseSchema` objects from pydantic models.
+
+Gemini accepts a subset of OpenAPI 3.0 schemas: no `$ref`, no `anyOf` with
+null (it uses `nullable` instead), no `additionalProperties`, and OBJECT
+schemas need explicit properties. The conversion is cached per model class.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Type
+
+from pydantic import BaseModel
+
+_TYPE_MAP = {
+    "string": "STRING",
+    "integer": "INTEGER",
+    "number": "NUMBER",
+    "boolean": "BOOLEAN",
+    "array": "ARRAY",
+    "object": "OBJECT",
+}
+# Schema keywords Gemini understands that are copied through unchanged
+_PASSTHROUGH = ("description", "enum", "format", "minimum", "maximum", "minItems", "maxItems")
+
+
+def _resolve(schema: Dict[str, Any], defs: Dict[str, Any]) -> Dict[str, Any]:
+    ref = schema.get("$ref")
+    if ref:
+        resolved = dict(defs[ref.rsplit("/", 1)[-1]])
+        # Field-level keys (e.g. description) sit next to the $ref
+        resolved.update({key: value for key, value in schema.items() if key != "$ref"})
+        return resolved
+    all_of = schema.get("allOf")
+    if all_of and len(all_of) == 1:
+        # Older pydantic wraps a $ref that has field-level keys in allOf
+        resolved = dict(_resolve(all_of[0], defs))
+        resolved.update({key: value for key, value in schema.items() if key != "allOf"})
+        return resolved
+    return schema
+
+
+def _convert(schema: Dict[str, Any], defs: Dict[str, Any]) -> Dict[str, Any]:
+    schema = _resolve(schema, defs)
+    nullable = False
+
+    any_of = schema.get("anyOf")
+    if any_of:
+        options = [option for option in any_of if option.get("type") != "null"]
+        nullable = len(options) < len(any_of)
+        if len(options) != 1:
+            raise ValueError("Gemini response schemas do not support unions")
+        # Field-level keys (description, json_schema_extra) take precedence
+        merged = dict(_resolve(options[0], defs))
+        merged.update({key: value for key, value in schema.items() if key != "anyOf"})
+        schema = merged
+
+    json_type = schema.get("type")
+    if json_type not in _TYPE_MAP:
+        raise ValueError(f"Unsupported schema type for Gemini: {json_type!r}")
+
+    converted: Dict[str, Any] = {"type": _TYPE_MAP[json_type]}
+    for key in _PASSTHROUGH:
+        if key in schema:
+            converted[key] = schema[key]
+    if nullable:
+        converted["nullable"] = True
+
+    if json_type == "array" and "items" in schema:
+        converted["items"] = _convert(schema["items"], defs)
+    elif json_type == "object":
+        # Server-populated fields are marked readOnly and never requested from the model
+        properties = {
+            name: _convert(prop, defs)
+            for name, prop in schema.get("properties", {}).items()
+            if not _resolve(prop, defs).get("readOnly")
+        }
+        if not properties:
+            raise ValueError("Gemini OBJECT schemas need explicit properties")
+        converted["properties"] = properties
+        converted["propertyOrdering"] = list(properties)
+        required = [name for name in schema.get("required", []) if name in properties]
+        if required:
+            converted["required"] = required
+    return converted
+
+
+@lru_cache(maxsize=None)
+def gemini_response_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Build (once per class) the Gemini responseSchema for a pydantic model.
+
+    Args:
+        model: Pydantic model class describing the expected output
+
+    Returns:
+        Schema dictionary for generationConfig.responseSchema
+    """
+    schema = model.model_json_schema()
+    return _convert(schema, schema.get("$defs", {}))
@@ -0,0 +1,438 @@
+"""
+Linear-time extraction of JSON from LLM output.
+
+Model responses often wrap JSON in markdown fences, add chatter before or
+after it, or get cut off by the output-token limit. `extract_json` decodes
+candidates with the C JSON decoder starting at each bracket, falls back
+to a single left-to-right bracket scan (no backtracking regex) when that
+gets expensive, and repairs truncated documents by closing open strings
+and brackets.
+"""
+import json
+import re
+import sys
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+_CLOSERS = {"{": "}", "[": "]"}
+_FENCE = "```"
+# Structural characters inside a candidate, and the start of one outside
+_TOKEN = re.compile(r'[{\[]+|[}\]"]')
+_TOKEN_WITH_COMMA = re.compile(r'[{\[]+|[}\]",]')
+_OPENER_RUN = re.compile(r'[{\[]+')
+# Remainder of a JSON string after its opening quote (unrolled, no backtracking)
+_STRING_TAIL = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+# Upper bounds on json.loads attempts so adversarial input stays linear
+_MAX_CANDIDATES = 32
+_MAX_REPAIR_ATTEMPTS = 8
+_MAX_REPAIR_STARTS = 64
+# Work (characters parsed by failed decode attempts) allowed per character
+# of input before extract_json switches to the bracket scan; an attempt that
+# hits the recursion limit is charged as this many characters
+_DECODE_BUDGET_FACTOR = 4
+_RECURSION_COST = 4 * sys.getrecursionlimit()
+# What may follow an opener for it to begin a JSON value: the common next
+# characters, else the full pattern
+_VALUE_CHARS = {"{": frozenset('"}'), "[": frozenset('"{[]-0123456789')}
+_VALUE_START = {
+    "{": re.compile(r'\{\s*(?:["}]|\Z)'),
+    "[": re.compile(r'\[\s*(?:["{\[\]\-0-9]|true|false|null|\Z)'),
+}
+# What's left after the decoder stops in a value cut off by the end of the
+# text: nothing, or part of a number or literal ("-2.", "tru")
+_PARTIAL_TOKEN = re.compile(r'[\w.+\-]*')
+_VALUE_SEARCH = {
+    openers: re.compile("|".join(_VALUE_START[opener].pattern for opener in openers))
+    for openers in ("{", "[", "{[")
+}
+_DECODER = json.JSONDecoder()
+
+
+class JSONExtractionError(ValueError):
+    """Raised when no JSON value can be recovered from the text."""
+
+
+def strip_code_fence(text: str) -> str:
+    """
+    Return the content of the first markdown code fence, or the text unchanged.
+    An unterminated fence (truncated output) yields everything after it.
+    """
+    start = text.find(_FENCE)
+    if start < 0:
+        return text
+    body_start = text.find("\n", start + len(_FENCE))
+    if body_start < 0:
+        # "```json{...}" on a single line
+        body_start = start + len(_FENCE)
+        while body_start < len(text) and text[body_start].isalpha():
+            body_start += 1
+    end = text.find(_FENCE, body_start)
+    return text[body_start:] if end < 0 else text[body_start:end]
+
+
+def _matches(value: Any, expect: Optional[Type]) -> bool:
+    return expect is None or isinstance(value, expect)
+
+
+def _close(fragment: str, stack: List[Tuple[str, int]], in_string: bool) -> str:
+    """Terminate a truncated fragment: close the string, drop dangling syntax, close brackets."""
+    if in_string:
+        fragment += '"'
+    fragment = fragment.rstrip()
+    # A dangling comma or a key without a value can't be closed directly
+    while fragment and fragment[-1] in ",:":
+        if fragment[-1] == ":":
+            # Drop the orphaned key as well
+            key_end = fragment[:-1].rstrip()
+            key_start = key_end[:-1].rfind('"') if key_end.endswith('"') else -1
+            fragment = key_end[:key_start] if key_start >= 0 else key_end
+        else:
+            fragment = fragment[:-1]
+        fragment = fragment.rstrip()
+    return fragment + "".join(_CLOSERS[opener] for opener, _ in reversed(stack))
+
+
+def _repair(text: str, stack: List[Tuple[str, int]], in_string: bool, cuts: List[Tuple[int, int]]) -> Any:
+    """
+    Recover a value from a document truncated at the end of `text`.
+    Tries closing it as-is, then falls back to the latest element boundaries.
+    """
+    start = stack[0][1]
+    try:
+        return json.loads(_close(text[start:], stack, in_string))
+    except (json.JSONDecodeError, RecursionError):
+        pass
+    for cut, depth in reversed(cuts[-_MAX_REPAIR_ATTEMPTS:]):
+        try:
+            return json.loads(_close(text[start:cut], stack[:depth], False))
+        except (json.JSONDecodeError, RecursionError):
+            continue
+    raise JSONExtractionError("Truncated JSON could not be repaired")
+
+
+def extract_json(text: str, expect: Optional[Type] = None, repair: bool = True) -> Any:
+    """
+    Extract the JSON value embedded in model output.
+
+    The whole text is decoded first. Otherwise the C decoder is started at
+    each "{" or "[" that can begin a value (only the wanted kind when
+    `expect` is given), skipping past every value it decodes, and the
+    largest value matching `expect` wins. A document that runs to the end
+    of the text is truncated; if it is larger than every complete value it
+    is repaired. Failed attempts are charged against a budget of a few
+    times the input length; once it is spent (e.g. on long runs of "["),
+    the linear bracket scan in `_extract_by_scan` decides instead.
+
+    Args:
+        text: Raw model output
+        expect: Optional required type of the result (dict or list)
+        repair: Whether to attempt repairing truncated output
+
+    Returns:
+        The decoded JSON value
+
+    Raises:
+        JSONExtractionError: If no suitable JSON value is found
+    """
+    if text is None:
+        raise JSONExtractionError("No text to extract JSON from")
+
+    stripped = text.strip()
+    try:
+        value = json.loads(stripped)
+        if _matches(value, expect):
+            return value
+    except (json.JSONDecodeError, RecursionError):
+        pass
+
+    body = strip_code_fence(stripped)
+    wanted = None if expect is None else ("{" if expect is dict else "[")
+    openers = wanted or "{["
+    budget = _DECODE_BUDGET_FACTOR * len(body) + 4096
+
+    best, best_length, open_start, budget = _decode_candidates(body, openers, 0, expect, budget, stop_at_open=True)
+    if budget < 0:
+        return _extract_by_scan(body, wanted, expect, repair)
+    if open_start >= 0 and len(body) - open_start > best_length:
+        if repair:
+            value = _repair_open(body, open_start, wanted, expect)
+            if value is not None:
+                return value
+        # Complete values nested inside the truncated document
+        nested, nested_length, _, budget = _decode_candidates(body, openers, open_start + 1, expect, budget, stop_at_open=False)
+        if budget < 0:
+            return _extract_by_scan(body, wanted, expect, repair)
+        if nested_length > best_length:
+            best, best_length = nested, nested_length
+    if best_length >= 0:
+        return best
+    raise JSONExtractionError("Couldn't extract JSON from response")
+
+
+def _decode_candidates(
+    body: str,
+    openers: str,
+    pos: int,
+    expect: Optional[Type],
+    budget: int,
+    stop_at_open: bool
+) -> Tuple[Any, int, int, int]:
+    """
+    Decode at every opener from `pos` that can begin a JSON value, skipping
+    past each decoded value.
+
+    Returns:
+        Tuple of (largest value matching `expect`, its length or -1, start
+        of the first document running to the end of the text or -1,
+        remaining budget; negative once spent)
+    """
+    scan_once = _DECODER.scan_once
+    length = len(body)
+    best, best_length, open_start = None, -1, -1
+    # Next "{" and "[" at or after pos (-1: none left or not wanted)
+    brace = body.find("{", pos) if "{" in openers else -1
+    bracket = body.find("[", pos) if "[" in openers else -1
+    while True:
+        if 0 <= brace < pos:
+            brace = body.find("{", pos)
+        if 0 <= bracket < pos:
+            bracket = body.find("[", pos)
+        start = brace if bracket < 0 or 0 <= brace < bracket else bracket
+        if start < 0:
+            break
+        opener = body[start]
+        if body[start + 1:start + 2] not in _VALUE_CHARS[opener] and not _VALUE_START[opener].match(body, start):
+            # Jump over runs of openers that begin nothing (e.g. "{{{{" or "{x{y}")
+            match = _VALUE_SEARCH[openers].search(body, start + 1)
+            if match is None:
+                break
+            pos = match.start()
+            continue
+        try:
+            value, end = scan_once(body, start)
+        except StopIteration as e:
+            # No value where one was expected
+            failed_at, cost = e.value, e.value - start
+        except json.JSONDecodeError as e:
+            # Building the error also scans the text before it for line numbers
+            failed_at = length if e.msg.startswith("Unterminated string") else e.pos
+            cost = failed_at - start + e.pos // 8
+        except RecursionError:
+            failed_at, cost = start, _RECURSION_COST
+        else:
+            if end - start > best_length and _matches(value, expect):
+                best, best_length = value, end - start
+            pos = end
+            continue
+        budget -= cost
+        if open_start < 0 and _PARTIAL_TOKEN.fullmatch(body, failed_at):
+            open_start = start
+            if stop_at_open:
+                break
+        if budget < 0:
+            break
+        pos = start + 1
+    return best, best_length, open_start, budget
+
+
+def _repair_open(body: str, open_start: int, wanted: Optional[str], expect: Optional[Type]) -> Any:
+    """Repair the truncated document starting at `open_start`, or return None."""
+    repair_start = _repair_start(body, [(body[open_start], open_start)])
+    if repair_start < 0:
+        return None
+    stack, _, cuts, in_string = _scan(body, repair_start, wanted, record_cuts=True)
+    return _try_repair(body, stack, in_string, cuts, expect) if stack else None
+
+
+def _extract_by_scan(body: str, wanted: Optional[str], expect: Optional[Type], repair: bool) -> Any:
+    """
+    Linear fallback: one forward scan records every balanced bracket span
+    (strings are skipped with a non-backtracking regex) and the largest
+    spans are decoded until one parses and matches `expect`. If the text
+    ends inside a value, the open document is repaired and considered as well.
+    """
+    stack, spans, _, in_string = _scan(body, 0, wanted, record_cuts=False)
+    cuts: List[Tuple[int, int]] = []
+    repair_start = _repair_start(body, stack) if repair else -1
+    if repair_start >= 0:
+        # Rescan only the unterminated document, this time noting element boundaries
+        stack, _, cuts, in_string = _scan(body, repair_start, wanted, record_cuts=True)
+    else:
+        stack = []
+
+    # Largest candidates first; a truncated document competes by its length
+    spans.sort(key=lambda span: span[0] - span[1])
+    open_length = len(body) - repair_start if stack else -1
+    for start, end in spans[:_MAX_CANDIDATES]:
+        if open_length > end - start:
+            value = _try_repair(body, stack, in_string, cuts, expect)
+            if value is not None:
+                return value
+            open_length = -1
+        try:
+            value = json.loads(body[start:end])
+        except (json.JSONDecodeError, RecursionError):
+            continue
+        if _matches(value, expect):
+            return value
+
+    if open_length >= 0:
+        value = _try_repair(body, stack, in_string, cuts, expect)
+        if value is not None:
+            return value
+    raise JSONExtractionError("Couldn't extract JSON from response")
+
+
+def _scan(body: str, pos: int, wanted: Optional[str], record_cuts: bool):
+    """
+    Single forward pass over `body` from `pos`.
+
+    Returns:
+        Tuple of (open bracket stack, balanced spans of the wanted type,
+        element boundaries inside still-open brackets, ended inside a string)
+    """
+    stack: List[Tuple[str, int]] = []    # (opener, position) of open brackets
+    spans: List[Tuple[int, int]] = []    # balanced (start, end) spans
+    cuts: List[Tuple[int, int]] = []     # (comma position, depth)
+    token_search = (_TOKEN_WITH_COMMA if record_cuts else _TOKEN).search
+    opener_search = _OPENER_RUN.search
+    string_match = _STRING_TAIL.match
+    push = stack.append
+    push_run = stack.extend
+    pop = stack.pop
+    add_span = spans.append
+
+    while True:
+        match = token_search(body, pos) if stack else opener_search(body, pos)
+        if match is None:
+            return stack, spans, cuts, False
+        index = match.start()
+        pos = match.end()
+        char = body[index]
+
+        if char in _CLOSERS:
+            if pos - index == 1:
+                push((char, index))
+            else:
+                # A run of consecutive openers is pushed in one step
+                push_run(zip(body[index:pos], range(index, pos)))
+        elif char == '"':
+            string_end = string_match(body, pos)
+            if string_end is None:
+                return stack, spans, cuts, True
+            pos = string_end.end()
+        elif char == ",":
+            cuts.append((index, len(stack)))
+        else:
+            opener, start = pop()
+            if _CLOSERS[opener] != char:
+                # Mismatched bracket: not JSON, resume looking for a new candidate
+                del stack[:]
+                del cuts[:]
+                continue
+            if wanted is None or opener == wanted:
+                add_span((start, pos))
+            if cuts:
+                depth = len(stack)
+                while cuts and cuts[-1][1] > depth:
+                    cuts.pop()
+
+
+def _repair_start(body: str, stack: List[Tuple[str, int]]) -> int:
+    """
+    Position of the outermost unterminated bracket that can begin a JSON
+    value (an object must open with a key), or -1 if there is none among
+    the first few.
+    """
+    for opener, position in stack[:_MAX_REPAIR_STARTS]:
+        following = body[position + 1:position + 64].lstrip()[:1]
+        if opener == "[" or following in ('"', ""):
+            return position
+    return -1
+
+
+def _try_repair(body: str, stack: List[Tuple[str, int]], in_string: bool, cuts: List[Tuple[int, int]], expect: Optional[Type]) -> Any:
+    try:
+        value = _repair(body, stack, in_string, cuts)
+    except JSONExtractionError:
+        return None
+    return value if _matches(value, expect) else None
+
+
+class JSONArrayItemScanner:
+    """
+    Incremental scanner over a streamed JSON object whose values are arrays
+    of objects (such as a daily plan).
+
+    Text is fed in chunks; every object that completes inside one of the
+    top-level arrays is returned together with the array's key. Each
+    character is examined once, and anything before the first "{" (such as
+    a markdown fence) is ignored. Only the text of an unfinished key or
+    object is kept between chunks, so each one is joined and decoded once.
+    """
+    def __init__(self):
+        # Text fed so far, from offset `_base` on
+        self._buffer: List[str] = []
+        self._base = 0
+        self._length = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_key: Optional[str] = None
+        self._section: Optional[str] = None
+        self._item_start = -1
+
+    def feed(self, chunk: str) -> List[Tuple[str, Dict[str, Any]]]:
+        completed = []
+        offset = self._length
+        self._buffer.append(chunk)
+        self._length += len(chunk)
+        text = None
+
+        for index, char in enumerate(chunk, start=offset):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        text = text or "".join(self._buffer)
+                        self._last_key = text[self._string_start + 1 - self._base:index - self._base]
+                continue
+
+            if char == '"' and self._depth > 0:
+                self._in_string = True
+                self._string_start = index
+            elif char == "{" or (char == "[" and self._depth > 0):
+                self._depth += 1
+                if char == "[" and self._depth == 2:
+                    self._section = self._last_key
+                elif char == "{" and self._depth == 3 and self._section:
+                    self._item_start = index
+            elif char in "}]" and self._depth > 0:
+                if char == "}" and self._depth == 3 and self._item_start >= 0:
+                    text = text or "".join(self._buffer)
+                    try:
+                        completed.append((self._section, json.loads(text[self._item_start - self._base:index + 1 - self._base])))
+                    except json.JSONDecodeError:
+                        pass
+                    self._item_start = -1
+                elif char == "]" and self._depth == 2:
+                    self._section = None
+                self._depth -= 1
+
+        # Drop what no unfinished key or object needs any more
+        if self._item_start >= 0:
+            keep = self._item_start
+        elif self._in_string and self._depth == 1:
+            keep = self._string_start
+        else:
+            keep = self._length
+        if keep > self._base:
+            text = (text or "".join(self._buffer))[keep - self._base:]
+            self._base = keep
+        if text is not None:
+            self._buffer = [text] if text else []
+        return completed
@@ -0,0 +1,108 @@
+"""
+Micro-benchmark: app.utils.json_extract.extract_json versus the nested-brace
+regex fallback GriefService used before, on large and adversarial inputs.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_json_extract [--size 200000] [--repeat 5]
+"""
+import argparse
+import json
+import re
+import time
+
+from app.utils.json_extract import JSONExtractionError, extract_json
+
+LEGACY_PATTERN = r'\{(?:[^{}]|(?:\{(?:[^{}]|(?:\{(?:[^{}])*\}))*\}))*\}'
+
+
+def legacy_extract(text: str):
+    """The regex + sort + json.loads fallback previously used by GriefService."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    matches = re.findall(LEGACY_PATTERN, text)
+    matches.sort(key=len, reverse=True)
+    for candidate in matches:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    raise ValueError("no JSON")
+
+
+def nested(depth: int):
+    value = {"leaf": True}
+    for level in range(depth):
+        value = {f"level_{level}": value, "note": "x"}
+    return value
+
+
+def build_inputs(size: int):
+    """Return {case name: (text, expected value or None if nothing is recoverable)}."""
+    grief = {
+        "emotional_validation": "I hear how heavy this is. " * 20,
+        "mood_analysis": {"detected_mood": "sad", "mood_intensity": 8, "grief_stage": "depression"},
+        "coping_strategies": [f"{i}. Take a slow walk and notice {{five}} things" for i in range(1, 6)],
+    }
+    document = json.dumps(grief)
+    filler = "lorem ipsum dolor sit amet "
+    chatter = (filler * (size // len(filler) + 1))[:size]
+    deep = nested(6)
+    return {
+        "fenced": (f"Here you go:\n```json\n{document}\n```\nTake care.", grief),
+        "long_chatter": (f"{chatter}\n{document}\n{chatter}", grief),
+        "many_small_objects": ("{\"a\": 1} " * (size // 9) + document, grief),
+        "unbalanced_openers": ("{" * size + document, grief),
+        "brace_soup": ("{x{y}" * (size // 5) + document, grief),
+        "deeply_nested": (f"Result: {json.dumps(deep)}", deep),
+        "truncated": (document[: len(document) * 2 // 3], None),
+    }
+
+
+def time_call(func, text: str, expected, repeat: int):
+    """
+    Returns:
+        Best wall time and outcome: "ok", "wrong" (a different JSON value was
+        returned) or "fail" (nothing recovered). For truncated input any
+        recovered dict counts as ok.
+    """
+    best = float("inf")
+    outcome = "ok"
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            value = func(text)
+            if expected is None:
+                outcome = "ok" if isinstance(value, dict) else "wrong"
+            else:
+                outcome = "ok" if value == expected else "wrong"
+        except (ValueError, JSONExtractionError):
+            outcome = "fail"
+        best = min(best, time.perf_counter() - start)
+    return best, outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=200_000, help="approximate adversarial input size in characters")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case (best time is reported)")
+    parser.add_argument("--legacy-timeout", type=float, default=10.0, help="skip the legacy regex once one case exceeds this many seconds")
+    args = parser.parse_args()
+
+    print(f"{'case':<22}{'chars':>10}{'extract_json':>17}{'legacy regex':>19}")
+    skip_legacy = False
+    for name, (text, expected) in build_inputs(args.size).items():
+        new_time, new_outcome = time_call(extract_json, text, expected, args.repeat)
+        if skip_legacy:
+            legacy = "skipped"
+        else:
+            legacy_time, legacy_outcome = time_call(legacy_extract, text, expected, 1)
+            legacy = f"{legacy_time * 1000:9.2f} ms {legacy_outcome:<5}"
+            skip_legacy = legacy_time > args.legacy_timeout
+        print(f"{name:<22}{len(text):>10}{new_time * 1000:>9.2f} ms {new_outcome:<5}{legacy:>19}")
+
+
+if __name__ == "__main__":
+    main()
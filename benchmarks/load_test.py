@@ -0,0 +1,370 @@
+"""
+Load test: drive /api/v1/unified-analysis against local Gemini/Tavily stubs
+and record throughput, latency percentiles and server CPU per request.
+
+The driver starts benchmarks.stub_servers and the app (uvicorn) as
+subprocesses, the app pointed at the stubs through GEMINI_BASE_URL and
+TAVILY_SEARCH_URL, then sends a seeded mix of requests with different
+section flags. Results are written to a JSON file; pass --baseline with an
+earlier result to print the differences.
+
+Run from the repository root:
+
+    python -m benchmarks.load_test [--requests 500] [--concurrency 20]
+        [--mix grief=4,grief+plan=2,all=1,media=1] [--output results.json]
+        [--baseline previous.json] [--env GEMINI_CACHE_ENABLED=false]
+
+Stub options (latency distributions, error rates, payload sizes) are the
+same as for benchmarks.stub_servers. CPU is read from /proc, so it is only
+reported on Linux.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.stub_servers import STUB_OPTIONS, add_stub_arguments
+
+ENDPOINT = "/api/v1/unified-analysis"
+
+# Section flags per scenario name used in --mix
+SCENARIOS: Dict[str, Dict[str, bool]] = {
+    "grief": {"include_grief_analysis": True},
+    "plan": {"include_grief_analysis": False, "include_daily_plan": True},
+    "media": {"include_grief_analysis": False, "include_media_recommendations": True},
+    "grief+plan": {"include_grief_analysis": True, "include_daily_plan": True},
+    "grief+media": {"include_grief_analysis": True, "include_media_recommendations": True},
+    "all": {"include_grief_analysis": True, "include_daily_plan": True, "include_media_recommendations": True},
+}
+
+MESSAGES = (
+    "I lost my mother last month and I can't stop crying at night.",
+    "My dog passed away yesterday and the house feels so empty.",
+    "It's been a year since my brother died and I still feel numb.",
+    "I'm angry that nobody warned us how sick my dad really was.",
+    "Some days I feel hopeful again, then the grief hits me out of nowhere.",
+    "I can't focus at work since my best friend's funeral.",
+    "I keep replaying our last conversation and wishing I had said more.",
+    "My grandmother raised me and now I don't know who to call.",
+)
+
+# Measure the service rather than the production quota or log volume
+DEFAULT_APP_ENV = {
+    "GEMINI_API_KEY": "benchmark",
+    "TAVILY_API_KEY": "benchmark",
+    "GEMINI_REQUESTS_PER_MINUTE": "0",
+    "TRACING_ENABLED": "false",
+    "LOG_LEVEL": "WARNING",
+}
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    """Parse "grief=4,all=1" into [(scenario, weight), ...]."""
+    mix = []
+    for item in spec.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r} (choose from {', '.join(SCENARIOS)})")
+        try:
+            mix.append((name, float(weight or 1)))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid weight in {item!r}")
+    return mix
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_cpu_seconds(pid: int) -> Optional[float]:
+    """User + system CPU time of a process, from /proc (None elsewhere)."""
+    try:
+        fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    # utime and stime are fields 14 and 15 of stat(5); the slice starts at field 3
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def process_peak_rss_mb(pid: int) -> Optional[float]:
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+def summarize(latencies: List[float]) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(1000 * sum(ordered) / len(ordered), 2) if ordered else None,
+        **{
+            f"p{int(q * 100)}_ms": round(1000 * value, 2) if value is not None else None
+            for q, value in ((q, percentile(ordered, q)) for q in (0.5, 0.95, 0.99))
+        },
+        "max_ms": round(1000 * ordered[-1], 2) if ordered else None,
+    }
+
+
+def git_revision() -> Dict[str, Any]:
+    def run(*command):
+        try:
+            return subprocess.run(command, capture_output=True, text=True, timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {"commit": run("git", "rev-parse", "HEAD") or None, "dirty": bool(run("git", "status", "--porcelain", "--untracked-files=no"))}
+
+
+async def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {process.returncode} before becoming ready")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s")
+
+
+def stop(process: Optional[subprocess.Popen]):
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+class LoadDriver:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.mix = args.mix
+
+    def build_requests(self, count: int, offset: int = 0) -> List[Tuple[str, Dict[str, Any]]]:
+        """Seeded list of (scenario, payload); messages repeat only with --message-pool."""
+        names = [name for name, _ in self.mix]
+        weights = [weight for _, weight in self.mix]
+        requests = []
+        for number in range(offset, offset + count):
+            scenario = self.rng.choices(names, weights)[0]
+            message = self.rng.choice(MESSAGES)
+            if self.args.message_pool:
+                message = f"{message} ({number % self.args.message_pool})"
+            else:
+                message = f"{message} (request {number})"
+            payload = {"user_message": message, "max_media_results": self.args.media_results, **SCENARIOS[scenario]}
+            requests.append((scenario, payload))
+        return requests
+
+    async def run(self, client: httpx.AsyncClient, requests: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in requests:
+            queue.put_nowait(item)
+        samples: List[Dict[str, Any]] = []
+
+        async def worker():
+            while not queue.empty():
+                scenario, payload = queue.get_nowait()
+                started = time.perf_counter()
+                sample: Dict[str, Any] = {"scenario": scenario}
+                try:
+                    response = await client.post(ENDPOINT, json=payload)
+                    sample["status"] = response.status_code
+                    if response.status_code == 200:
+                        body = response.json()
+                        sample["section_errors"] = len(body.get("errors") or {})
+                        sample["degraded"] = bool(body.get("degraded"))
+                except httpx.HTTPError as e:
+                    sample["status"] = type(e).__name__
+                sample["latency"] = time.perf_counter() - started
+                samples.append(sample)
+
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+        return samples
+
+
+def build_report(
+    samples: List[Dict[str, Any]],
+    elapsed: float,
+    cpu_seconds: Optional[float],
+    peak_rss_mb: Optional[float],
+    stub_stats: Dict[str, Any],
+    args: argparse.Namespace
+) -> Dict[str, Any]:
+    statuses: Dict[str, int] = {}
+    for sample in samples:
+        statuses[str(sample["status"])] = statuses.get(str(sample["status"]), 0) + 1
+    ok = [sample for sample in samples if sample["status"] == 200]
+    by_scenario = {}
+    for name, _ in args.mix:
+        scenario_ok = [sample["latency"] for sample in ok if sample["scenario"] == name]
+        if scenario_ok:
+            by_scenario[name] = summarize(scenario_ok)
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "mix": dict(args.mix),
+            "message_pool": args.message_pool,
+            "media_results": args.media_results,
+            "app_env": dict(item.split("=", 1) for item in args.env),
+            "stubs": {option: getattr(args, option) for option in STUB_OPTIONS},
+        },
+        "results": {
+            "elapsed_seconds": round(elapsed, 3),
+            "rps": round(len(samples) / elapsed, 2) if elapsed else None,
+            "statuses": statuses,
+            "section_errors": sum(sample.get("section_errors", 0) for sample in ok),
+            "degraded": sum(1 for sample in ok if sample.get("degraded")),
+            "latency": summarize([sample["latency"] for sample in ok]),
+            "latency_by_scenario": by_scenario,
+            "server_cpu_seconds": round(cpu_seconds, 3) if cpu_seconds is not None else None,
+            "server_cpu_ms_per_request": round(1000 * cpu_seconds / len(samples), 3) if cpu_seconds is not None and samples else None,
+            "server_peak_rss_mb": round(peak_rss_mb, 1) if peak_rss_mb is not None else None,
+            "upstream_calls": stub_stats,
+        },
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Human-readable differences of the headline numbers against a baseline report."""
+    lines = [f"vs baseline {(baseline.get('git') or {}).get('commit') or '?'}"]
+    current, previous = report["results"], baseline.get("results", {})
+    headline = [
+        ("rps", current.get("rps"), previous.get("rps")),
+        ("cpu ms/request", current.get("server_cpu_ms_per_request"), previous.get("server_cpu_ms_per_request")),
+    ]
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        headline.append((key, current["latency"].get(key), (previous.get("latency") or {}).get(key)))
+    for name, now, before in headline:
+        if now is None or not before:
+            lines.append(f"  {name:<16} {now}")
+            continue
+        lines.append(f"  {name:<16} {now:>10} ({100 * (now - before) / before:+.1f}% from {before})")
+    return lines
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    stub_port, app_port = free_port(), free_port()
+    stub_url, app_url = f"http://127.0.0.1:{stub_port}", f"http://127.0.0.1:{app_port}"
+
+    stub_command = [sys.executable, "-m", "benchmarks.stub_servers", "--port", str(stub_port)]
+    for option in STUB_OPTIONS:
+        stub_command += [f"--{option.replace('_', '-')}", str(getattr(args, option))]
+
+    app_env = dict(os.environ, **DEFAULT_APP_ENV)
+    app_env.update(item.split("=", 1) for item in args.env)
+    app_env["GEMINI_BASE_URL"] = f"{stub_url}/v1beta"
+    app_env["TAVILY_SEARCH_URL"] = f"{stub_url}/search"
+    app_command = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(app_port),
+        "--log-level", "warning", "--no-access-log",
+    ]
+
+    stub_process = app_process = None
+    try:
+        stub_process = subprocess.Popen(stub_command)
+        await wait_ready(f"{stub_url}/stats", stub_process)
+        with open(args.app_log, "ab") as app_log:
+            app_process = subprocess.Popen(app_command, env=app_env, stdout=app_log, stderr=subprocess.STDOUT)
+        await wait_ready(f"{app_url}/ready", app_process)
+
+        driver = LoadDriver(args)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=app_url, timeout=args.timeout, limits=limits) as client:
+            if args.warmup:
+                print(f"Warming up with {args.warmup} requests...")
+                await driver.run(client, driver.build_requests(args.warmup, offset=args.requests))
+
+            requests = driver.build_requests(args.requests)
+            print(f"Sending {args.requests} requests at concurrency {args.concurrency}...")
+            cpu_before = process_cpu_seconds(app_process.pid)
+            started = time.perf_counter()
+            samples = await driver.run(client, requests)
+            elapsed = time.perf_counter() - started
+            cpu_after = process_cpu_seconds(app_process.pid)
+
+            stub_stats = (await client.get(f"{stub_url}/stats")).json()
+
+        cpu_seconds = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+        return build_report(samples, elapsed, cpu_seconds, process_peak_rss_mb(app_process.pid), stub_stats, args)
+    finally:
+        stop(app_process)
+        stop(stub_process)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests sent first")
+    parser.add_argument("--concurrency", type=int, default=20, help="Requests in flight")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("grief=4,grief+plan=2,all=1,media=1"),
+                        help=f"Weighted scenarios: {', '.join(SCENARIOS)}")
+    parser.add_argument("--message-pool", type=int, default=0,
+                        help="Distinct messages to cycle through (0: every message unique, so caches stay cold)")
+    parser.add_argument("--media-results", type=int, default=5, help="max_media_results per request")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Extra app environment (repeatable)")
+    parser.add_argument("--output", default="benchmark-results.json", help="Result JSON file")
+    parser.add_argument("--app-log", default=os.devnull, help="File receiving the app's log output")
+    parser.add_argument("--baseline", help="Earlier result JSON to compare against")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    for item in args.env:
+        if "=" not in item:
+            parser.error(f"--env expects KEY=VALUE, got {item!r}")
+
+    report = asyncio.run(main_async(args))
+    Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+
+    results = report["results"]
+    print(f"{results['rps']} req/s, statuses {results['statuses']}, "
+          f"p50 {results['latency']['p50_ms']}ms p95 {results['latency']['p95_ms']}ms p99 {results['latency']['p99_ms']}ms, "
+          f"server CPU {results['server_cpu_ms_per_request']}ms/request")
+    for name, stats in results["latency_by_scenario"].items():
+        print(f"  {name:<12} n={stats['count']:<5} p50 {stats['p50_ms']}ms p95 {stats['p95_ms']}ms p99 {stats['p99_ms']}ms")
+    if args.baseline:
+        print("\n".join(compare(report, json.loads(Path(args.baseline).read_text()))))
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Minimal in-memory server speaking the Redis protocol (RESP), a local
+stand-in for the "redis" shared cache tier (CACHE_BACKEND=redis) in
+benchmarks and multi-worker tests.
+
+Supports PING, ECHO, AUTH, SELECT, GET, SET (with EX/PX/NX/XX), DEL,
+EXISTS, PTTL, DBSIZE, FLUSHDB, FLUSHALL, INFO and QUIT. Keys expire
+lazily on access. INFO reports per-command counts and hits/misses.
+
+Run from the repository root:
+
+    python -m benchmarks.resp_server [--port 6390] [--password secret] [--latency-ms 0]
+
+and point the API at it with CACHE_BACKEND=redis CACHE_REDIS_URL=redis://127.0.0.1:6390/0
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+
+class RespError(Exception):
+    pass
+
+
+def encode(reply) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, RespError):
+        return f"-ERR {reply}\r\n".encode()
+    if isinstance(reply, bool):
+        return b"+OK\r\n" if reply else b"$-1\r\n"
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, str):
+        return f"+{reply}\r\n".encode()
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    if isinstance(reply, list):
+        return b"*%d\r\n" % len(reply) + b"".join(encode(item) for item in reply)
+    raise TypeError(f"Cannot encode {type(reply).__name__}")
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # Inline command (e.g. typed into telnet)
+        return line.strip().split()
+    args = []
+    for _ in range(int(line[1:-2])):
+        header = await reader.readline()
+        if not header.startswith(b"$"):
+            raise RespError("Protocol error: expected bulk string")
+        data = await reader.readexactly(int(header[1:-2]) + 2)
+        args.append(data[:-2])
+    return args
+
+
+class RespServer:
+    def __init__(self, password: Optional[str] = None, latency: float = 0.0):
+        self.password = password
+        self.latency = latency
+        # db -> key -> (value, expires_at or None)
+        self.dbs: Dict[int, Dict[bytes, Tuple[bytes, Optional[float]]]] = {}
+        self.commands: Counter = Counter()
+        self.hits = 0
+        self.misses = 0
+        self.connections = 0
+
+    def _live(self, db: int, key: bytes) -> Optional[bytes]:
+        entry = self.dbs.get(db, {}).get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self.dbs[db][key]
+            return None
+        return entry[0]
+
+    def execute(self, state: Dict, args: List[bytes]):
+        name = args[0].decode().upper()
+        self.commands[name] += 1
+        if name == "AUTH":
+            if self.password is None or args[-1].decode() != self.password:
+                return RespError("invalid password")
+            state["authed"] = True
+            return "OK"
+        if self.password is not None and not state["authed"] and name not in ("PING", "QUIT"):
+            return RespError("NOAUTH Authentication required.")
+
+        db = state["db"]
+        store = self.dbs.setdefault(db, {})
+        if name == "PING":
+            return args[1] if len(args) > 1 else "PONG"
+        if name == "ECHO":
+            return args[1]
+        if name == "SELECT":
+            state["db"] = int(args[1])
+            return "OK"
+        if name == "GET":
+            value = self._live(db, args[1])
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+        if name == "SET":
+            key, value, expires_at = args[1], args[2], None
+            options = [arg.decode().upper() for arg in args[3:]]
+            position = 0
+            while position < len(options):
+                option = options[position]
+                if option in ("EX", "PX"):
+                    amount = float(options[position + 1])
+                    expires_at = time.monotonic() + (amount if option == "EX" else amount / 1000)
+                    position += 2
+                    continue
+                if option == "NX" and self._live(db, key) is not None:
+                    return None
+                if option == "XX" and self._live(db, key) is None:
+                    return None
+                position += 1
+            store[key] = (value, expires_at)
+            return "OK"
+        if name == "DEL":
+            return sum(1 for key in args[1:] if self._live(db, key) is not None and store.pop(key, None) is not None)
+        if name == "EXISTS":
+            return sum(1 for key in args[1:] if self._live(db, key) is not None)
+        if name == "PTTL":
+            if self._live(db, args[1]) is None:
+                return -2
+            expires_at = store[args[1]][1]
+            return -1 if expires_at is None else int((expires_at - time.monotonic()) * 1000)
+        if name == "DBSIZE":
+            return sum(1 for key in list(store) if self._live(db, key) is not None)
+        if name == "FLUSHDB":
+            store.clear()
+            return "OK"
+        if name == "FLUSHALL":
+            self.dbs.clear()
+            return "OK"
+        if name == "INFO":
+            lines = [f"connections:{self.connections}", f"keyspace_hits:{self.hits}", f"keyspace_misses:{self.misses}"]
+            lines += [f"cmdstat_{command.lower()}:calls={count}" for command, count in sorted(self.commands.items())]
+            return "\r\n".join(lines).encode()
+        return RespError(f"unknown command '{name}'")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        state = {"db": 0, "authed": False}
+        try:
+            while True:
+                try:
+                    args = await read_command(reader)
+                except RespError as e:
+                    writer.write(encode(e))
+                    break
+                if args is None:
+                    break
+                if not args:
+                    continue
+                if args[0].upper() == b"QUIT":
+                    writer.write(encode("OK"))
+                    break
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                try:
+                    reply = self.execute(state, args)
+                except (IndexError, ValueError) as e:
+                    reply = RespError(f"syntax error: {e}")
+                writer.write(encode(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host: str, port: int, password: Optional[str], latency: float):
+    server = RespServer(password=password, latency=latency)
+    listener = await asyncio.start_server(server.handle, host, port)
+    print(f"RESP stand-in listening on {host}:{port}", flush=True)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--password", default=None)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every command")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.password, args.latency_ms / 1000))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+"""
+Local stand-ins for the Gemini and Tavily APIs, used by the load driver
+(benchmarks/load_test.py) so benchmarks are reproducible and free.
+
+Gemini `generateContent` / `streamGenerateContent?alt=sse`, model
+metadata (used to prewarm connections), the `cachedContents`
+create/update/delete calls used for context caching, and
+Tavily `/search` answer with the same response shapes as the real services.
+Like the real API, caches smaller than --cache-min-tokens are rejected and
+generate calls that reference an unknown or expired cache fail with 403.
+Structured calls get JSON generated from the request's responseSchema; the
+free-text call sites (mood, search query, relevance explanations) are
+recognized from their prompts. Latency, error rates and payload sizes are
+configurable per upstream.
+
+Run from the repository root:
+
+    python -m benchmarks.stub_servers [--port 8701] [--gemini-latency lognormal:400:0.5]
+        [--gemini-error-rate 0.01] [--tavily-latency uniform:150:400] [--seed 7]
+        [--gemini-prefill-ms-per-1k 20] [--cache-min-tokens 1024]
+
+Latency specs (milliseconds): fixed:MS, uniform:LOW:HIGH,
+lognormal:MEDIAN:SIGMA, exponential:MEAN.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+WORDS = (
+    "gentle", "breathe", "remember", "walk", "light", "quiet", "music", "water", "rest", "morning",
+    "kindness", "journal", "friend", "garden", "slowly", "warm", "tea", "memory", "calm", "together",
+)
+MOODS = ("sad", "grieving", "anxious", "lonely", "hopeful", "angry", "numb")
+VIDEO_LINE = re.compile(r'^\s*(\d+)\.\s+"', re.MULTILINE)
+CACHE_NOT_FOUND = {"error": {"code": 403, "message": "CachedContent not found (or permission denied)", "status": "PERMISSION_DENIED"}}
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a latency distribution spec into a sampler.
+
+    Args:
+        spec: "fixed:MS", "uniform:LOW:HIGH", "lognormal:MEDIAN:SIGMA" or "exponential:MEAN"
+
+    Returns:
+        Function drawing one latency in seconds from a random.Random
+    """
+    kind, _, rest = spec.partition(":")
+    try:
+        params = [float(value) for value in rest.split(":")] if rest else []
+        if kind == "fixed" and len(params) == 1:
+            return lambda rng: params[0] / 1000
+        if kind == "uniform" and len(params) == 2:
+            return lambda rng: rng.uniform(params[0], params[1]) / 1000
+        if kind == "lognormal" and len(params) == 2:
+            # The median of lognormvariate(mu, sigma) is e^mu
+            return lambda rng: params[0] * rng.lognormvariate(0.0, params[1]) / 1000
+        if kind == "exponential" and len(params) == 1:
+            return lambda rng: rng.expovariate(1.0 / params[0]) / 1000 if params[0] > 0 else 0.0
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f"invalid latency spec: {spec!r}")
+
+
+@dataclass
+class UpstreamProfile:
+    """Behaviour of one stubbed upstream."""
+    latency: Callable[[random.Random], float]
+    error_rate: float = 0.0          # share of requests answered with 503
+    rate_limit_rate: float = 0.0     # share of requests answered with 429
+    payload_words: int = 12          # words per generated text field
+    array_items: int = 3             # items per generated array / search results cap
+    prefill_ms_per_1k: float = 0.0   # extra latency per 1000 uncached prompt tokens
+
+
+class StubState:
+    def __init__(
+        self,
+        gemini: UpstreamProfile,
+        tavily: UpstreamProfile,
+        stream_chunks: int,
+        seed: Optional[int],
+        cache_min_tokens: int = 1024
+    ):
+        self.gemini = gemini
+        self.tavily = tavily
+        self.stream_chunks = max(1, stream_chunks)
+        self.cache_min_tokens = cache_min_tokens
+        self.rng = random.Random(seed)
+        self.requests: Dict[str, int] = {
+            "generate": 0, "stream": 0, "search": 0, "model_get": 0,
+            "cache_create": 0, "cache_update": 0, "cache_delete": 0, "cached_content_used": 0,
+        }
+        self.errors: Dict[str, int] = {"503": 0, "429": 0}
+        self.tokens: Dict[str, int] = {"prompt": 0, "cached": 0}
+        # cachedContents name -> (token count, expiry as time.time())
+        self.caches: Dict[str, Tuple[int, float]] = {}
+
+    def cached_tokens(self, name: str) -> Optional[int]:
+        entry = self.caches.get(name)
+        if entry is None or entry[1] <= time.time():
+            self.caches.pop(name, None)
+            return None
+        return entry[0]
+
+    def words(self, count: int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(max(1, count)))
+
+    def injected_error(self, profile: UpstreamProfile) -> Optional[web.Response]:
+        roll = self.rng.random()
+        if roll < profile.rate_limit_rate:
+            self.errors["429"] += 1
+            return web.json_response(
+                {"error": {"code": 429, "message": "Resource has been exhausted", "status": "RESOURCE_EXHAUSTED"}},
+                status=429,
+                headers={"Retry-After": "1"}
+            )
+        if roll < profile.rate_limit_rate + profile.error_rate:
+            self.errors["503"] += 1
+            return web.json_response(
+                {"error": {"code": 503, "message": "The model is overloaded", "status": "UNAVAILABLE"}},
+                status=503
+            )
+        return None
+
+
+def value_for_schema(schema: Dict[str, Any], state: StubState) -> Any:
+    """Generate a value matching a Gemini responseSchema."""
+    schema_type = schema.get("type")
+    if "enum" in schema:
+        return state.rng.choice(schema["enum"])
+    if schema_type == "OBJECT":
+        return {name: value_for_schema(prop, state) for name, prop in schema.get("properties", {}).items()}
+    if schema_type == "ARRAY":
+        items = schema.get("items", {"type": "STRING"})
+        return [value_for_schema(items, state) for _ in range(state.gemini.array_items)]
+    if schema_type == "INTEGER":
+        return state.rng.randint(int(schema.get("minimum", 1)), int(schema.get("maximum", 10)))
+    if schema_type == "NUMBER":
+        return round(state.rng.uniform(schema.get("minimum", 0.0), schema.get("maximum", 1.0)), 3)
+    if schema_type == "BOOLEAN":
+        return state.rng.random() < 0.5
+    return state.words(state.gemini.payload_words)
+
+
+def gemini_answer(body: Dict[str, Any], state: StubState) -> str:
+    """Text the stub model answers a generateContent request with."""
+    schema = (body.get("generationConfig") or {}).get("responseSchema")
+    if schema:
+        return json.dumps(value_for_schema(schema, state))
+
+    prompt = " ".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+    if "VIDEOS:" in prompt:
+        indexes = [int(index) for index in VIDEO_LINE.findall(prompt.split("VIDEOS:", 1)[1])]
+        return json.dumps([{"index": index, "explanation": state.words(state.gemini.payload_words)} for index in indexes])
+    if "primary emotional state" in prompt:
+        return state.rng.choice(MOODS)
+    if "search query" in prompt:
+        return "healing piano music for grief and loss"
+    return state.words(state.gemini.payload_words)
+
+
+def gemini_chunk(text: str, finish: bool, prompt_tokens: int, response_tokens: int, cached_tokens: int = 0) -> Dict[str, Any]:
+    candidate: Dict[str, Any] = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if finish:
+        candidate["finishReason"] = "STOP"
+    usage = {
+        "promptTokenCount": prompt_tokens,
+        "candidatesTokenCount": response_tokens,
+        "totalTokenCount": prompt_tokens + response_tokens,
+    }
+    if cached_tokens:
+        usage["cachedContentTokenCount"] = cached_tokens
+    return {"candidates": [candidate], "usageMetadata": usage, "modelVersion": "stub"}
+
+
+def token_count(text: str) -> int:
+    # Roughly four characters per token, like Gemini's English estimate
+    return max(1, len(text) // 4)
+
+
+def parse_ttl(value: Any) -> float:
+    """Parse a protobuf Duration string such as "3600s"."""
+    return float(str(value).rstrip("s"))
+
+
+async def handle_gemini(request: web.Request) -> web.StreamResponse:
+    state: StubState = request.app["state"]
+    _, _, method = request.match_info["call"].partition(":")
+    if method not in ("generateContent", "streamGenerateContent"):
+        return web.json_response({"error": {"code": 404, "message": f"Unknown method {method}"}}, status=404)
+    body = await request.json()
+    prompt_tokens = token_count(json.dumps(body.get("contents", [])) + json.dumps(body.get("systemInstruction", "")))
+    cached_tokens = 0
+    if body.get("cachedContent"):
+        cached = state.cached_tokens(body["cachedContent"])
+        if cached is None:
+            return web.json_response(CACHE_NOT_FOUND, status=403)
+        cached_tokens = cached
+        state.requests["cached_content_used"] += 1
+    state.tokens["prompt"] += prompt_tokens + cached_tokens
+    state.tokens["cached"] += cached_tokens
+    # Cached prefixes skip prefill; only the rest of the prompt is charged
+    latency = state.gemini.latency(state.rng) + prompt_tokens * state.gemini.prefill_ms_per_1k / 1e6
+    prompt_tokens += cached_tokens
+
+    if method == "generateContent":
+        state.requests["generate"] += 1
+        await asyncio.sleep(latency)
+        error = state.injected_error(state.gemini)
+        if error is not None:
+            return error
+        text = gemini_answer(body, state)
+        return web.json_response(gemini_chunk(text, True, prompt_tokens, token_count(text), cached_tokens))
+
+    state.requests["stream"] += 1
+    error = state.injected_error(state.gemini)
+    if error is not None:
+        await asyncio.sleep(latency)
+        return error
+    text = gemini_answer(body, state)
+    size = -(-len(text) // state.stream_chunks)
+    pieces = [text[start:start + size] for start in range(0, len(text), size)] or [""]
+
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await response.prepare(request)
+    # The latency is spread over the chunks, so time-to-first-chunk is a fraction of it
+    for number, piece in enumerate(pieces, start=1):
+        await asyncio.sleep(latency / len(pieces))
+        event = gemini_chunk(piece, number == len(pieces), prompt_tokens, token_count(text[:number * size]), cached_tokens)
+        await response.write(f"data: {json.dumps(event)}\r\n\r\n".encode())
+    await response.write_eof()
+    return response
+
+
+async def handle_model_get(request: web.Request) -> web.Response:
+    """Model metadata, the no-quota request the API uses to prewarm connections."""
+    state: StubState = request.app["state"]
+    state.requests["model_get"] += 1
+    model = request.match_info["model"]
+    return web.json_response({
+        "name": f"models/{model}",
+        "displayName": model,
+        "inputTokenLimit": 1048576,
+        "outputTokenLimit": 8192,
+        "supportedGenerationMethods": ["generateContent", "createCachedContent"],
+    })
+
+
+async def handle_cache_create(request: web.Request) -> web.Response:
+    state: StubState = request.app["state"]
+    state.requests["cache_create"] += 1
+    body = await request.json()
+    tokens = token_count(json.dumps(body.get("systemInstruction", "")) + json.dumps(body.get("contents", [])))
+    if tokens < state.cache_min_tokens:
+        return web.json_response({"error": {
+            "code": 400,
+            "message": f"Cached content is too small. total_token_count={tokens}, min_total_token_count={state.cache_min_tokens}",
+            "status": "INVALID_ARGUMENT",
+        }}, status=400)
+    name = f"cachedContents/{uuid.uuid4().hex[:12]}"
+    expires = time.time() + parse_ttl(body.get("ttl", "3600s"))
+    state.caches[name] = (tokens, expires)
+    return web.json_response({
+        "name": name,
+        "model": body.get("model"),
+        "expireTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(expires)),
+        "usageMetadata": {"totalTokenCount": tokens},
+    })
+
+
+async def handle_cache_update(request: web.Request) -> web.Response:
+    state: StubState = request.app["state"]
+    state.requests["cache_update"] += 1
+    name = f"cachedContents/{request.match_info['cache_id']}"
+    tokens = state.cached_tokens(name)
+    if tokens is None:
+        return web.json_response(CACHE_NOT_FOUND, status=403)
+    body = await request.json()
+    expires = time.time() + parse_ttl(body.get("ttl", "3600s"))
+    state.caches[name] = (tokens, expires)
+    return web.json_response({"name": name, "expireTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(expires))})
+
+
+async def handle_cache_delete(request: web.Request) -> web.Response:
+    state: StubState = request.app["state"]
+    state.requests["cache_delete"] += 1
+    if state.caches.pop(f"cachedContents/{request.match_info['cache_id']}", None) is None:
+        return web.json_response(CACHE_NOT_FOUND, status=403)
+    return web.json_response({})
+
+
+async def handle_tavily(request: web.Request) -> web.Response:
+    state: StubState = request.app["state"]
+    state.requests["search"] += 1
+    body = await request.json()
+    await asyncio.sleep(state.tavily.latency(state.rng))
+    error = state.injected_error(state.tavily)
+    if error is not None:
+        return error
+
+    count = min(int(body.get("max_results") or 5), state.tavily.array_items)
+    results: List[Dict[str, Any]] = []
+    for _ in range(count):
+        video_id = "".join(state.rng.choice("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-") for _ in range(11))
+        results.append({
+            "title": state.words(6).title(),
+            "url": f"https://www.youtube.com/watch?v={video_id}",
+            "content": state.words(state.tavily.payload_words),
+            "score": round(state.rng.uniform(0.5, 1.0), 4),
+            "raw_content": None,
+        })
+    return web.json_response({
+        "query": body.get("query", ""),
+        "follow_up_questions": None,
+        "answer": None,
+        "images": [],
+        "results": results,
+        "response_time": 0.0,
+    })
+
+
+async def handle_stats(request: web.Request) -> web.Response:
+    state: StubState = request.app["state"]
+    return web.json_response({
+        "requests": state.requests,
+        "injected_errors": state.errors,
+        "gemini_tokens": state.tokens,
+        "live_caches": len(state.caches),
+    })
+
+
+def build_app(
+    gemini: UpstreamProfile,
+    tavily: UpstreamProfile,
+    stream_chunks: int = 8,
+    seed: Optional[int] = None,
+    cache_min_tokens: int = 1024
+) -> web.Application:
+    """
+    Build the stub server application.
+
+    Args:
+        gemini: Behaviour of the Gemini stand-in
+        tavily: Behaviour of the Tavily stand-in
+        stream_chunks: SSE events per streamed answer
+        seed: Seed for latencies, errors and generated content
+        cache_min_tokens: Smallest cachedContents accepted
+
+    Returns:
+        aiohttp application serving /v1beta/models/{model}[:{method}],
+        /v1beta/cachedContents, /search and /stats
+    """
+    app = web.Application()
+    app["state"] = StubState(gemini, tavily, stream_chunks, seed, cache_min_tokens)
+    app.router.add_post("/v1beta/models/{call}", handle_gemini)
+    app.router.add_get("/v1beta/models/{model}", handle_model_get)
+    app.router.add_post("/v1beta/cachedContents", handle_cache_create)
+    app.router.add_patch("/v1beta/cachedContents/{cache_id}", handle_cache_update)
+    app.router.add_delete("/v1beta/cachedContents/{cache_id}", handle_cache_delete)
+    app.router.add_post("/search", handle_tavily)
+    app.router.add_get("/stats", handle_stats)
+    return app
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    """Stub options, shared with the load driver which passes them through."""
+    group = parser.add_argument_group("upstream stubs")
+    group.add_argument("--gemini-latency", default="lognormal:400:0.5", help="Gemini latency spec (ms)")
+    group.add_argument("--gemini-error-rate", type=float, default=0.0, help="Share of Gemini calls answered with 503")
+    group.add_argument("--gemini-429-rate", type=float, default=0.0, help="Share of Gemini calls answered with 429")
+    group.add_argument("--gemini-payload-words", type=int, default=12, help="Words per generated text field")
+    group.add_argument("--gemini-array-items", type=int, default=3, help="Items per generated array")
+    group.add_argument("--gemini-prefill-ms-per-1k", type=float, default=0.0, help="Extra Gemini latency per 1000 uncached prompt tokens")
+    group.add_argument("--cache-min-tokens", type=int, default=1024, help="Smallest context cache the Gemini stub accepts")
+    group.add_argument("--stream-chunks", type=int, default=8, help="SSE events per streamed answer")
+    group.add_argument("--tavily-latency", default="uniform:150:400", help="Tavily latency spec (ms)")
+    group.add_argument("--tavily-error-rate", type=float, default=0.0, help="Share of searches answered with 503")
+    group.add_argument("--tavily-payload-words", type=int, default=40, help="Words per search result snippet")
+    group.add_argument("--tavily-results", type=int, default=5, help="Maximum results per search")
+    group.add_argument("--seed", type=int, default=7, help="Random seed (stubs and request mix)")
+
+
+STUB_OPTIONS = (
+    "gemini_latency", "gemini_error_rate", "gemini_429_rate", "gemini_payload_words", "gemini_array_items",
+    "gemini_prefill_ms_per_1k", "cache_min_tokens", "stream_chunks", "tavily_latency", "tavily_error_rate", "tavily_payload_words", "tavily_results", "seed",
+)
+
+
+def app_from_args(args: argparse.Namespace) -> web.Application:
+    gemini = UpstreamProfile(
+        latency=parse_latency(args.gemini_latency),
+        error_rate=args.gemini_error_rate,
+        rate_limit_rate=args.gemini_429_rate,
+        payload_words=args.gemini_payload_words,
+        array_items=args.gemini_array_items,
+        prefill_ms_per_1k=args.gemini_prefill_ms_per_1k,
+    )
+    tavily = UpstreamProfile(
+        latency=parse_latency(args.tavily_latency),
+        error_rate=args.tavily_error_rate,
+        payload_words=args.tavily_payload_words,
+        array_items=args.tavily_results,
+    )
+    return build_app(gemini, tavily, args.stream_chunks, args.seed, args.cache_min_tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8701)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    web.run_app(app_from_args(args), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
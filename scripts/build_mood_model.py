@@ -0,0 +1,242 @@
+"""
+Build app/resources/mood_model.npz, the model file for the local mood
+classifier (app/services/mood_classifier.py).
+
+A multinomial logistic regression over hashed unigrams/bigrams is trained
+with NumPy on a small seed corpus: hand-written example posts plus
+templated sentences built from each mood's lexicon. The lexicon itself is
+stored alongside the weights as an additive prior.
+
+Run from the repository root:
+
+    python -m scripts.build_mood_model [--features 4096] [--epochs 300]
+"""
+import argparse
+import itertools
+import random
+from pathlib import Path
+
+import numpy as np
+
+from app.services.mood_classifier import DEFAULT_MODEL_PATH, hash_features, tokenize
+
+# Mood label -> (lexicon words, example posts)
+SEED_CORPUS = {
+    "sad": (
+        ["sad", "sadness", "unhappy", "crying", "cry", "cried", "tears", "heartbroken", "down", "blue", "miserable", "hurting", "depressed"],
+        [
+            "I can't stop crying today",
+            "everything feels heavy and I feel so down",
+            "I've been really sad since the weekend",
+            "my heart hurts and I don't know why",
+            "I cried myself to sleep again last night",
+            "nothing makes me smile anymore",
+            "I feel empty and unhappy",
+        ],
+    ),
+    "grieving": (
+        ["grief", "grieving", "loss", "lost", "passed", "died", "death", "funeral", "mourning", "miss", "missing", "gone", "memorial"],
+        [
+            "I lost my mother last week and I feel so empty inside",
+            "my dad passed away and I miss him every day",
+            "it's been a year since my husband died",
+            "the funeral was yesterday and I can't believe she's gone",
+            "I keep reaching for my phone to call my brother but he's gone",
+            "our dog died this morning and the house is so quiet",
+            "I am still mourning my best friend",
+        ],
+    ),
+    "anxious": (
+        ["anxious", "anxiety", "worried", "worry", "nervous", "panic", "scared", "afraid", "fear", "stressed", "uneasy", "restless", "dread"],
+        [
+            "I can't stop worrying about tomorrow",
+            "my heart is racing and I feel like something bad will happen",
+            "I had a panic attack at work",
+            "I'm so nervous about the results",
+            "I keep overthinking everything and can't sleep",
+            "I'm scared of what comes next",
+            "I feel on edge all the time",
+        ],
+    ),
+    "angry": (
+        ["angry", "anger", "furious", "mad", "rage", "hate", "unfair", "frustrated", "annoyed", "resent", "betrayed", "irritated"],
+        [
+            "I'm so angry that nobody told me",
+            "it's not fair that this happened to us",
+            "I'm furious with the doctors",
+            "I hate how people keep saying everything happens for a reason",
+            "I feel betrayed by my own family",
+            "I'm fed up with all of it",
+            "why did this have to happen, it makes me so mad",
+        ],
+    ),
+    "lonely": (
+        ["lonely", "alone", "isolated", "loneliness", "nobody", "abandoned", "invisible", "disconnected", "friendless"],
+        [
+            "I feel so alone since everyone went home",
+            "nobody calls me anymore",
+            "I have no one to talk to",
+            "the evenings are the worst because I'm by myself",
+            "I feel invisible to everyone around me",
+            "my friends stopped checking in",
+            "I eat dinner alone every night now",
+        ],
+    ),
+    "overwhelmed": (
+        ["overwhelmed", "overwhelming", "exhausted", "drowning", "burnout", "burned", "tired", "overloaded", "frazzled", "swamped", "drained"],
+        [
+            "there is too much to handle right now",
+            "I'm drowning in paperwork and phone calls",
+            "I'm completely exhausted and can't cope",
+            "everything is piling up and I don't know where to start",
+            "I can't keep up with everything",
+            "I feel burned out and drained",
+            "it's all just too much at once",
+        ],
+    ),
+    "hopeful": (
+        ["hopeful", "hope", "better", "healing", "optimistic", "forward", "brighter", "improving", "progress", "encouraged", "uplifted"],
+        [
+            "today felt a little better than yesterday",
+            "I think things are starting to improve",
+            "I'm looking forward to the weekend for the first time in months",
+            "I finally feel like I'm healing",
+            "maybe tomorrow will be brighter",
+            "I made some progress in therapy this week",
+            "I'm starting to believe I can get through this",
+        ],
+    ),
+    "happy": (
+        ["happy", "joy", "joyful", "excited", "great", "wonderful", "amazing", "thrilled", "delighted", "glad", "celebrate", "fun", "love"],
+        [
+            "I got the job and I'm so excited",
+            "today was wonderful and I laughed so much",
+            "we're celebrating my daughter's graduation",
+            "I feel amazing after my run",
+            "I'm thrilled with how the day went",
+            "what a great day with my friends",
+            "I'm so happy right now",
+        ],
+    ),
+    "grateful": (
+        ["grateful", "thankful", "thanks", "thank", "blessed", "appreciate", "appreciative", "fortunate", "gratitude", "lucky"],
+        [
+            "I'm so grateful for my friends who showed up",
+            "thank you all for the kind messages",
+            "I feel blessed to have had her in my life",
+            "I appreciate everyone who helped with the arrangements",
+            "I'm thankful for every moment we had together",
+            "I feel lucky to have such a supportive family",
+            "grateful for a quiet morning and good coffee",
+        ],
+    ),
+    "calm": (
+        ["calm", "peaceful", "peace", "relaxed", "content", "okay", "fine", "settled", "quiet", "serene", "rested", "steady"],
+        [
+            "I feel calm today",
+            "it was a peaceful afternoon in the garden",
+            "I'm doing okay, just taking it slow",
+            "I feel settled and rested after a good sleep",
+            "things are quiet and that's fine with me",
+            "I spent the day relaxing and reading",
+            "I feel content with where I am",
+        ],
+    ),
+}
+
+INTENSIFIERS = {
+    "so": 0.5, "very": 0.7, "really": 0.5, "extremely": 1.5, "completely": 1.2, "totally": 1.0,
+    "incredibly": 1.5, "deeply": 1.0, "unbearable": 2.0, "constantly": 1.0, "always": 0.5, "never": 0.5,
+    "overwhelming": 1.0, "utterly": 1.5, "absolutely": 1.2,
+}
+
+TEMPLATES = [
+    "I feel {word}",
+    "I feel so {word} today",
+    "I've been {word} all week",
+    "honestly I'm just {word}",
+    "everything makes me feel {word}",
+    "I am {word} and I don't know what to do",
+    "lately I've been feeling {word}",
+    "{word}",
+]
+
+# Prior added to a mood's logit for each matching lexicon word
+LEXICON_WEIGHT = 1.5
+
+
+def build_dataset(rng: random.Random):
+    texts, labels = [], []
+    for label_index, (words, examples) in enumerate(SEED_CORPUS.values()):
+        for example in examples:
+            texts.append(example)
+            labels.append(label_index)
+        for template, word in itertools.product(TEMPLATES, words):
+            texts.append(template.format(word=word))
+            labels.append(label_index)
+    order = list(range(len(texts)))
+    rng.shuffle(order)
+    return [texts[i] for i in order], np.asarray([labels[i] for i in order])
+
+
+def featurize(texts, n_features: int) -> np.ndarray:
+    matrix = np.zeros((len(texts), n_features), dtype=np.float32)
+    for row, text in enumerate(texts):
+        features = hash_features(tokenize(text), n_features)
+        for feature in features:
+            matrix[row, feature] += 1.0
+        matrix[row] /= np.sqrt(max(len(features), 1))
+    return matrix
+
+
+def train(features: np.ndarray, labels: np.ndarray, n_classes: int, epochs: int, learning_rate: float, l2: float):
+    weights = np.zeros((features.shape[1], n_classes), dtype=np.float32)
+    bias = np.zeros(n_classes, dtype=np.float32)
+    targets = np.eye(n_classes, dtype=np.float32)[labels]
+    for _ in range(epochs):
+        logits = features @ weights + bias
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        error = (probabilities - targets) / len(labels)
+        weights -= learning_rate * (features.T @ error + l2 * weights)
+        bias -= learning_rate * error.sum(axis=0)
+    return weights, bias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--features", type=int, default=4096, help="number of hashed feature buckets")
+    parser.add_argument("--epochs", type=int, default=300)
+    parser.add_argument("--learning-rate", type=float, default=5.0)
+    parser.add_argument("--l2", type=float, default=1e-4)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--output", type=Path, default=DEFAULT_MODEL_PATH)
+    args = parser.parse_args()
+
+    labels = list(SEED_CORPUS)
+    texts, targets = build_dataset(random.Random(args.seed))
+    features = featurize(texts, args.features)
+    weights, bias = train(features, targets, len(labels), args.epochs, args.learning_rate, args.l2)
+
+    predictions = (features @ weights + bias).argmax(axis=1)
+    print(f"trained on {len(texts)} examples, training accuracy {np.mean(predictions == targets):.3f}")
+
+    lexicon = [(word, index) for index, (words, _) in enumerate(SEED_CORPUS.values()) for word in words]
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(
+        args.output,
+        labels=np.asarray(labels),
+        weights=weights.astype(np.float16),
+        bias=bias.astype(np.float16),
+        lexicon_words=np.asarray([word for word, _ in lexicon]),
+        lexicon_labels=np.asarray([index for _, index in lexicon], dtype=np.int16),
+        lexicon_weights=np.full(len(lexicon), LEXICON_WEIGHT, dtype=np.float16),
+        intensifier_words=np.asarray(list(INTENSIFIERS)),
+        intensifier_weights=np.asarray(list(INTENSIFIERS.values()), dtype=np.float16),
+    )
+    print(f"wrote {args.output} ({args.output.stat().st_size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Measure how long importing the application takes and fail when it is over
+budget, so cold starts (deploys, autoscaling) don't quietly get slower.
+
+Each run imports the module in a fresh interpreter with `-X importtime`.
+The median over the runs is compared against the budget, and the slowest
+imports of the last run are listed.
+
+Run from the repository root:
+
+    python -m scripts.check_import_time [--module app.main] [--budget-ms 1500] [--runs 5] [--top 15]
+
+Exits with status 1 when the median import time exceeds the budget.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Placeholder keys, so services that check for them import as in production
+DEFAULT_ENV = {
+    "GEMINI_API_KEY": "import-time-check",
+    "TAVILY_API_KEY": "import-time-check",
+}
+
+
+def measure(module: str) -> Tuple[float, List[Tuple[str, int, int]]]:
+    """
+    Import `module` in a fresh interpreter.
+
+    Returns:
+        Tuple of (total milliseconds, [(module, self us, cumulative us), ...])
+    """
+    env = dict(DEFAULT_ENV, **os.environ)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+    total = next((cumulative for name, _, cumulative in entries if name == module), None)
+    if total is None:
+        raise RuntimeError(f"No import time recorded for {module}")
+    return total / 1000, entries
+
+
+def by_package(entries: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    """Self time summed per top-level package, in microseconds."""
+    totals: Dict[str, int] = {}
+    for name, self_us, _ in entries:
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main", help="Module to import")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="Maximum median import time")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to measure")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    args = parser.parse_args()
+
+    # The first import may compile bytecode; don't count it
+    measure(args.module)
+    totals = []
+    entries: List[Tuple[str, int, int]] = []
+    for _ in range(max(1, args.runs)):
+        total, entries = measure(args.module)
+        totals.append(total)
+    median = statistics.median(totals)
+
+    print(f"import {args.module}: median {median:.0f} ms over {len(totals)} runs "
+          f"(min {min(totals):.0f}, max {max(totals):.0f}); budget {args.budget_ms:.0f} ms")
+    print(f"\nSlowest packages (self time):")
+    for package, self_us in sorted(by_package(entries).items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {self_us / 1000:>8.1f} ms  {package}")
+    print(f"\nSlowest application modules (cumulative):")
+    app_entries = [entry for entry in entries if entry[0].split(".")[0] == args.module.split(".")[0]]
+    for name, _, cumulative_us in sorted(app_entries, key=lambda entry: -entry[2])[:args.top]:
+        print(f"  {cumulative_us / 1000:>8.1f} ms  {name}")
+
+    if median > args.budget_ms:
+        print(f"\nFAIL: import time {median:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()